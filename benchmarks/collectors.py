@@ -0,0 +1,470 @@
+"""Benchmarks for the collect input functions.
+
+Replays the recorded command outputs used by the tests, and larger synthetic
+outputs, through the collectors. Records the time and peak memory of each
+scenario and compares them to a stored baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.collectors
+    python -m benchmarks.collectors --save
+"""
+
+import contextlib
+import dataclasses
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+from unittest import mock
+
+import beartype
+import click
+import requests
+from beartype import typing
+
+from benchmarks import replay
+from server_monitor_agent.agent import operation as agent_op
+from server_monitor_agent.service.consul import (
+    model as consul_model,
+    operation as consul_op,
+)
+from server_monitor_agent.service.disk import io as disk_io, model as disk_model
+from server_monitor_agent.service.docker import (
+    io as docker_io,
+    model as docker_model,
+)
+from server_monitor_agent.service.server import (
+    io as server_io,
+    model as server_model,
+    operation as server_op,
+)
+from server_monitor_agent.service.statuscake import operation as sc_op
+from server_monitor_agent.service.systemd import (
+    io as systemd_io,
+    model as systemd_model,
+    operation as systemd_op,
+)
+
+BASELINE_PATH = pathlib.Path(__file__).parent / "baseline.json"
+
+FINDMNT_ARGS = [
+    "findmnt",
+    "--json",
+    "--list",
+    "--noheadings",
+    "--ascii",
+    "--notruncate",
+    "--bytes",
+    "--real",
+    "--types=notmpfs,sysfs,cgroup,cgroup2,securityfs,tracefs",
+    "--canonicalize",
+    "--output=TARGET,SOURCE,SIZE,FSTYPE,UUID,OPTIONS,LABEL",
+]
+
+JOURNALCTL_ARGS = [
+    "journalctl",
+    "--no-hostname",
+    "--all",
+    "--no-pager",
+    "--output=json-pretty",
+    "--unit",
+    "docker.service",
+    "--output-fields=MESSAGE,JOB_RESULT,UNIT,_HOSTNAME,__REALTIME_TIMESTAMP",
+]
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class Scenario:
+    """A collector to run with prepared command outputs and patches."""
+
+    name: str
+    run: typing.Callable[[], typing.Any]
+    processes: typing.Dict[typing.Tuple[str, ...], subprocess.CompletedProcess] = (
+        dataclasses.field(default_factory=dict)
+    )
+    patches: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class Measurement:
+    """The time and memory used by a scenario."""
+
+    name: str
+    runs: int
+    best: float
+    median: float
+    peak_memory: int
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return dataclasses.asdict(self)
+
+
+def _completed(args: typing.List[str], stdout: str) -> subprocess.CompletedProcess:
+    return subprocess.CompletedProcess(
+        args=args, returncode=0, stdout=stdout, stderr=""
+    )
+
+
+def _journal(count: int) -> str:
+    entries = []
+    for index in range(count):
+        entry = {
+            "__REALTIME_TIMESTAMP": str(1657541038550955 + index * 1000000),
+            "_HOSTNAME": "ubuntu2004.localdomain",
+            "UNIT": "docker.service",
+            "MESSAGE": f'level=info msg="processing event {index}" '
+            f"container=787c6c570811 type=health_status",
+        }
+        entries.append(json.dumps(entry, indent=8))
+    return "\n".join(entries) + "\n"
+
+
+def _mounts(count: int) -> typing.Tuple[str, typing.List, typing.Dict]:
+    filesystems = []
+    partitions = []
+    usages = {}
+    for index in range(count):
+        target = f"/mnt/disk{index}"
+        source = f"/dev/sd{index}"
+        filesystems.append(
+            {
+                "target": target,
+                "source": source,
+                "size": 132161630208,
+                "fstype": "ext4",
+                "uuid": f"181d63cf-913b-4f0e-a279-{index:012d}",
+                "options": "rw,relatime",
+                "label": None,
+            }
+        )
+        partitions.append(
+            types.SimpleNamespace(
+                device=source,
+                mountpoint=target,
+                fstype="ext4",
+                opts="rw,relatime",
+                maxfile=255,
+                maxpath=4096,
+            )
+        )
+        usages[target] = types.SimpleNamespace(
+            total=132161630208, used=66080815104, free=66080815104, percent=50.0
+        )
+    return json.dumps({"filesystems": filesystems}), partitions, usages
+
+
+def _processes(count: int) -> typing.List[types.SimpleNamespace]:
+    result = []
+    for index in range(count):
+        info = {
+            "pid": 1000 + index,
+            "memory_percent": 0.25,
+            "name": f"worker{index}",
+            "cmdline": ["/usr/bin/python3", "-m", "worker", f"--id={index}"],
+            "cpu_percent": 1.5,
+            "memory_info": types.SimpleNamespace(
+                vms=1024 * 1024 * 200, rss=1024 * 1024 * 30
+            ),
+            "username": "www-data",
+            "io_counters": types.SimpleNamespace(
+                read_count=10, write_count=20, read_bytes=4096, write_bytes=8192
+            ),
+            "cpu_times": types.SimpleNamespace(user=1.5, system=0.5),
+        }
+        result.append(
+            types.SimpleNamespace(info=info, cpu_affinity=lambda: [0, 1, 2, 3])
+        )
+    return result
+
+
+def _consul_checks(count: int) -> requests.Response:
+    checks = [
+        {
+            "Node": f"node{index % 500}",
+            "CheckID": f"service:app{index}",
+            "Name": f"Service 'app{index}' check",
+            "Status": ["passing", "warning", "critical"][index % 3],
+            "Notes": "",
+            "Output": "HTTP GET http://localhost:8080/health: 200 OK Output: ok",
+            "ServiceID": f"app{index}",
+            "ServiceName": f"app{index % 50}",
+            "ServiceTags": ["application"],
+            "Namespace": None,
+        }
+        for index in range(count)
+    ]
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(checks).encode("utf8")
+    return response
+
+
+@beartype.beartype
+def scenarios(scale: float = 1.0) -> typing.List[Scenario]:
+    """Build the benchmark scenarios.
+    The synthetic outputs are multiplied by 'scale'."""
+
+    def size(count: int) -> int:
+        return max(1, int(count * scale))
+
+    journal = _journal(size(10000))
+    mounts_json, partitions, usages = _mounts(size(500))
+    processes = _processes(size(2000))
+    consul_response = _consul_checks(size(50000))
+    consul_settings = consul_model.HealthCheckCollectArgs(
+        http_addr="http://127.0.0.1:8500"
+    ).to_settings
+
+    memory = types.SimpleNamespace(
+        total=8 * 1024**3,
+        available=5 * 1024**3,
+        percent=37.5,
+        used=3 * 1024**3,
+        free=1 * 1024**3,
+    )
+
+    return [
+        Scenario(
+            name="timezone",
+            run=server_op.timezone,
+        ),
+        Scenario(
+            name="memory",
+            run=lambda: server_io.memory_status_input(server_model.MemoryCollectArgs()),
+            patches={"psutil.virtual_memory": lambda: memory},
+        ),
+        Scenario(
+            name="docker-container",
+            run=lambda: docker_io.container_status_input(
+                docker_model.ContainerStatusCollectArgs(
+                    name="consul", state="running", health="healthy"
+                )
+            ),
+        ),
+        # the unit status input needs a date format that the recorded output
+        # does not match, so measure the parsing of 'systemctl show'
+        Scenario(
+            name="systemctl-show",
+            run=lambda: systemd_op.systemctl_show("docker.service"),
+        ),
+        Scenario(
+            name="systemd-unit-logs",
+            run=lambda: systemd_io.unit_logs_input(
+                systemd_model.SystemdUnitLogsCollectArgs(name="docker.service")
+            ),
+        ),
+        Scenario(
+            name=f"systemd-unit-logs-{size(10000)}",
+            run=lambda: systemd_io.unit_logs_input(
+                systemd_model.SystemdUnitLogsCollectArgs(name="docker.service")
+            ),
+            processes={tuple(JOURNALCTL_ARGS): _completed(JOURNALCTL_ARGS, journal)},
+        ),
+        Scenario(
+            name="disk",
+            run=lambda: disk_io.disk_status_input(
+                disk_model.DiskCollectArgs(path=pathlib.Path("/"))
+            ),
+            patches={
+                "psutil.disk_partitions": lambda: [
+                    types.SimpleNamespace(
+                        device="/dev/sda3",
+                        mountpoint="/",
+                        fstype="ext4",
+                        opts="rw,relatime",
+                        maxfile=255,
+                        maxpath=4096,
+                    )
+                ],
+                "psutil.disk_usage": lambda path: types.SimpleNamespace(
+                    total=132161630208, used=66080815104, free=66080815104, percent=50.0
+                ),
+            },
+        ),
+        Scenario(
+            name=f"disk-{size(500)}",
+            run=lambda: disk_io.disk_status_input(
+                disk_model.DiskCollectArgs(
+                    path=pathlib.Path(f"/mnt/disk{size(500) - 1}")
+                )
+            ),
+            processes={
+                tuple([*FINDMNT_ARGS, i]): _completed([*FINDMNT_ARGS, i], mounts_json)
+                for i in ["--kernel", "--fstab", "--mtab"]
+            },
+            patches={
+                "psutil.disk_partitions": lambda: partitions,
+                "psutil.disk_usage": lambda path: usages[path],
+            },
+        ),
+        # the statuscake input needs network access to ping,
+        # so measure the process list that it sends
+        Scenario(
+            name=f"processes-{size(2000)}",
+            run=sc_op.processes,
+            patches={"psutil.process_iter": lambda **kwargs: iter(processes)},
+        ),
+        # the consul input is not finished,
+        # so measure getting and parsing the checks
+        Scenario(
+            name=f"consul-checks-{size(50000)}",
+            run=lambda: consul_op.health_checks(consul_settings, "any"),
+            patches={
+                "requests.sessions.Session.request": (
+                    lambda *args, **kwargs: consul_response
+                )
+            },
+        ),
+    ]
+
+
+@contextlib.contextmanager
+def _patched(scenario: Scenario):
+    def execute_process(args, timeout=None):
+        key = tuple(args)
+        if key in scenario.processes:
+            return scenario.processes[key]
+        return replay.replay_process(args)
+
+    def stream_process(args, **kwargs):
+        result = execute_process(args)
+        return contextlib.nullcontext(agent_op.ProcessStream.from_result(result))
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(
+            mock.patch(
+                "server_monitor_agent.agent.operation.execute_process",
+                side_effect=execute_process,
+            )
+        )
+        stack.enter_context(
+            mock.patch(
+                "server_monitor_agent.agent.operation.stream_process",
+                side_effect=stream_process,
+            )
+        )
+        stack.enter_context(
+            mock.patch("socket.getfqdn", return_value="test-instance.example.com")
+        )
+        for target, value in scenario.patches.items():
+            stack.enter_context(mock.patch(target, value))
+        yield
+
+
+@beartype.beartype
+def measure(scenario: Scenario, repeat: int = 5) -> Measurement:
+    """Run a scenario once to warm up, then 'repeat' times for timing,
+    then once more to trace the peak memory."""
+    with _patched(scenario):
+        scenario.run()
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            scenario.run()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            scenario.run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return Measurement(
+        name=scenario.name,
+        runs=repeat,
+        best=min(times),
+        median=statistics.median(times),
+        peak_memory=peak,
+    )
+
+
+@beartype.beartype
+def compare(
+    results: typing.List[Measurement],
+    baseline: typing.Dict[str, typing.Dict[str, typing.Any]],
+    tolerance: float = 1.5,
+) -> typing.List[str]:
+    """Get the scenarios that are slower or use more memory than the
+    baseline multiplied by the tolerance."""
+    regressions = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if not expected:
+            continue
+        if result.median > expected["median"] * tolerance:
+            regressions.append(
+                f"{result.name}: median {result.median * 1000:.2f} ms "
+                f"is over {tolerance}x the baseline {expected['median'] * 1000:.2f} ms"
+            )
+        if result.peak_memory > expected["peak_memory"] * tolerance:
+            regressions.append(
+                f"{result.name}: peak memory {result.peak_memory / 1024:.0f} KiB "
+                f"is over {tolerance}x the baseline "
+                f"{expected['peak_memory'] / 1024:.0f} KiB"
+            )
+    return regressions
+
+
+@click.command()
+@click.option("-n", "--repeat", default=5, type=click.IntRange(min=1))
+@click.option("-s", "--scale", default=1.0, type=float)
+@click.option("-k", "--filter", "name_filter", default="", help="Run matching names.")
+@click.option(
+    "-b",
+    "--baseline",
+    "baseline_path",
+    default=BASELINE_PATH,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+)
+@click.option("--save/--no-save", default=False, help="Save results as the baseline.")
+@click.option("-t", "--tolerance", default=1.5, type=float)
+def main(
+    repeat: int,
+    scale: float,
+    name_filter: str,
+    baseline_path: pathlib.Path,
+    save: bool,
+    tolerance: float,
+):
+    """Benchmark the collectors and compare to the baseline."""
+    baseline = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+
+    results = []
+    for scenario in scenarios(scale):
+        if name_filter not in scenario.name:
+            continue
+        result = measure(scenario, repeat)
+        results.append(result)
+
+        expected = baseline.get(result.name)
+        change = f"{result.median / expected['median']:>6.2f}x" if expected else ""
+        click.echo(
+            f"{result.name:<28} {result.median * 1000:>10.2f} ms "
+            f"{result.peak_memory / 1024:>10.0f} KiB {change}"
+        )
+
+    if save:
+        baseline.update({i.name: i.to_dict() for i in results})
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        click.echo(f"Saved baseline to '{baseline_path}'.")
+        return
+
+    regressions = compare(results, baseline, tolerance)
+    for regression in regressions:
+        click.echo(f"Regression: {regression}", err=True)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
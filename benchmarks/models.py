@@ -0,0 +1,233 @@
+"""Benchmarks for the memory used by the models.
+
+Builds many of each model from parsed JSON, as the collectors do,
+and records the memory kept per item. Compares to a stored baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.models
+    python -m benchmarks.models --save
+"""
+
+import dataclasses
+import datetime
+import json
+import pathlib
+import sys
+import tracemalloc
+
+import beartype
+import click
+from beartype import typing
+
+from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.service.consul import model as consul_model
+from server_monitor_agent.service.disk import model as disk_model
+from server_monitor_agent.service.server import model as server_model
+from server_monitor_agent.service.systemd import model as systemd_model
+
+BASELINE_PATH = pathlib.Path(__file__).parent / "models_baseline.json"
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class ModelScenario:
+    """A model to build from the parsed JSON for each item."""
+
+    name: str
+    build: typing.Callable[[typing.Dict[str, typing.Any]], typing.Any]
+    template: typing.Callable[[int], typing.Dict[str, typing.Any]]
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class ModelMeasurement:
+    """The memory kept by the built models."""
+
+    name: str
+    count: int
+    total_bytes: int
+
+    @property
+    def bytes_per_item(self) -> float:
+        return self.total_bytes / self.count
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {**dataclasses.asdict(self), "bytes_per_item": self.bytes_per_item}
+
+
+def _agent_item(raw: typing.Dict[str, typing.Any]) -> agent_model.AgentItem:
+    raw["date"] = datetime.datetime.fromtimestamp(raw["date"], datetime.timezone.utc)
+    return agent_model.AgentItem(**raw)
+
+
+@beartype.beartype
+def scenarios() -> typing.List[ModelScenario]:
+    """Build the benchmark scenarios."""
+    return [
+        ModelScenario(
+            name="agent-item",
+            build=_agent_item,
+            template=lambda i: {
+                "summary": "Process running",
+                "description": f"Process worker{i} is running.",
+                "host_name": "test-instance.example.com",
+                "source_name": "server",
+                "check_name": "processes",
+                "date": 1714559400 + i,
+                "status_name": "passing",
+                "service_name": "processes",
+            },
+        ),
+        ModelScenario(
+            name="process-result",
+            build=lambda raw: server_model.ProcessResult(**raw),
+            template=lambda i: {
+                "exit_code": 0,
+                "user": "www-data",
+                "pid": 1000 + i,
+                "cpu_percent": 1.5,
+                "mem_percent": 0.25,
+                "vms": 209715200,
+                "rss": 31457280,
+                "cmdline": f"/usr/bin/python3 -m worker --id={i}",
+                "cpu_usable_count": 4,
+            },
+        ),
+        ModelScenario(
+            name="journalctl-result",
+            build=lambda raw: systemd_model.JournalCtlResult(**raw),
+            template=lambda i: {
+                "exit_code": 0,
+                "name": "docker.service",
+                "message": f'level=info msg="processing event {i}"',
+                "hostname": "ubuntu2004.localdomain",
+                "unit": "docker.service",
+            },
+        ),
+        ModelScenario(
+            name="systemctl-show-result",
+            build=lambda raw: systemd_model.SystemCtlShowResult(**raw),
+            template=lambda i: {
+                "exit_code": 0,
+                "name": f"app{i}.service",
+                "identifier": f"app{i}.service",
+                "load_state": "loaded",
+                "active_state": "active",
+                "sub_state": "running",
+                "unit_file_state": "enabled",
+                "unit_file_preset": "enabled",
+                "can_start": "yes",
+                "can_stop": "yes",
+                "user": "www-data",
+                "result": "success",
+            },
+        ),
+        ModelScenario(
+            name="findmnt-result",
+            build=lambda raw: disk_model.FindMntResult(**raw),
+            template=lambda i: {
+                "exit_code": 0,
+                "name": "kernel",
+                "target": f"/mnt/disk{i}",
+                "source": f"/dev/sd{i}",
+                "size": 132161630208,
+                "fstype": "ext4",
+                "options": "rw,relatime",
+            },
+        ),
+        ModelScenario(
+            name="consul-check",
+            build=lambda raw: consul_model.ConsulHealthCheckStateItem(**raw),
+            template=lambda i: {
+                "node": f"node{i % 50}",
+                "check_id": f"service:app{i}",
+                "name": f"Service 'app{i}' check",
+                "status": "passing",
+                "notes": "",
+                "output": "HTTP GET http://localhost:8080/health: 200 OK",
+                "service_id": f"app{i}",
+                "service_name": f"app{i % 50}",
+                "service_tags": ["application"],
+            },
+        ),
+    ]
+
+
+@beartype.beartype
+def measure(scenario: ModelScenario, count: int = 10000) -> ModelMeasurement:
+    """Build 'count' models, each from freshly parsed JSON,
+    and get the memory that is kept."""
+    lines = [json.dumps(scenario.template(i)) for i in range(count)]
+
+    tracemalloc.start()
+    try:
+        items = [scenario.build(json.loads(line)) for line in lines]
+        total, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return ModelMeasurement(name=scenario.name, count=len(items), total_bytes=total)
+
+
+@click.command()
+@click.option("-c", "--count", default=10000, type=click.IntRange(min=1))
+@click.option("-k", "--filter", "name_filter", default="", help="Run matching names.")
+@click.option(
+    "-b",
+    "--baseline",
+    "baseline_path",
+    default=BASELINE_PATH,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+)
+@click.option("--save/--no-save", default=False, help="Save results as the baseline.")
+@click.option("-t", "--tolerance", default=1.1, type=float)
+def main(
+    count: int,
+    name_filter: str,
+    baseline_path: pathlib.Path,
+    save: bool,
+    tolerance: float,
+):
+    """Measure the memory used by the models and compare to the baseline."""
+    baseline = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text())
+
+    results = []
+    regressions = []
+    for scenario in scenarios():
+        if name_filter not in scenario.name:
+            continue
+        result = measure(scenario, count)
+        results.append(result)
+
+        expected = baseline.get(result.name)
+        change = ""
+        if expected:
+            ratio = result.bytes_per_item / expected["bytes_per_item"]
+            change = f"{ratio:>6.2f}x"
+            if ratio > tolerance:
+                regressions.append(
+                    f"{result.name}: {result.bytes_per_item:.0f} bytes per item "
+                    f"is over {tolerance}x the baseline "
+                    f"{expected['bytes_per_item']:.0f} bytes"
+                )
+        click.echo(
+            f"{result.name:<24} {result.bytes_per_item:>8.0f} bytes per item "
+            f"{result.total_bytes / 1024:>10.0f} KiB for {result.count} {change}"
+        )
+
+    if save:
+        baseline.update({i.name: i.to_dict() for i in results})
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        click.echo(f"Saved baseline to '{baseline_path}'.")
+        return
+
+    for regression in regressions:
+        click.echo(f"Regression: {regression}", err=True)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
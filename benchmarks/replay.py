@@ -0,0 +1,28 @@
+"""Replay recorded command outputs instead of running the commands.
+
+Used by the collector benchmarks, and by the tests.
+"""
+
+import typing
+
+from benchmarks import process_examples
+
+MATCH_ANY = "__MATCH_ANY__"
+"""An argument in a recorded command that matches any one argument."""
+
+
+def replay_process(args: typing.Sequence[str], timeout: typing.Optional[float] = None):
+    """Get the recorded output for a command."""
+    for item in process_examples.examples:
+
+        if args == item.args:
+            return item
+
+        if MATCH_ANY in item.args:
+            match_any_index = item.args.index(MATCH_ANY)
+            after = match_any_index + 1
+            args_without = args[:match_any_index] + args[after:]
+            item_args_without = item.args[:match_any_index] + item.args[after:]
+            if args_without == item_args_without:
+                return item
+    raise ValueError(f"Must handle args '{args}'.")
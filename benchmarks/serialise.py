@@ -0,0 +1,161 @@
+"""Benchmarks for encoding and decoding agent items.
+
+Compares the direct json encoder and decoder, and the binary format,
+to the path through 'to_dict' and 'from_dict',
+for agent items with large extra data.
+
+Run from the repository root:
+
+    python -m benchmarks.serialise
+"""
+
+import dataclasses
+import datetime
+import json
+import statistics
+import time
+import tracemalloc
+
+import beartype
+import click
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    convert as agent_convert,
+    model as agent_model,
+    wire as agent_wire,
+)
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class Comparison:
+    """The time and peak memory of the original path, the direct json path,
+    and the binary format."""
+
+    name: str
+    original: typing.Tuple[float, int]
+    direct: typing.Tuple[float, int]
+    binary: typing.Tuple[float, int]
+
+
+def _item(extra_data: typing.Dict[str, typing.Any]) -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="Consul checks",
+        description="The state of all consul checks.",
+        host_name="test-instance.example.com",
+        source_name="consul",
+        check_name="health-checks",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name="warning",
+        service_name="consul",
+        extra_data=extra_data,
+    )
+
+
+@beartype.beartype
+def items(scale: float = 1.0) -> typing.Dict[str, agent_model.AgentItem]:
+    """Build agent items with large extra data."""
+    checks = max(1, int(5000 * scale))
+    lines = max(1, int(10000 * scale))
+    return {
+        f"consul-checks-{checks}": _item(
+            {
+                "checks": [
+                    {
+                        "node": f"node{i % 50}",
+                        "check_id": f"service:app{i}",
+                        "status": ["passing", "warning", "critical"][i % 3],
+                        "output": "HTTP GET http://localhost:8080/health: 200 OK",
+                        "service_tags": ["application"],
+                    }
+                    for i in range(checks)
+                ]
+            }
+        ),
+        f"journal-{lines}": _item(
+            {
+                "logs": [
+                    {
+                        "timestamp": 1657541038 + i,
+                        "message": f'level=info msg="processing event {i}"',
+                    }
+                    for i in range(lines)
+                ]
+            }
+        ),
+    }
+
+
+def _measure(func: typing.Callable[[], typing.Any], repeat: int):
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+@beartype.beartype
+def compare(
+    name: str, item: agent_model.AgentItem, repeat: int = 5
+) -> typing.List[Comparison]:
+    """Measure encoding and decoding an item with each path."""
+    content = json.dumps(item.to_dict())
+    binary = agent_wire.encode([item])
+    data_type = agent_model.AgentItem.data_type_name()
+    return [
+        Comparison(
+            name=f"encode {name}",
+            original=_measure(lambda: json.dumps(item.to_dict()).encode(), repeat),
+            direct=_measure(lambda: agent_convert.to_json_bytes(item), repeat),
+            binary=_measure(lambda: agent_wire.encode([item]), repeat),
+        ),
+        Comparison(
+            name=f"decode {name}",
+            original=_measure(
+                lambda: agent_convert.to_agent_item(json.loads(content), data_type),
+                repeat,
+            ),
+            direct=_measure(
+                lambda: agent_convert.from_json(content, data_type), repeat
+            ),
+            binary=_measure(lambda: agent_wire.decode(binary), repeat),
+        ),
+    ]
+
+
+@click.command()
+@click.option("-n", "--repeat", default=5, type=click.IntRange(min=1))
+@click.option("-s", "--scale", default=1.0, type=float)
+def main(repeat: int, scale: float):
+    """Compare the direct json encoder and decoder, and the binary format,
+    to the original path."""
+    click.echo(f"{'':<28} {'original':>10} {'json':>10} {'binary':>10}")
+    for name, item in items(scale).items():
+        for result in compare(name, item, repeat):
+            paths = [result.original, result.direct, result.binary]
+            click.echo(
+                f"{result.name:<28} "
+                + " ".join(f"{i[0] * 1000:>7.2f} ms" for i in paths)
+                + " "
+                + " ".join(f"{i[1] / 1024:>6.0f} KiB" for i in paths)
+            )
+        json_size = len(agent_convert.to_json_bytes(item))
+        binary_size = len(agent_wire.encode([item]))
+        click.echo(
+            f"{'size ' + name:<28} {json_size / 1024:>7.0f} KiB json "
+            f"{binary_size / 1024:>7.0f} KiB binary"
+        )
+
+
+if __name__ == "__main__":
+    main()
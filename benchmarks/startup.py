@@ -0,0 +1,401 @@
+"""Benchmarks for the start up cost of the command line program.
+
+Runs the program in a new interpreter for each command. Records the wall time,
+CPU time and peak memory, and the import time of each module from
+'python -X importtime'. Fails when a command does not exit with 0,
+or a budget in the budget file is exceeded.
+
+The budget file also has the time to start an interpreter and import the
+dependencies on the machine that saved it. The time budgets are scaled by
+how long that takes on this machine, so the budget can be checked on slower
+or faster machines. Use '--scale' to set the scale instead.
+
+Run from the repository root:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --save
+"""
+
+import dataclasses
+import datetime
+import json
+import os
+import pathlib
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import beartype
+import click
+from beartype import typing
+
+BUDGET_PATH = pathlib.Path(__file__).parent / "startup_budget.json"
+SOURCE_PATH = pathlib.Path(__file__).parent.parent / "src"
+
+CLI_CODE = (
+    "from server_monitor_agent.agent.command import cli; "
+    "cli(prog_name='server-monitor-agent')"
+)
+ENTRY_CODE = (
+    "import sys; from server_monitor_agent import entry; sys.exit(entry.main())"
+)
+BASELINE_CODE = "import beartype, click, psutil, requests, yaml"
+
+_IMPORT_TIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.*)$"
+)
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class StartupCommand:
+    """A program run to measure."""
+
+    name: str
+    code: str
+    args: typing.List[str]
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class ImportTime:
+    """The time taken to import a module, in seconds."""
+
+    name: str
+    self_time: float
+    cumulative: float
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class StartupMeasurement:
+    """The time and memory used by a program run."""
+
+    name: str
+    runs: int
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_kib: int
+    exit_code: int
+    imports: typing.List[ImportTime]
+
+    @property
+    def import_seconds(self) -> float:
+        return sum(i.self_time for i in self.imports)
+
+    def module_times(self) -> typing.Dict[str, float]:
+        return {i.name.strip(): i.cumulative for i in self.imports}
+
+
+@beartype.beartype
+def commands(work_dir: pathlib.Path) -> typing.List[StartupCommand]:
+    """Build the program runs to measure.
+    The files used by the runs are created in 'work_dir'."""
+    item_path = work_dir / "item.json"
+    item_path.write_text(
+        json.dumps(
+            {
+                "summary": "High disk /data use",
+                "description": "High disk /data use of 95.0% (threshold 80.0%).",
+                "host_name": "test-instance.example.com",
+                "source_name": "server",
+                "check_name": "disk",
+                "date": datetime.datetime(
+                    2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc
+                ).isoformat(),
+                "status_name": "critical",
+                "service_name": "/data",
+                "extra_data": {"percent": 95.0},
+            }
+        )
+    )
+    textfile_path = work_dir / "agent.prom"
+    return [
+        StartupCommand(name="help", code=CLI_CODE, args=["--help"]),
+        StartupCommand(name="version", code=CLI_CODE, args=["--version"]),
+        StartupCommand(name="entry-help", code=ENTRY_CODE, args=["--help"]),
+        StartupCommand(
+            name="file-input-stream-output",
+            code=CLI_CODE,
+            args=["file-input", "-p", str(item_path), "stream-output"],
+        ),
+        StartupCommand(
+            name="file-input-prometheus-textfile",
+            code=CLI_CODE,
+            args=[
+                "file-input",
+                "-p",
+                str(item_path),
+                "prometheus-textfile",
+                "-p",
+                str(textfile_path),
+            ],
+        ),
+        StartupCommand(
+            name="memory-stream-output",
+            code=CLI_CODE,
+            args=["memory", "stream-output"],
+        ),
+    ]
+
+
+@beartype.beartype
+def baseline_command() -> StartupCommand:
+    """A run that imports the dependencies, to measure the start up cost
+    of this machine without the agent code."""
+    return StartupCommand(name="baseline", code=BASELINE_CODE, args=[])
+
+
+@beartype.beartype
+def parse_import_times(content: str) -> typing.List[ImportTime]:
+    """Get the module import times from the 'python -X importtime' output."""
+    result = []
+    for line in content.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        result.append(
+            ImportTime(
+                name=match.group("name").rstrip(),
+                self_time=int(match.group("self")) / 1000000,
+                cumulative=int(match.group("cumulative")) / 1000000,
+            )
+        )
+    return result
+
+
+@beartype.beartype
+def run_once(
+    command: StartupCommand, import_time: bool = False
+) -> typing.Tuple[float, float, int, int, str]:
+    """Run the command in a new interpreter.
+    Get the wall time, CPU time, peak memory in KiB, exit code and stderr."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        i for i in [str(SOURCE_PATH), os.environ.get("PYTHONPATH")] if i
+    )
+    args = [sys.executable, *(["-X", "importtime"] if import_time else [])]
+    args.extend(["-c", command.code, *command.args])
+
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+            env=env,
+        )
+        # wait4 gives the resource use of only this child process
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        if os.WIFSIGNALED(status):
+            proc.returncode = -os.WTERMSIG(status)
+        else:
+            proc.returncode = os.WEXITSTATUS(status)
+
+        stderr.seek(0)
+        content = stderr.read().decode("utf8", errors="replace")
+
+    return (
+        wall,
+        usage.ru_utime + usage.ru_stime,
+        usage.ru_maxrss,
+        proc.returncode,
+        content,
+    )
+
+
+@beartype.beartype
+def measure(command: StartupCommand, repeat: int = 5) -> StartupMeasurement:
+    """Run the command 'repeat' times for timing,
+    then once more with 'python -X importtime' for the module import times."""
+    runs = [run_once(command) for _ in range(repeat)]
+    *_, content = run_once(command, import_time=True)
+    failed = [i[3] for i in runs if i[3] != 0]
+    return StartupMeasurement(
+        name=command.name,
+        runs=repeat,
+        wall_seconds=statistics.median(i[0] for i in runs),
+        cpu_seconds=statistics.median(i[1] for i in runs),
+        peak_rss_kib=max(i[2] for i in runs),
+        exit_code=failed[0] if failed else 0,
+        imports=parse_import_times(content),
+    )
+
+
+@beartype.beartype
+def machine_scale(
+    budget: typing.Dict[str, typing.Any],
+    baseline: typing.Optional[StartupMeasurement],
+) -> float:
+    """Get how much slower this machine runs the baseline
+    than the machine that saved the budget."""
+    saved = budget.get("baseline", {}).get("wall_seconds")
+    if not saved or baseline is None or baseline.wall_seconds <= 0:
+        return 1.0
+    return baseline.wall_seconds / saved
+
+
+@beartype.beartype
+def check_budget(
+    results: typing.List[StartupMeasurement],
+    budget: typing.Dict[str, typing.Any],
+    scale: float = 1.0,
+    baseline: typing.Optional[StartupMeasurement] = None,
+) -> typing.List[str]:
+    """Get the commands that failed, and the measurements that are over the budget.
+    The time budgets are multiplied by 'scale'. The memory budgets are moved
+    by the difference between the 'baseline' and the saved baseline memory."""
+    exceeded = [
+        f"{i.name}: exited with code {i.exit_code}" for i in results if i.exit_code
+    ]
+
+    rss_offset = 0
+    saved_rss = budget.get("baseline", {}).get("peak_rss_kib")
+    if saved_rss is not None and baseline is not None:
+        rss_offset = baseline.peak_rss_kib - saved_rss
+
+    command_budgets = budget.get("commands", {})
+    for result in results:
+        limits = command_budgets.get(result.name, {})
+        for key in ["wall_seconds", "cpu_seconds", "peak_rss_kib"]:
+            limit = limits.get(key)
+            if limit is None:
+                continue
+            limit = limit + rss_offset if key == "peak_rss_kib" else limit * scale
+            value = getattr(result, key)
+            if value > limit:
+                exceeded.append(f"{result.name}: {key} {value:.3f} over {limit:.3f}")
+
+    # module budgets apply to the cumulative import time in every command
+    for module, limit in budget.get("modules", {}).items():
+        limit = limit * scale
+        for result in results:
+            value = result.module_times().get(module)
+            if value is not None and value > limit:
+                exceeded.append(
+                    f"{result.name}: import of {module} {value:.3f}s over {limit:.3f}s"
+                )
+    return exceeded
+
+
+@beartype.beartype
+def build_budget(
+    results: typing.List[StartupMeasurement],
+    headroom: float,
+    baseline: typing.Optional[StartupMeasurement] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Build a budget from the measurements, with room for variation.
+    The baseline is kept, so the budget can be scaled on other machines."""
+    modules = {}
+    for result in results:
+        for name, value in result.module_times().items():
+            if name.startswith("server_monitor_agent"):
+                modules[name] = max(modules.get(name, 0.0), value)
+    budget = {
+        "commands": {
+            i.name: {
+                "wall_seconds": round(i.wall_seconds * headroom, 3),
+                "cpu_seconds": round(i.cpu_seconds * headroom, 3),
+                "peak_rss_kib": int(i.peak_rss_kib * headroom),
+            }
+            for i in results
+        },
+        "modules": {
+            # small imports vary too much to have a tight budget
+            k: round(max(v * headroom, 0.01), 3)
+            for k, v in sorted(modules.items())
+            if k.count(".") < 3
+        },
+    }
+    if baseline is not None:
+        budget["baseline"] = {
+            "wall_seconds": round(baseline.wall_seconds, 3),
+            "cpu_seconds": round(baseline.cpu_seconds, 3),
+            "peak_rss_kib": baseline.peak_rss_kib,
+        }
+    return budget
+
+
+@click.command()
+@click.option("-n", "--repeat", default=5, type=click.IntRange(min=1))
+@click.option("-k", "--filter", "name_filter", default="", help="Run matching names.")
+@click.option(
+    "-b",
+    "--budget",
+    "budget_path",
+    default=BUDGET_PATH,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+)
+@click.option("--top", default=15, type=int, help="Show the slowest module imports.")
+@click.option("--save/--no-save", default=False, help="Save results as the budget.")
+@click.option("--headroom", default=1.5, type=float, help="Budget multiplier.")
+@click.option(
+    "--scale",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Multiply the time budgets by this, "
+    "instead of scaling them by the baseline start up time.",
+)
+def main(
+    repeat: int,
+    name_filter: str,
+    budget_path: pathlib.Path,
+    top: int,
+    save: bool,
+    headroom: float,
+    scale: typing.Optional[float],
+):
+    """Benchmark the program start up and check the budget."""
+    baseline = measure(baseline_command(), repeat)
+    click.echo(
+        f"{baseline.name:<32} {baseline.wall_seconds * 1000:>8.1f} ms wall "
+        f"{baseline.cpu_seconds * 1000:>8.1f} ms cpu "
+        f"{baseline.peak_rss_kib:>8} KiB rss"
+    )
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for command in commands(pathlib.Path(work_dir)):
+            if name_filter not in command.name:
+                continue
+            result = measure(command, repeat)
+            results.append(result)
+            click.echo(
+                f"{result.name:<32} {result.wall_seconds * 1000:>8.1f} ms wall "
+                f"{result.cpu_seconds * 1000:>8.1f} ms cpu "
+                f"{result.peak_rss_kib:>8} KiB rss "
+                f"{result.import_seconds * 1000:>8.1f} ms imports "
+                f"(exit {result.exit_code})"
+            )
+
+    if top > 0 and results:
+        slowest = max(results, key=lambda i: i.import_seconds)
+        click.echo(f"\nSlowest module imports for '{slowest.name}':")
+        for item in sorted(slowest.imports, key=lambda i: -i.self_time)[:top]:
+            click.echo(
+                f"{item.self_time * 1000:>8.1f} ms self "
+                f"{item.cumulative * 1000:>8.1f} ms total  {item.name.strip()}"
+            )
+
+    if save:
+        budget = build_budget(results, headroom, baseline)
+        budget_path.write_text(json.dumps(budget, indent=2, sort_keys=True) + "\n")
+        click.echo(f"Saved budget to '{budget_path}'.")
+        return
+
+    budget = json.loads(budget_path.read_text()) if budget_path.exists() else {}
+    if scale is None:
+        scale = machine_scale(budget, baseline)
+    click.echo(f"Time budgets scaled by {scale:.2f} for this machine.")
+    exceeded = check_budget(results, budget, scale, baseline)
+    for item in exceeded:
+        click.echo(f"Over budget: {item}", err=True)
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == "__main__":
+    main()
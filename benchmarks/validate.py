@@ -0,0 +1,173 @@
+"""Benchmarks for the cost of run-time type checking.
+
+Runs each validation policy in a new interpreter, because the policy is
+applied when the agent is imported. Records the time to import the models
+and io modules of all services, and the time per item to build models
+in the loops that collectors run.
+
+Run from the repository root:
+
+    python -m benchmarks.validate
+"""
+
+import dataclasses
+import datetime
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+import beartype
+import click
+from beartype import typing
+
+SOURCE_PATH = pathlib.Path(__file__).parent.parent / "src"
+POLICIES = ["all", "boundary", "none"]
+
+_SERVICES = [
+    "alert_manager",
+    "consul",
+    "disk",
+    "docker",
+    "network",
+    "prometheus",
+    "server",
+    "statuscake",
+    "systemd",
+    "web",
+]
+
+
+@beartype.beartype
+@dataclasses.dataclass
+class PolicyMeasurement:
+    """The import time and the time per item for a validation policy."""
+
+    policy: str
+    import_seconds: float
+    item_seconds: typing.Dict[str, float]
+
+
+def _process_result(i: int):
+    from server_monitor_agent.service.server import model as server_model
+
+    return server_model.ProcessResult(
+        exit_code=0,
+        user="www-data",
+        pid=1000 + i,
+        cpu_percent=1.5,
+        mem_percent=0.25,
+        vms=209715200,
+        rss=31457280,
+        cmdline=f"/usr/bin/python3 -m worker --id={i}",
+        cpu_usable_count=4,
+    )
+
+
+def _consul_check(i: int):
+    from server_monitor_agent.service.consul import model as consul_model
+
+    return consul_model.ConsulHealthCheckStateItem.from_dict(
+        {
+            "Node": f"node{i % 50}",
+            "CheckID": f"service:app{i}",
+            "Name": f"Service 'app{i}' check",
+            "Status": "passing",
+            "Notes": "",
+            "Output": "HTTP GET http://localhost:8080/health: 200 OK",
+            "ServiceID": f"app{i}",
+            "ServiceName": f"app{i % 50}",
+            "ServiceTags": ["application"],
+            "Namespace": "default",
+        }
+    )
+
+
+def _agent_item(i: int):
+    from server_monitor_agent.agent import model as agent_model
+
+    return agent_model.AgentItem(
+        summary="Process running",
+        description=f"Process worker{i} is running.",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="processes",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name="passing",
+        service_name="processes",
+    )
+
+
+SCENARIOS: typing.Dict[str, typing.Callable[[int], typing.Any]] = {
+    "process-result": _process_result,
+    "consul-check-from-dict": _consul_check,
+    "agent-item": _agent_item,
+}
+
+
+def _measure_here(count: int) -> typing.Dict[str, typing.Any]:
+    """Measure in this interpreter, with the policy from the environment."""
+    start = time.perf_counter()
+    for service in _SERVICES:
+        __import__(f"server_monitor_agent.service.{service}.model")
+        __import__(f"server_monitor_agent.service.{service}.io")
+    import_seconds = time.perf_counter() - start
+
+    item_seconds = {}
+    for name, build in SCENARIOS.items():
+        build(0)
+        start = time.perf_counter()
+        for i in range(count):
+            build(i)
+        item_seconds[name] = (time.perf_counter() - start) / count
+
+    return {"import_seconds": import_seconds, "item_seconds": item_seconds}
+
+
+@beartype.beartype
+def measure(policy: str, count: int = 10000) -> PolicyMeasurement:
+    """Measure a validation policy in a new interpreter."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SOURCE_PATH),
+        "SERVER_MONITOR_AGENT_VALIDATE": policy,
+    }
+    code = (
+        "import json; from benchmarks import validate; "
+        f"print(json.dumps(validate._measure_here({count})))"
+    )
+    cwd = SOURCE_PATH.parent
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return PolicyMeasurement(policy=policy, **json.loads(output))
+
+
+@click.command()
+@click.option("-c", "--count", default=10000, type=click.IntRange(min=1))
+def main(count: int):
+    """Compare the validation policies."""
+    results = [measure(policy, count) for policy in POLICIES]
+    names = list(SCENARIOS)
+
+    click.echo(f"{'':<32} " + " ".join(f"{i.policy:>10}" for i in results))
+    click.echo(
+        f"{'import (ms)':<32} "
+        + " ".join(f"{i.import_seconds * 1000:>10.1f}" for i in results)
+    )
+    for name in names:
+        click.echo(
+            f"{name + ' (us/item)':<32} "
+            + " ".join(f"{i.item_seconds[name] * 1e6:>10.2f}" for i in results)
+        )
+
+
+if __name__ == "__main__":
+    main()
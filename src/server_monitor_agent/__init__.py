@@ -1 +1,4 @@
-#
+import time
+
+IMPORT_START = time.perf_counter()
+"""When the package started to be imported, used to time the command imports."""
@@ -0,0 +1,252 @@
+"""A status board of the latest result of each check, in a memory-mapped file.
+
+The scheduler publishes each check result to the board with the 'status-board'
+send target. A consul script check can then read a result with the
+'server-monitor-agent-status' entry point, which maps the file, copies one
+record and exits with the stored code. The reader only uses the standard
+library, so it starts and finishes in a few milliseconds:
+
+    server-monitor-agent-status /run/server-monitor-agent/board cpu
+
+The file has a header, then a table of fixed-size records.
+Each record has a sequence number that is odd while the record is being written.
+Readers copy the record without a lock, and copy it again if the sequence
+number was odd or changed while they copied it (a seqlock).
+Writers hold an exclusive lock on the file, so there is one writer at a time.
+
+This module must not import click, requests, psutil or the agent models.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import typing
+
+MAGIC = b"SMAB"
+VERSION = 1
+
+CAPACITY = 64
+"""The default number of records in a new board."""
+
+CHECK_ID_BYTES = 64
+TEXT_BYTES = 920
+
+EXIT_UNKNOWN = 3
+"""The exit code when there is no usable result for a check."""
+
+READ_ATTEMPTS = 1000
+
+_HEADER = struct.Struct("<4sHHII")
+_HEADER_SIZE = 64
+# sequence, check id, exit code, updated time, text length, text
+_RECORD = struct.Struct(f"<Q{CHECK_ID_BYTES}sid H{TEXT_BYTES}s")
+_SEQUENCE = struct.Struct("<Q")
+
+
+class BoardRecord(typing.NamedTuple):
+    """The latest result of a check."""
+
+    check_id: str
+    exit_code: int
+    updated: float
+    text: str
+
+
+def _record_offset(index: int) -> int:
+    return _HEADER_SIZE + index * _RECORD.size
+
+
+def _read_header(view: mmap.mmap) -> int:
+    """Check the header, and get the number of records."""
+    if len(view) < _HEADER_SIZE:
+        raise ValueError("Status board file is too small.")
+    magic, version, _, record_size, capacity = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION or record_size != _RECORD.size:
+        raise ValueError("Not a status board file, or an unsupported version.")
+    if len(view) < _record_offset(capacity):
+        raise ValueError("Status board file is incomplete.")
+    return capacity
+
+
+def _encode_text(text: str) -> bytes:
+    """Encode text to fit in a record, without splitting a character."""
+    content = text.encode("utf8")
+    if len(content) > TEXT_BYTES:
+        content = content[:TEXT_BYTES].decode("utf8", "ignore").encode("utf8")
+    return content
+
+
+def _check_id_bytes(check_id: str) -> bytes:
+    content = check_id.encode("utf8")
+    if not content or len(content) > CHECK_ID_BYTES or b"\0" in content:
+        raise ValueError(
+            f"Check id must be 1 to {CHECK_ID_BYTES} bytes, "
+            f"without null characters: '{check_id}'."
+        )
+    return content
+
+
+def validate_check_id(check_id: str) -> str:
+    """Check that a check id fits in a record. Returns the check id."""
+    _check_id_bytes(check_id)
+    return check_id
+
+
+def default_check_id(name: str) -> str:
+    """Make a check id from a name, such as the check and service names.
+    A name that is too long is cut short, and ends with a hash of the name
+    so that different names still have different ids."""
+    check_id = re.sub(r"[^A-Za-z0-9_.]+", "-", name).strip("-")
+    if len(check_id) > CHECK_ID_BYTES:
+        digest = hashlib.sha1(name.encode("utf8")).hexdigest()[:8]
+        check_id = f"{check_id[:CHECK_ID_BYTES - len(digest) - 1]}-{digest}"
+    return check_id
+
+
+@contextlib.contextmanager
+def _open_for_write(path: str, capacity: int):
+    """Open, and create if needed, the board file for writing, holding the lock."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if os.fstat(fd).st_size == 0:
+            os.ftruncate(fd, _record_offset(capacity))
+            header = _HEADER.pack(MAGIC, VERSION, 0, _RECORD.size, capacity)
+            os.pwrite(fd, header, 0)
+        with mmap.mmap(fd, 0) as view:
+            yield view
+    finally:
+        os.close(fd)
+
+
+def publish(
+    path: str,
+    check_id: str,
+    exit_code: int,
+    text: str,
+    updated: typing.Optional[float] = None,
+    capacity: int = CAPACITY,
+) -> None:
+    """Write the latest result of a check to the board.
+    The record for the check is replaced, or the first empty record is used."""
+    key = _check_id_bytes(check_id)
+    content = _encode_text(text)
+    updated = time.time() if updated is None else updated
+
+    with _open_for_write(path, capacity) as view:
+        count = _read_header(view)
+        index = None
+        for i in range(count):
+            stored = _RECORD.unpack_from(view, _record_offset(i))[1].rstrip(b"\0")
+            if stored == key:
+                index = i
+                break
+            if not stored and index is None:
+                index = i
+        if index is None:
+            raise ValueError(
+                f"Status board '{path}' has no room for check '{check_id}'."
+            )
+
+        offset = _record_offset(index)
+        (sequence,) = _SEQUENCE.unpack_from(view, offset)
+        sequence += 1 if sequence % 2 == 0 else 0
+        # an odd sequence marks the record as being written
+        _SEQUENCE.pack_into(view, offset, sequence)
+        _RECORD.pack_into(
+            view, offset, sequence, key, exit_code, updated, len(content), content
+        )
+        _SEQUENCE.pack_into(view, offset, sequence + 1)
+
+
+def read_view(view: mmap.mmap, check_id: str) -> typing.Optional[BoardRecord]:
+    """Copy the record for a check from a mapped board.
+    Returns None if there is no record for the check."""
+    key = _check_id_bytes(check_id)
+    count = _read_header(view)
+    for i in range(count):
+        offset = _record_offset(i)
+        for _ in range(READ_ATTEMPTS):
+            before = _SEQUENCE.unpack_from(view, offset)[0]
+            if before % 2:
+                continue
+            end = offset + _RECORD.size
+            record = view[offset:end]
+            if _SEQUENCE.unpack_from(view, offset)[0] == before:
+                break
+        else:
+            raise ValueError(f"Could not read status board record {i}.")
+
+        _, stored, exit_code, updated, length, text = _RECORD.unpack(record)
+        stored = stored.rstrip(b"\0")
+        if not stored:
+            # records are used in order, so the rest are empty
+            return None
+        if stored == key:
+            return BoardRecord(
+                check_id=check_id,
+                exit_code=exit_code,
+                updated=updated,
+                text=text[:length].decode("utf8", "replace"),
+            )
+    return None
+
+
+def read(path: str, check_id: str) -> typing.Optional[BoardRecord]:
+    """Read the latest result of a check from a board file."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            return read_view(view, check_id)
+
+
+_USAGE = "Usage: server-monitor-agent-status [--max-age SECONDS] PATH CHECK_ID"
+
+
+def main(args: typing.Optional[typing.List[str]] = None) -> int:
+    """Print the latest result of a check, and exit with the stored code.
+    A missing result, or one older than '--max-age', exits with code 3."""
+    args = list(sys.argv[1:] if args is None else args)
+    if args[:1] in (["-h"], ["--help"]):
+        print(_USAGE)
+        return 0
+
+    max_age = None
+    if len(args) == 4 and args[0] == "--max-age":
+        try:
+            max_age = float(args[1])
+        except ValueError:
+            print(_USAGE, file=sys.stderr)
+            return 2
+        args = args[2:]
+    if len(args) != 2 or args[0].startswith("-"):
+        print(_USAGE, file=sys.stderr)
+        return 2
+
+    path, check_id = args
+    try:
+        record = read(path, check_id)
+    except (OSError, ValueError) as e:
+        print(f"Could not read status board '{path}': {e}")
+        return EXIT_UNKNOWN
+
+    if record is None:
+        print(f"No result for check '{check_id}'.")
+        return EXIT_UNKNOWN
+
+    age = time.time() - record.updated
+    if max_age is not None and age > max_age:
+        print(f"The result for check '{check_id}' is {age:.0f}s old.")
+        return EXIT_UNKNOWN
+
+    print(record.text)
+    return record.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""A cache of the agent items collected by checks that are slow to run.
+
+Each cache entry holds the agent items collected for one set of collect args,
+in the binary wire format. The entry is keyed by the collect args type and
+field values, so the same check with the same options uses the same entry.
+
+An entry that is younger than the TTL is used instead of running the check.
+A stale entry is still used, then the check is run once more to refresh it.
+Only one process refreshes an entry at a time. Other processes that find the
+entry stale use it without waiting. An entry that is older than
+'CACHE_STALE_FACTOR' TTLs is not used, and the check is run before sending.
+"""
+
+import contextlib
+import dataclasses
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+    wire as agent_wire,
+)
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".bin"
+LOCK_SUFFIX = ".lock"
+
+CACHE_STALE_FACTOR = 4
+"""Stale entries older than this many TTLs are not used."""
+
+
+@agent_validate.checked
+def cache_key(collect_args: agent_model.CollectArgs) -> str:
+    """Get a stable key for the collect args type and field values."""
+    cls = type(collect_args)
+    content = json.dumps(
+        [
+            CACHE_VERSION,
+            agent_op.get_version(),
+            f"{cls.__module__}:{cls.__qualname__}",
+            dataclasses.asdict(collect_args),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(content.encode("utf8")).hexdigest()[:32]
+
+
+class ResultCache:
+    """A directory of cached agent items, one file for each set of collect args."""
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        ttl: float,
+        clock: typing.Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+
+    def collect(
+        self,
+        collect_args: agent_model.CollectArgs,
+        collect: typing.Callable[
+            [agent_model.CollectArgs], typing.Iterable[agent_model.AgentItem]
+        ],
+    ) -> typing.Iterator[agent_model.AgentItem]:
+        """Get the agent items for the collect args from the cache,
+        or by running 'collect'.
+        A stale entry is refreshed after its items have been used."""
+        key = cache_key(collect_args)
+        entry = self._read(key)
+        if entry is not None:
+            age, items = entry
+            if age < self.ttl:
+                agent_op.log_msg(logging.DEBUG, f"Using cached items {key}.")
+                yield from items
+                return
+            if age < self.ttl * CACHE_STALE_FACTOR:
+                agent_op.log_msg(logging.DEBUG, f"Using stale cached items {key}.")
+                yield from items
+                self._refresh(key, collect_args, collect)
+                return
+
+        # wait for any other process collecting the same items, then use theirs
+        with self._lock(key, blocking=True):
+            entry = self._read(key)
+            if entry is not None and entry[0] < self.ttl:
+                items = entry[1]
+            else:
+                items = self._collect(key, collect_args, collect)
+        yield from items
+
+    def _refresh(
+        self,
+        key: str,
+        collect_args: agent_model.CollectArgs,
+        collect: typing.Callable,
+    ) -> None:
+        with self._lock(key, blocking=False) as locked:
+            if not locked:
+                agent_op.log_msg(
+                    logging.DEBUG, f"Cached items {key} are already being refreshed."
+                )
+                return
+            entry = self._read(key)
+            if entry is not None and entry[0] < self.ttl:
+                return
+            try:
+                self._collect(key, collect_args, collect)
+            except Exception as e:
+                agent_op.log_msg(
+                    logging.WARNING,
+                    f"Could not refresh cached items {key}: "
+                    f"'{e.__class__.__name__}': {e}",
+                )
+
+    def _collect(
+        self,
+        key: str,
+        collect_args: agent_model.CollectArgs,
+        collect: typing.Callable,
+    ) -> typing.List[agent_model.AgentItem]:
+        items = list(collect(collect_args))
+        try:
+            content = agent_wire.encode(items)
+        except ValueError as e:
+            agent_op.log_msg(logging.DEBUG, f"Could not cache items {key}: {e}")
+            return items
+
+        # write to a new file, then replace, so readers do not see a partial entry
+        try:
+            fd, temp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+                os.replace(temp, self.path / f"{key}{CACHE_SUFFIX}")
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except OSError as e:
+            agent_op.log_msg(logging.DEBUG, f"Could not cache items {key}: {e}")
+        return items
+
+    def _read(
+        self, key: str
+    ) -> typing.Optional[typing.Tuple[float, typing.List[agent_model.AgentItem]]]:
+        path = self.path / f"{key}{CACHE_SUFFIX}"
+        try:
+            with path.open("rb") as f:
+                age = self.clock() - os.fstat(f.fileno()).st_mtime
+                items = list(agent_wire.read_items(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            agent_op.log_msg(logging.DEBUG, f"Ignoring cached items {key}: {e}")
+            return None
+        return age, items
+
+    @contextlib.contextmanager
+    def _lock(self, key: str, blocking: bool):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with (self.path / f"{key}{LOCK_SUFFIX}").open("a") as f:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(f.fileno(), flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
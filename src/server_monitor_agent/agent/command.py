@@ -1,16 +1,25 @@
 from __future__ import annotations
+
+import functools
 import logging
+import signal
+import threading
 from pathlib import Path
 
 import click
 from beartype.typing import Optional
 
+import server_monitor_agent
 import server_monitor_agent.agent.model
 from server_monitor_agent.agent import (
+    config as agent_config,
     io as agent_io,
     model as agent_model,
     operation as agent_op,
+    profile as agent_profile,
     registry as agent_registry,
+    resources as agent_resources,
+    schedule as agent_schedule,
 )
 
 logger = logging.getLogger(agent_model.APP_NAME_UNDER)
@@ -37,33 +46,182 @@ logger = logging.getLogger(agent_model.APP_NAME_UNDER)
     "-c",
     "--config",
     "config_file",
-    type=click.Path(),
+    type=click.Path(path_type=Path),
     help="Provide a config file.",
 )
+@click.option(
+    "--spool-dir",
+    "spool_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Keep notifications in this directory until they are sent, "
+    "and retry notifications that could not be sent.",
+)
+@click.option(
+    "--cache-ttl",
+    "cache_ttl",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Use the items collected by the same check within this many seconds, "
+    "instead of running the check. Stale items are sent, then the check runs again.",
+)
+@click.option(
+    "--cache-dir",
+    "cache_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Keep the cached items in this directory. "
+    "Defaults to a directory in the user's cache directory.",
+)
+@click.option(
+    "--send-timeout",
+    "send_timeout",
+    default=120.0,
+    type=click.FloatRange(min=0, min_open=True),
+    help="When sending to more than one target, stop waiting for a target "
+    "after this many seconds, including delivering buffered output. "
+    "A target that is still sending is left to finish in the background.",
+)
+@click.option(
+    "--profile/--no-profile",
+    "profile",
+    default=False,
+    type=bool,
+    help="Show the time taken by each stage when finished.",
+)
+@click.option(
+    "--profile-file",
+    "profile_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the time taken by each stage to this json file.",
+)
 @click.version_option(version=agent_op.get_version())
 @click.pass_context
 def cli(
     ctx: click.Context,
     debug: bool,
     config_file: Optional[Path] = None,
+    spool_dir: Optional[Path] = None,
+    cache_ttl: Optional[float] = None,
+    cache_dir: Optional[Path] = None,
+    send_timeout: Optional[float] = None,
+    profile: bool = False,
+    profile_file: Optional[Path] = None,
 ):
     ctx.obj = server_monitor_agent.agent.model.CliArgs(
-        debug=debug, config_file=config_file
+        debug=debug,
+        config_file=config_file,
+        spool_dir=spool_dir,
+        cache_dir=cache_dir,
+        cache_ttl=cache_ttl,
+        send_timeout=send_timeout,
+        profile=profile,
+        profile_file=profile_file,
     )
 
+    # record the stages, and report them after any buffered output is delivered
+    if profile or profile_file:
+        agent_profile.enable()
+        ctx.call_on_close(functools.partial(agent_profile.finish, profile_file))
+
     # set the logger level from the cli parameter
     if debug:
         logger.setLevel(logging.DEBUG)
 
+    # load the config file and set as the defaults, before running anything
+    if ctx.obj.config_file:
+        try:
+            config = agent_config.load(ctx.obj.config_file, ctx.command)
+        except ValueError as e:
+            raise click.BadParameter(str(e), ctx=ctx, param_hint="'--config'")
+        resources = config.pop(agent_resources.CONFIG_KEY, None)
+        if resources is not None:
+            agent_resources.apply(agent_model.ResourceSettings(**resources))
+        ctx.default_map = {**(ctx.default_map or {}), **config}
+
     agent_io.check_collect_context(ctx)
 
-    # load the config file and set as the defaults
-    if ctx.obj.config_file:
-        config = agent_op.read_config(ctx.obj.config_file)
-        ctx.default_map = {**ctx.default_map, **config}
+    # deliver any buffered output when the command is finished
+    ctx.call_on_close(agent_op.run_flush)
+
+
+@cli.command(
+    name="schedule",
+    help="Run the checks in a manifest file from this process, each on its own "
+    "interval. A check that is still running when it is due again is skipped.",
+    short_help="Run checks on a schedule.",
+)
+@click.option(
+    "-m",
+    "--manifest",
+    "manifest_file",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="The yaml file with the checks to run.",
+)
+@click.option(
+    "--max-concurrent",
+    "max_concurrent",
+    type=click.IntRange(min=1),
+    help="Run no more than this many checks at once. Overrides the manifest.",
+)
+@click.option(
+    "--duration",
+    "duration",
+    type=click.FloatRange(min=0),
+    help="Stop after this many seconds. Runs until stopped by default.",
+)
+@click.pass_context
+def schedule(
+    ctx: click.Context,
+    manifest_file: Path,
+    max_concurrent: Optional[int] = None,
+    duration: Optional[float] = None,
+):
+    try:
+        manifest = agent_schedule.read_manifest(manifest_file)
+    except ValueError as e:
+        raise click.BadParameter(str(e), ctx=ctx, param_hint="'--manifest'")
+    if max_concurrent:
+        manifest.max_concurrent = max_concurrent
+
+    # each check runs in the scheduler's context, so the top level options,
+    # logging, profiling and resource limits are set up once, by the scheduler
+    root_ctx = ctx.find_root()
+
+    def run_check(check) -> None:
+        name, *args = check.args
+        group = cli.get_command(root_ctx, name)
+        if group is None:
+            raise ValueError(f"Unknown command '{name}'.")
+        try:
+            # the collect runs when the send commands are finished, see 'send_chain'
+            with group.make_context(name, args, parent=root_ctx) as collect_ctx:
+                group.invoke(collect_ctx)
+        except click.exceptions.Exit as e:
+            if e.exit_code:
+                raise ValueError(f"Exited with code {e.exit_code}.") from e
+        finally:
+            # buffered output is registered by the thread that ran the check
+            agent_op.run_flush()
+
+    # stop starting checks when asked to stop, and finish the running checks
+    scheduler = agent_schedule.Scheduler(manifest, run_check)
+    previous = None
+    if threading.current_thread() is threading.main_thread():
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.run(duration)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        if previous is not None:
+            signal.signal(signal.SIGTERM, previous)
+
+    counts = ", ".join(f"{k} {v}" for k, v in sorted(scheduler.counts.items()))
+    agent_op.log_msg(logging.INFO, f"Scheduler stopped: {counts or 'no checks run'}.")
 
 
 # gather and register cli commands
 cmd_reg = agent_registry.CommandRegistry()
 cmd_reg.gather()
-cmd_reg.run(cli)
+cmd_reg.run(cli, agent_io.send_chain)
+
+agent_profile.record("import", server_monitor_agent.IMPORT_START, __name__)
@@ -0,0 +1,188 @@
+"""Loading the config file.
+
+The config file is yaml that provides the defaults for the cli commands.
+The top level has the names of the collect commands. Each of these has the
+options for the collect command, and the names of send commands with their options:
+
+    disk:
+      threshold: 90
+      stream-output:
+        format: agent-item
+
+Options can be given by their name or their long option.
+The 'resources' section sets limits on the resources used by the agent
+(see the resources module).
+The config is checked against the commands, and normalised to the option names.
+
+The checked config is cached in a binary file, with the path, modified time,
+size and inode of the config file. The cache is used while the config file does
+not change, so the yaml is not parsed and checked for every run.
+"""
+
+import dataclasses
+import hashlib
+import logging
+import marshal
+import os
+import pathlib
+import tempfile
+
+import click
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    operation as agent_op,
+    resources as agent_resources,
+    validate as agent_validate,
+)
+
+CACHE_VERSION = 1
+MARSHAL_VERSION = 4
+
+
+@agent_validate.checked
+def cache_dir() -> pathlib.Path:
+    """Get the directory for cached configs."""
+    return agent_op.cache_dir("config")
+
+
+@agent_validate.checked
+def load(
+    path: pathlib.Path,
+    command: click.Command,
+    cache: typing.Optional[pathlib.Path] = None,
+) -> typing.Dict[str, typing.Any]:
+    """Get the checked and normalised config for the commands from a config file.
+    Uses the cached config in the 'cache' directory if the file has not changed."""
+    try:
+        stat = path.stat()
+    except OSError as e:
+        raise ValueError(f"Could not read config file '{path}': {e}") from e
+
+    path = path.resolve()
+    key = (
+        CACHE_VERSION,
+        agent_op.get_version(),
+        str(path),
+        stat.st_mtime_ns,
+        stat.st_size,
+        stat.st_ino,
+    )
+    cache_path = _cache_path(cache or cache_dir(), path)
+
+    config = _read_cache(cache_path, key)
+    if config is not None:
+        agent_op.log_msg(logging.DEBUG, f"Using cached config for '{path}'.")
+        return config
+
+    try:
+        content = agent_op.read_config(path)
+    except Exception as e:
+        raise ValueError(f"Could not read config file '{path}': {e}") from e
+
+    config = normalise(content, command)
+    _write_cache(cache_path, key, config)
+    return config
+
+
+@agent_validate.checked
+def normalise(
+    config: typing.Any, command: click.Command, where: typing.Tuple[str, ...] = ()
+) -> typing.Dict[str, typing.Any]:
+    """Check the config against the options and sub-commands of a command,
+    and use the option names as the keys."""
+    location = " ".join(where) or "the top level"
+    if config is None:
+        return {}
+    if not isinstance(config, dict):
+        raise ValueError(
+            f"Config for {location} must be a mapping, "
+            f"not '{type(config).__name__}'."
+        )
+
+    params = {}
+    for param in command.params:
+        if not param.expose_value or not where:
+            # the top level options are read before the config
+            continue
+        names = [param.name] + [i.lstrip("-") for i in param.opts if i.startswith("--")]
+        for name in names:
+            params[name] = param
+            params[name.replace("-", "_")] = param
+            params[name.replace("_", "-")] = param
+
+    commands = getattr(command, "commands", {})
+    ctx = click.Context(command)
+
+    result = {}
+    for key, value in config.items():
+        key = str(key)
+        if not where and key == agent_resources.CONFIG_KEY:
+            settings = agent_resources.read_settings(value)
+            result[key] = dataclasses.asdict(settings)
+            continue
+        if key in commands:
+            result[key] = normalise(value, commands[key], (*where, key))
+            continue
+
+        param = params.get(key)
+        if param is None:
+            available = sorted({i.name for i in params.values()} | set(commands))
+            if not where:
+                available.append(agent_resources.CONFIG_KEY)
+            raise ValueError(
+                f"Config for {location} has an unknown option or command. "
+                f"{agent_op.make_options('name', key, available)}"
+            )
+
+        try:
+            param.type_cast_value(ctx, value)
+        except (click.BadParameter, TypeError, ValueError) as e:
+            message = getattr(e, "message", str(e))
+            raise ValueError(
+                f"Config for {location} has an invalid '{key}': {message}"
+            ) from e
+        result[param.name] = value
+
+    return result
+
+
+def _cache_path(directory: pathlib.Path, path: pathlib.Path) -> pathlib.Path:
+    name = hashlib.sha256(str(path).encode("utf8")).hexdigest()[:32]
+    return directory / f"{name}.bin"
+
+
+def _read_cache(
+    cache_path: pathlib.Path, key: typing.Tuple
+) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    try:
+        cached_key, config = marshal.loads(cache_path.read_bytes())
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if cached_key != key or not isinstance(config, dict):
+        return None
+    return config
+
+
+def _write_cache(
+    cache_path: pathlib.Path, key: typing.Tuple, config: typing.Dict[str, typing.Any]
+) -> None:
+    try:
+        content = marshal.dumps((key, config), MARSHAL_VERSION)
+    except ValueError:
+        agent_op.log_msg(logging.DEBUG, "Config has values that cannot be cached.")
+        return
+
+    # write to a new file, then replace, so readers do not see a partial cache
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp, cache_path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+    except OSError as e:
+        agent_op.log_msg(logging.DEBUG, f"Could not cache config: {e}")
@@ -1,10 +1,18 @@
+import io
 import json
 
 import yaml
+from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    profile as agent_profile,
+    wire as agent_wire,
+)
 
 
+@agent_profile.timed("convert")
 def from_agent_item(
     item: agent_model.AgentItem, data_type: str
 ) -> agent_model.ExternalItem:
@@ -25,33 +33,41 @@ def from_agent_item(
     agent_op.raise_options("data type", data_type, options.keys())
 
 
+@agent_profile.timed("convert")
 def to_agent_item(
-    item: agent_model.ExternalItem, data_type: str
+    item: typing.Union[agent_model.ExternalItem, typing.Dict], data_type: str
 ) -> agent_model.AgentItem:
     from server_monitor_agent.service.alert_manager import model as alert_model
     from server_monitor_agent.service.consul import model as consul_model
 
     options = {
-        agent_model.AgentItem.data_type_name(),
-        alert_model.AlertManagerItem.data_type_name(),
-        consul_model.ConsulWatchCheckItem.data_type_name(),
-        consul_model.ConsulHealthCheckStateItem.data_type_name(),
+        agent_model.AgentItem.data_type_name(): agent_model.AgentItem,
+        alert_model.AlertManagerItem.data_type_name(): alert_model.AlertManagerItem,
+        consul_model.ConsulWatchCheckItem.data_type_name(): (
+            consul_model.ConsulWatchCheckItem
+        ),
+        consul_model.ConsulHealthCheckStateItem.data_type_name(): (
+            consul_model.ConsulHealthCheckStateItem
+        ),
     }
 
-    for name in options:
+    for name, cls in options.items():
         if data_type == name:
+            if isinstance(item, dict):
+                item = cls.from_dict(item)
             return item.to_agent_item()
 
-    agent_op.raise_options("data type", data_type, options)
+    agent_op.raise_options("data type", data_type, options.keys())
 
 
+@agent_profile.timed("convert")
 def from_content(content: str, serialise_format: str) -> agent_model.ExternalItem:
     if not serialise_format:
         raise ValueError("Must provide serialise format.")
 
     options = {
-        "json": json.loads,
-        "yaml": yaml.safe_load,
+        agent_model.SERIALISE_JSON: json.loads,
+        agent_model.SERIALISE_YAML: yaml.safe_load,
     }
 
     for fmt, func in options.items():
@@ -61,14 +77,127 @@ def from_content(content: str, serialise_format: str) -> agent_model.ExternalIte
     agent_op.raise_options("serialise format", serialise_format, options.keys())
 
 
-def to_content(item: agent_model.ExternalItem, serialise_format: str) -> str:
+@agent_profile.timed("convert")
+def to_content(
+    item: agent_model.ExternalItem, serialise_format: str
+) -> typing.Union[str, bytes]:
     options = {
-        "json": json.dumps,
-        "yaml": yaml.safe_dump,
+        agent_model.SERIALISE_JSON: lambda i: json.dumps(_content_dict(i)),
+        agent_model.SERIALISE_YAML: lambda i: yaml.safe_dump(_content_dict(i)),
+        agent_model.SERIALISE_NDJSON: lambda i: f"{json.dumps(_content_dict(i))}\n",
+        agent_model.SERIALISE_BINARY: lambda i: agent_wire.encode([_wire_item(i)]),
     }
 
     for fmt, func in options.items():
         if fmt == serialise_format:
-            return func(item.to_dict())
+            return func(item)
 
     agent_op.raise_options("serialise format", serialise_format, options.keys())
+
+
+@agent_profile.timed("convert")
+def from_serialised(
+    content: typing.Union[str, bytes], serialise_format: str, data_type: str
+) -> agent_model.AgentItem:
+    """Build an agent item from content in a serialise format."""
+    if serialise_format == agent_model.SERIALISE_JSON:
+        return from_json(content, data_type)
+
+    if serialise_format in agent_model.SERIALISE_STREAMS:
+        if isinstance(content, str):
+            content = content.encode("utf8")
+        items = list(iter_serialised(io.BytesIO(content), serialise_format, data_type))
+        if len(items) != 1:
+            raise ValueError(f"Expected one agent item, got {len(items)}.")
+        return items[0]
+
+    if isinstance(content, bytes):
+        content = content.decode("utf8")
+    return to_agent_item(from_content(content, serialise_format), data_type)
+
+
+def iter_serialised(
+    stream: io.BufferedIOBase,
+    serialise_format: str,
+    data_type: str,
+    max_bytes: int = agent_model.SERIALISE_ITEM_MAX_BYTES,
+) -> typing.Iterator[agent_model.AgentItem]:
+    """Build agent items from a binary stream, one at a time.
+    The 'ndjson' and 'binary' formats can hold any number of items,
+    each up to 'max_bytes'. The other formats hold one item."""
+    if serialise_format == agent_model.SERIALISE_NDJSON:
+        while True:
+            line = stream.readline(max_bytes + 1)
+            if not line:
+                return
+            if len(line) > max_bytes and not line.endswith(b"\n"):
+                raise ValueError(f"Item is over the limit of {max_bytes} bytes.")
+            if line.strip():
+                yield from_json(line, data_type)
+        return
+
+    if serialise_format == agent_model.SERIALISE_BINARY:
+        if data_type != agent_model.AgentItem.data_type_name():
+            raise ValueError(
+                f"The '{serialise_format}' serialise format "
+                f"only supports the '{agent_model.AgentItem.data_type_name()}' format."
+            )
+        yield from agent_wire.read_items(stream, max_bytes)
+        return
+
+    yield from_serialised(stream.read(), serialise_format, data_type)
+
+
+@agent_profile.timed("convert")
+def to_json_bytes(item: agent_model.ExternalItem) -> bytes:
+    """Encode an item as utf-8 json, without copying the extra data."""
+    return _json_encoder.encode(_content_dict(item)).encode("utf8")
+
+
+@agent_profile.timed("convert")
+def to_ndjson_bytes(items: typing.Iterable[agent_model.ExternalItem]) -> bytes:
+    """Encode items as utf-8 json, one item per line."""
+    encode = _json_encoder.encode
+    return "".join(f"{encode(_content_dict(i))}\n" for i in items).encode("utf8")
+
+
+@agent_profile.timed("convert")
+def from_json(
+    content: typing.Union[str, bytes], data_type: str
+) -> agent_model.AgentItem:
+    """Build an agent item from json.
+    The parsed json is used to build the item, instead of copied."""
+    data = json.loads(content)
+    if data_type == agent_model.AgentItem.data_type_name():
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a json object, got '{type(data).__name__}'.")
+        return agent_model.AgentItem.from_dict(data, copy=False)
+    return to_agent_item(data, data_type)
+
+
+@agent_profile.timed("convert")
+def from_ndjson(
+    content: typing.Union[str, bytes], data_type: str
+) -> typing.List[agent_model.AgentItem]:
+    """Build agent items from json with one item per line."""
+    if isinstance(content, bytes):
+        content = content.decode("utf8")
+    return [from_json(i, data_type) for i in content.splitlines() if i.strip()]
+
+
+_json_encoder = json.JSONEncoder()
+
+
+def _wire_item(item: agent_model.ExternalItem) -> agent_model.AgentItem:
+    if not isinstance(item, agent_model.AgentItem):
+        raise ValueError(
+            f"The '{agent_model.SERIALISE_BINARY}' serialise format "
+            f"only supports the '{agent_model.AgentItem.data_type_name()}' format."
+        )
+    return item
+
+
+def _content_dict(item: agent_model.ExternalItem) -> typing.Dict:
+    if isinstance(item, agent_model.AgentItem):
+        return item.to_dict(deep=False)
+    return item.to_dict()
@@ -2,18 +2,24 @@
 for general use within the agent."""
 
 import logging
+import pathlib
 
-import beartype
 import click
+from beartype import typing
 
 from server_monitor_agent.agent import (
+    cache as agent_cache,
     model as agent_model,
     operation as agent_op,
     registry as agent_reg,
+    spool as agent_spool,
+    validate as agent_validate,
 )
 
+SEND_TARGETS_KEY = f"{agent_model.APP_NAME_UNDER}.send_targets"
 
-@beartype.beartype
+
+@agent_validate.checked(boundary=True)
 def check_collect_context(ctx: click.Context) -> None:
     cub_cmd = ctx.invoked_subcommand
     if cub_cmd is None:
@@ -26,24 +32,90 @@ def check_collect_context(ctx: click.Context) -> None:
     agent_op.log_msg(logging.DEBUG, f"   Obj {ctx.obj}")
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def check_send_context(ctx: click.Context) -> None:
     agent_op.log_msg(logging.DEBUG, f"Running send {ctx.command.name}")
     agent_op.log_msg(logging.DEBUG, f"   Obj {ctx.obj}")
 
 
-@beartype.beartype
+@agent_validate.checked
 def execute_context(send_ctx: click.Context) -> None:
-    send_args = send_ctx.obj
-    collect_ctx = send_ctx.parent
-    collect_args = collect_ctx.obj
-    execute_args(collect_args, send_args)
+    """Add the send args to the targets of the collect.
+    The collect runs once, after all the chained send commands,
+    and each agent item is sent to all the targets."""
+    targets = send_ctx.meta.setdefault(SEND_TARGETS_KEY, [])
+    targets.append(send_ctx.obj)
+
+
+def send_chain(results: typing.List[typing.Any], **kwargs) -> None:
+    """Run the collect and send to the targets given by the chained send commands.
+    This is the result callback of the collect groups."""
+    collect_ctx = click.get_current_context()
+    send_args = collect_ctx.meta.pop(SEND_TARGETS_KEY, [])
+    if not send_args:
+        return
+    _execute_collect(collect_ctx, send_args)
+
+
+@agent_validate.checked
+def execute_now(send_ctx: click.Context) -> None:
+    """Run the collect and send to the target of this send command now.
+    For send commands that run the collect more than once,
+    instead of adding the target to the chain with 'execute_context'."""
+    _execute_collect(send_ctx.parent, [send_ctx.obj])
+
+
+def _execute_collect(
+    collect_ctx: click.Context, send_args: typing.List[agent_model.SendArgs]
+) -> None:
+    cli_args = collect_ctx.find_root().obj
+    execute_args(
+        collect_ctx.obj,
+        send_args,
+        spool_dir=getattr(cli_args, "spool_dir", None),
+        cache_ttl=getattr(cli_args, "cache_ttl", None),
+        cache_dir=getattr(cli_args, "cache_dir", None),
+        send_timeout=getattr(cli_args, "send_timeout", None),
+    )
 
 
-@beartype.beartype
+@agent_validate.checked
 def execute_args(
-    collect_args: agent_model.CollectArgs, send_args: agent_model.SendArgs
+    collect_args: agent_model.CollectArgs,
+    send_args: typing.Union[
+        agent_model.SendArgs, typing.Sequence[agent_model.SendArgs]
+    ],
+    spool_dir: typing.Optional[pathlib.Path] = None,
+    cache_ttl: typing.Optional[float] = None,
+    cache_dir: typing.Optional[pathlib.Path] = None,
+    send_timeout: typing.Optional[float] = None,
 ) -> None:
+    if isinstance(send_args, agent_model.SendArgs):
+        send_args = [send_args]
+
+    # only the io modules for the collect and send args are imported
     io_reg = agent_reg.SourceTargetIORegistry()
-    io_reg.gather()
-    io_reg.run(collect_args, send_args)
+    with agent_op.process_run():
+        if cache_ttl:
+            cache = agent_cache.ResultCache(
+                cache_dir or agent_op.cache_dir("results"), cache_ttl
+            )
+            agent_items = cache.collect(collect_args, io_reg.collect_items)
+        else:
+            agent_items = io_reg.collect_items(collect_args)
+
+        if spool_dir is None:
+            # a target that fails does not stop the other targets
+            errors = io_reg.send_all(send_args, agent_items, send_timeout)
+            if errors:
+                raise ValueError(
+                    f"{len(errors)} sends did not succeed: {'; '.join(errors[:5])}"
+                )
+            return
+
+        # keep each item until it has been sent, then send everything that is due
+        spool = agent_spool.Spool(spool_dir)
+        for agent_item in agent_items:
+            for item in send_args:
+                spool.append(item, agent_item)
+            spool.drain(io_reg.send)
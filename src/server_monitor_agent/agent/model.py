@@ -3,13 +3,16 @@
 import abc
 import dataclasses
 import datetime
+import json
 import logging
 import pathlib
+import sys
 
-import beartype
 import click
 from beartype import typing
 
+from server_monitor_agent.agent import validate as agent_validate
+
 # application
 APP_NAME_DASH = "server-monitor-agent"
 APP_NAME_UNDER = "server_monitor_agent"
@@ -88,6 +91,29 @@ FORMATS = [
     "consul-health-check-state",
 ]
 
+# serialised content
+SERIALISE_JSON = "json"
+SERIALISE_YAML = "yaml"
+SERIALISE_NDJSON = "ndjson"
+SERIALISE_BINARY = "binary"
+SERIALISE_DEFAULT = SERIALISE_JSON
+SERIALISE_FORMATS = [
+    SERIALISE_JSON,
+    SERIALISE_YAML,
+    SERIALISE_NDJSON,
+    SERIALISE_BINARY,
+]
+
+# serialise formats that hold any number of items, read and written one at a time
+SERIALISE_STREAMS = [SERIALISE_NDJSON, SERIALISE_BINARY]
+SERIALISE_ITEM_MAX_BYTES = 16 * 1024 * 1024
+
+# statistics of the metric samples in a window of time
+STATISTIC_MEAN = "mean"
+STATISTIC_MAX = "max"
+STATISTIC_DEFAULT = STATISTIC_MEAN
+STATISTICS = [STATISTIC_MEAN, STATISTIC_MAX, "p50", "p90", "p95", "p99"]
+
 # input and output streams
 STREAM_STDOUT = "stdout"
 STREAM_STDERR = "stderr"
@@ -99,14 +125,54 @@ STREAM_TARGETS = [STREAM_STDOUT, STREAM_STDERR]
 TEXT_CHOOSE_NOTIFICATION = "Choose a notification target from the Commands."
 
 
-@beartype.beartype
+def slotted(cls):
+    """Rebuild a dataclass with '__slots__' for the fields it adds.
+
+    Instances of a slotted class do not have a '__dict__', so they use much less
+    memory when there are thousands of them. Put this decorator between
+    '@agent_validate.checked' and '@dataclasses.dataclass'.
+    This does the same as 'dataclasses.dataclass(slots=True)' from Python 3.10.
+    """
+    inherited = set()
+    for base in cls.__mro__[1:]:
+        slots = base.__dict__.get("__slots__", ())
+        inherited.update([slots] if isinstance(slots, str) else slots)
+
+    names = tuple(i.name for i in dataclasses.fields(cls) if i.name not in inherited)
+    body = {k: v for k, v in cls.__dict__.items() if k not in names}
+    body.pop("__dict__", None)
+    body.pop("__weakref__", None)
+    body["__slots__"] = names
+
+    result = type(cls)(cls.__name__, cls.__bases__, body)
+    result.__qualname__ = cls.__qualname__
+    return result
+
+
+def intern_fields(item: typing.Any, names: typing.Iterable[str]) -> None:
+    """Use the shared copy of the text in the named fields.
+    Text that is repeated in many items, such as status and host names,
+    is then only stored once."""
+    for name in names:
+        value = getattr(item, name)
+        if type(value) is str:
+            object.__setattr__(item, name, sys.intern(value))
+
+
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class CliArgs:
     debug: bool = False
     config_file: typing.Optional[pathlib.Path] = None
+    spool_dir: typing.Optional[pathlib.Path] = None
+    cache_dir: typing.Optional[pathlib.Path] = None
+    cache_ttl: typing.Optional[float] = None
+    send_timeout: typing.Optional[float] = None
+    profile: bool = False
+    profile_file: typing.Optional[pathlib.Path] = None
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class CollectArgs(abc.ABC):
     """Arguments for collecting information."""
@@ -114,7 +180,7 @@ class CollectArgs(abc.ABC):
     pass
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class SendArgs(abc.ABC):
     """Arguments for sending information."""
@@ -122,7 +188,8 @@ class SendArgs(abc.ABC):
     pass
 
 
-@beartype.beartype
+@agent_validate.checked
+@slotted
 @dataclasses.dataclass
 class OpResult(abc.ABC):
     """The result from running an operation."""
@@ -130,44 +197,49 @@ class OpResult(abc.ABC):
     exit_code: int
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class ExternalItem(abc.ABC):
     """A data item for external structured input and output."""
 
+    __slots__ = ()
+
     @classmethod
     @abc.abstractmethod
     def data_type_name(cls):
         raise NotImplementedError("Must implement format_name.")
 
     @abc.abstractmethod
-    @beartype.beartype
+    @agent_validate.checked
     def to_dict(self) -> typing.Dict:
         raise NotImplementedError("Must implement to_dict.")
 
     @classmethod
     @abc.abstractmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_dict(cls, item: typing.Dict) -> "ExternalItem":
         raise NotImplementedError("Must implement from_dict.")
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class AgentItemConvertMixin(abc.ABC):
+    __slots__ = ()
+
     @abc.abstractmethod
-    @beartype.beartype
+    @agent_validate.checked
     def to_agent_item(self) -> "AgentItem":
         raise NotImplementedError("Must implement to_agent_item.")
 
     @classmethod
     @abc.abstractmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_agent_item(cls, item: "AgentItem") -> "ExternalItem":
         raise NotImplementedError("Must implement from_agent_item.")
 
 
-@beartype.beartype
+@agent_validate.checked
+@slotted
 @dataclasses.dataclass
 class AgentItem(ExternalItem, AgentItemConvertMixin):
     """The data required for the agent input and output format."""
@@ -202,13 +274,25 @@ class AgentItem(ExternalItem, AgentItemConvertMixin):
     """Optional key=value entries for arbitrary information.
     This may not be displayed."""
 
+    def __post_init__(self):
+        intern_fields(
+            self,
+            ["host_name", "source_name", "check_name", "status_name", "service_name"],
+        )
+
     @classmethod
     def data_type_name(cls):
         return "agent-item"
 
-    @beartype.beartype
-    def to_dict(self) -> typing.Dict:
-        data = dataclasses.asdict(self)
+    @agent_validate.checked
+    def to_dict(self, deep: bool = True) -> typing.Dict:
+        """Get the item as a dictionary.
+        With 'deep' false, the extra data is used as-is instead of copied.
+        This is faster when the dictionary is only read, such as to encode it."""
+        if deep:
+            data = dataclasses.asdict(self)
+        else:
+            data = {i.name: getattr(self, i.name) for i in dataclasses.fields(self)}
 
         date_fields = ["date"]
         for date_field in date_fields:
@@ -218,24 +302,27 @@ class AgentItem(ExternalItem, AgentItemConvertMixin):
         return data
 
     @classmethod
-    @beartype.beartype
-    def from_dict(cls, item: typing.Dict) -> "AgentItem":
-        raw = {**item}
+    @agent_validate.checked
+    def from_dict(cls, item: typing.Dict, copy: bool = True) -> "AgentItem":
+        """Build an item from a dictionary.
+        With 'copy' false, the dictionary is changed and used,
+        which is faster when it was just parsed."""
+        raw = {**item} if copy else item
         if "date" in raw and raw["date"]:
             raw["date"] = datetime.datetime.fromisoformat(raw["date"])
         return cls(**raw)
 
-    @beartype.beartype
+    @agent_validate.checked
     def to_agent_item(self) -> "AgentItem":
         return self
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_agent_item(cls, item: "AgentItem") -> "ExternalItem":
         return item
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class TextCompare:
     comparison: str
@@ -244,7 +331,7 @@ class TextCompare:
     outcome: bool
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class TextCompareEntry:
     comparison: str
@@ -275,7 +362,7 @@ class TextCompareEntry:
         return [TextCompareEntry(comparison=c, value=v) for c, v in items]
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class NameValueComparisonsEntry:
     name: str
@@ -303,7 +390,102 @@ class NameValueComparisonsEntry:
         return results
 
 
-@beartype.beartype
+@agent_validate.checked
+@dataclasses.dataclass
+class SpoolRecord:
+    """An agent item in the spool waiting to be sent to a target."""
+
+    record_id: str
+    segment: str
+    created: float
+    target: str
+    target_args: typing.Dict[str, typing.Any]
+    item: typing.Dict[str, typing.Any]
+    attempts: int = 0
+    next_attempt: float = 0.0
+    error: typing.Optional[str] = None
+
+    @property
+    def target_key(self) -> str:
+        """Records with the same key are sent to the same place."""
+        return self.target + json.dumps(self.target_args, sort_keys=True)
+
+
+@agent_validate.checked
+@dataclasses.dataclass
+class ProfileSpan:
+    """The time taken by one stage of running the agent."""
+
+    name: str
+    start: float
+    detail: typing.Optional[str] = None
+    duration: typing.Optional[float] = None
+    thread: str = "MainThread"
+    children: typing.List["ProfileSpan"] = dataclasses.field(default_factory=list)
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "name": self.name,
+            "detail": self.detail,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "children": [i.to_dict() for i in self.children],
+        }
+
+
+@agent_validate.checked
+@dataclasses.dataclass
+class ProcessRecord:
+    """The outcome of running a process.
+    A shared record used the result of an identical process that was already run."""
+
+    args: typing.List[str]
+    duration: float
+    exit_code: typing.Optional[int] = None
+    shared: bool = False
+    timed_out: bool = False
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ScheduleCheck:
+    """A check to run every 'interval' seconds.
+    The first run is delayed by up to 'jitter' seconds,
+    by an amount that is the same each time for a host and check."""
+
+    name: str
+    args: typing.List[str]
+    interval: float
+    jitter: float
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ScheduleManifest:
+    """The checks to run on a schedule, and how many can run at the same time."""
+
+    checks: typing.List[ScheduleCheck]
+    max_concurrent: int = 4
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ResourceSettings:
+    """Limits on the host resources used by the agent.
+    Each setting is only applied when it is given."""
+
+    nice: typing.Optional[int] = None
+    io_class: typing.Optional[str] = None
+    io_level: typing.Optional[int] = None
+    cgroup: typing.Optional[str] = None
+    cpu_max: typing.Optional[float] = None
+    memory_max: typing.Optional[int] = None
+    rss_max: typing.Optional[int] = None
+    rss_interval: float = 1.0
+
+
+@agent_validate.checked
 @dataclasses.dataclass
 class RegisterCmd(abc.ABC):
     """Register a command."""
@@ -311,7 +493,7 @@ class RegisterCmd(abc.ABC):
     pass
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class RegisterCollectCmd(RegisterCmd):
     """Register a collect command."""
@@ -319,7 +501,7 @@ class RegisterCollectCmd(RegisterCmd):
     group: click.Group
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class RegisterSendCmd(RegisterCmd):
     """Register a send command."""
@@ -328,7 +510,7 @@ class RegisterSendCmd(RegisterCmd):
     collect_only: typing.Optional[typing.Iterable[str]] = None
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class RegisterIO(abc.ABC):
     """Register an input or output."""
@@ -339,18 +521,21 @@ class RegisterIO(abc.ABC):
 TypeCollectArgs = typing.TypeVar("T", bound=CollectArgs, covariant=True)
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class RegisterCollectInput(RegisterIO):
-    """Register a source input."""
+    """Register a source input.
+    The input can return one agent item, or an iterator of agent items."""
 
-    func: typing.Callable[[TypeCollectArgs], AgentItem]
+    func: typing.Callable[
+        [TypeCollectArgs], typing.Union[AgentItem, typing.Iterator[AgentItem]]
+    ]
 
 
 TypeSendArgs = typing.TypeVar("T", bound=SendArgs, covariant=True)
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class RegisterSendOutput(RegisterCmd):
     """Register a target output."""
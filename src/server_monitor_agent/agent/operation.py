@@ -1,40 +1,456 @@
+import collections
+import contextlib
+import contextvars
+import datetime
+import email.utils
+import fcntl
+import functools
+import json
 import logging
+import os
 import pathlib
+import random
 import subprocess
-import sys
+import threading
+import time
+from concurrent import futures
 
-import beartype
 import click
+import requests
 import yaml
 from beartype import typing
+from requests import adapters
 
 import importlib_resources
 import importlib_metadata
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import (
+    model as agent_model,
+    profile as agent_profile,
+    validate as agent_validate,
+)
 
 logger = logging.getLogger(agent_model.APP_NAME_UNDER)
 
 
-@beartype.beartype
-def execute_process(args: typing.Sequence[str]):
-    """Execute a process using the given args."""
-    try:
-        result = subprocess.run(
-            args,
-            capture_output=True,
-            shell=False,
-            timeout=10,
-            check=False,
-            text=True,
+class _FlushCallbacks(threading.local):
+    """The flush functions registered by the current thread."""
+
+    def __init__(self):
+        self.items: typing.List[typing.Callable[[], None]] = []
+
+
+_flush_callbacks = _FlushCallbacks()
+
+# the libyaml loader is much faster, but is only available if pyyaml was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+PROCESS_LIMIT = 4
+PROCESS_TIMEOUT = 10.0
+PROCESS_STDERR_BYTES = 64 * 1024
+
+
+class ProcessStream:
+    """The output of a process, read as it arrives.
+
+    Iterate to get the decoded lines, or the raw byte chunks.
+    The exit code and stderr are set when the process has finished.
+    """
+
+    def __init__(self, args: typing.Sequence[str], items: typing.Iterator):
+        self.args = list(args)
+        self.returncode: typing.Optional[int] = None
+        self.stderr = ""
+        self.truncated = False
+        self._items = items
+
+    def __iter__(self):
+        return self._items
+
+    @classmethod
+    def from_result(cls, result: subprocess.CompletedProcess) -> "ProcessStream":
+        """Build a stream from the output of a finished process."""
+        stream = cls(result.args, iter((result.stdout or "").splitlines(True)))
+        stream.returncode = result.returncode
+        stream.stderr = result.stderr or ""
+        return stream
+
+
+class _ProcessScope:
+    """The shared results and the records of the processes in one run."""
+
+    def __init__(self):
+        self.results: typing.Dict[typing.Tuple[str, ...], futures.Future] = {}
+        self.values: typing.Dict[typing.Tuple[str, ...], futures.Future] = {}
+        self.records: typing.Deque[agent_model.ProcessRecord] = collections.deque(
+            maxlen=1000
+        )
+
+
+class ProcessRunner:
+    """Runs processes, with a limit on how many run at the same time.
+
+    While a run is active (see `process_run`), processes with the same args
+    share one result instead of running again.
+    Each run has its own results, so runs that overlap do not share results.
+    Outside a run, only processes that are still running are shared.
+    """
+
+    def __init__(self, limit: int = PROCESS_LIMIT):
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._running = _ProcessScope()
+        self._scope: contextvars.ContextVar[typing.Optional[_ProcessScope]] = (
+            contextvars.ContextVar("process_scope", default=None)
+        )
+
+    @property
+    def records(self) -> typing.Deque[agent_model.ProcessRecord]:
+        """The processes run by the current run, or else the last run."""
+        scope = self._scope.get()
+        return self._running.records if scope is None else scope.records
+
+    @contextlib.contextmanager
+    def run(self):
+        """Share the results of processes in this run and the runs in it.
+        The run applies to the current context, so a thread started in a run
+        is not in the run unless it runs in a copy of the context."""
+        if self._scope.get() is not None:
+            yield self
+            return
+
+        scope = _ProcessScope()
+        token = self._scope.set(scope)
+        try:
+            yield self
+        finally:
+            self._scope.reset(token)
+            with self._lock:
+                self._running.records = scope.records
+
+    def share(
+        self, key: typing.Tuple[str, ...], func: typing.Callable[[], typing.Any]
+    ) -> typing.Any:
+        """Call 'func', or wait for the result of the call with the same key
+        in this run. Use for results read from a streamed process,
+        which are not shared otherwise. Outside a run, 'func' is always called."""
+        scope = self._scope.get()
+        if scope is None:
+            return func()
+
+        with self._lock:
+            result = scope.values.get(key)
+            owner = result is None
+            if owner:
+                result = futures.Future()
+                scope.values[key] = result
+
+        if not owner:
+            return result.result()
+
+        try:
+            value = func()
+        except BaseException as e:
+            # do not keep failures, so the next call tries again
+            with self._lock:
+                scope.values.pop(key, None)
+            result.set_exception(e)
+            raise
+
+        result.set_result(value)
+        return value
+
+    def execute(
+        self, args: typing.Sequence[str], timeout: float
+    ) -> subprocess.CompletedProcess:
+        """Run a process, or wait for the result of the same process.
+        The timeout includes waiting for a free slot."""
+        deadline = time.monotonic() + timeout
+        key = tuple(args)
+        scope = self._scope.get()
+        results = self._running.results if scope is None else scope.results
+        with self._lock:
+            result = results.get(key)
+            owner = result is None
+            if owner:
+                result = futures.Future()
+                results[key] = result
+
+        if not owner:
+            start = time.monotonic()
+            try:
+                completed = result.result(timeout=max(0.0, deadline - start))
+            except futures.TimeoutError as e:
+                self._record(args, start, None, shared=True, timed_out=True)
+                raise ValueError(self._timeout_msg(args, timeout)) from e
+            self._record(args, start, completed.returncode, shared=True)
+            return completed
+
+        try:
+            completed = self._execute(args, deadline, timeout)
+        except BaseException as e:
+            # do not keep failures, so the next call tries again
+            with self._lock:
+                results.pop(key, None)
+            result.set_exception(e)
+            raise
+
+        result.set_result(completed)
+        if scope is None:
+            with self._lock:
+                results.pop(key, None)
+        return completed
+
+    @contextlib.contextmanager
+    def stream(
+        self,
+        args: typing.Sequence[str],
+        timeout: float,
+        max_bytes: typing.Optional[int] = None,
+        max_lines: typing.Optional[int] = None,
+        chunks: bool = False,
+    ):
+        """Run a process and read the output as it arrives.
+
+        The process is stopped when the output is over 'max_bytes' or
+        'max_lines', or the reader stops early, or it runs for longer
+        than 'timeout' seconds. The result is not shared.
+        """
+        deadline = time.monotonic() + timeout
+        self._acquire(args, deadline, timeout)
+        start = time.monotonic()
+        try:
+            try:
+                proc = subprocess.Popen(
+                    args,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    shell=False,
+                )
+            except FileNotFoundError as e:
+                raise ValueError(f"Error running '{' '.join(args)}'") from e
+
+            timed_out = threading.Event()
+
+            def stop_at_deadline():
+                timed_out.set()
+                proc.kill()
+
+            timer = threading.Timer(max(0.0, deadline - start), stop_at_deadline)
+            timer.daemon = True
+            timer.start()
+
+            stderr = bytearray()
+            stderr_reader = threading.Thread(
+                target=self._read_stderr, args=(proc, stderr), daemon=True
+            )
+            stderr_reader.start()
+
+            stream = ProcessStream(args, iter(()))
+            stream._items = self._read_stdout(
+                proc, stream, max_bytes, max_lines, chunks
+            )
+            try:
+                with agent_profile.span("process", args[0] if args else None):
+                    yield stream
+            finally:
+                timer.cancel()
+                if proc.poll() is None:
+                    proc.kill()
+                proc.stdout.close()
+                proc.wait()
+                stderr_reader.join()
+                stream.returncode = proc.returncode
+                stream.stderr = stderr.decode("utf8", errors="replace")
+                self._record(
+                    args,
+                    start,
+                    None if timed_out.is_set() else proc.returncode,
+                    timed_out=timed_out.is_set(),
+                )
+        finally:
+            self._slots.release()
+
+        if timed_out.is_set():
+            raise ValueError(self._timeout_msg(args, timeout))
+
+    def _read_stdout(
+        self,
+        proc: subprocess.Popen,
+        stream: ProcessStream,
+        max_bytes: typing.Optional[int],
+        max_lines: typing.Optional[int],
+        chunks: bool,
+    ) -> typing.Iterator:
+        size = 0
+        count = 0
+        items = iter(lambda: proc.stdout.read1(65536), b"") if chunks else proc.stdout
+        for item in items:
+            size += len(item)
+            count += 1
+            if (max_bytes is not None and size > max_bytes) or (
+                max_lines is not None and count > max_lines
+            ):
+                stream.truncated = True
+                log_msg(
+                    logging.WARNING,
+                    f"Stopped '{' '.join(stream.args)}' "
+                    f"after {count - 1} {'chunks' if chunks else 'lines'} "
+                    f"and {size - len(item)} bytes.",
+                )
+                proc.kill()
+                return
+            yield item if chunks else item.decode("utf8", errors="replace")
+
+    def _read_stderr(self, proc: subprocess.Popen, stderr: bytearray) -> None:
+        # keep the start of stderr, and discard the rest so the process is not blocked
+        for chunk in iter(lambda: proc.stderr.read1(65536), b""):
+            if len(stderr) < PROCESS_STDERR_BYTES:
+                stderr.extend(chunk[: PROCESS_STDERR_BYTES - len(stderr)])
+        proc.stderr.close()
+
+    def _acquire(
+        self, args: typing.Sequence[str], deadline: float, timeout: float
+    ) -> None:
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise ValueError(self._timeout_msg(args, timeout))
+
+    def _execute(
+        self, args: typing.Sequence[str], deadline: float, timeout: float
+    ) -> subprocess.CompletedProcess:
+        self._acquire(args, deadline, timeout)
+
+        start = time.monotonic()
+        try:
+            with agent_profile.span("process", args[0] if args else None):
+                completed = subprocess.run(
+                    args,
+                    capture_output=True,
+                    shell=False,
+                    timeout=max(0.0, deadline - start),
+                    check=False,
+                    text=True,
+                )
+        except subprocess.TimeoutExpired as e:
+            self._record(args, start, None, timed_out=True)
+            raise ValueError(self._timeout_msg(args, timeout)) from e
+        except FileNotFoundError as e:
+            raise ValueError(f"Error running '{' '.join(args)}'") from e
+        finally:
+            self._slots.release()
+
+        self._record(args, start, completed.returncode)
+        return completed
+
+    def _record(
+        self,
+        args: typing.Sequence[str],
+        start: float,
+        exit_code: typing.Optional[int],
+        shared: bool = False,
+        timed_out: bool = False,
+    ) -> None:
+        item = agent_model.ProcessRecord(
+            args=list(args),
+            duration=time.monotonic() - start,
+            exit_code=exit_code,
+            shared=shared,
+            timed_out=timed_out,
         )
-        print(f"Process result: {result}", file=sys.stderr)
-        return result
-    except FileNotFoundError as e:
-        raise ValueError(f"Error running '{' '.join(args)}'") from e
+        self.records.append(item)
+        log_msg(
+            logging.DEBUG,
+            f"Process '{' '.join(args)}' "
+            f"{'timed out' if timed_out else f'exited with {exit_code}'} "
+            f"after {item.duration:.3f}s{' (shared)' if shared else ''}.",
+        )
+
+    def _timeout_msg(self, args: typing.Sequence[str], timeout: float) -> str:
+        return f"Timed out after {timeout}s running '{' '.join(args)}'."
+
+
+_process_runner = ProcessRunner()
+
+
+@agent_validate.checked
+def execute_process(
+    args: typing.Sequence[str], timeout: typing.Optional[float] = None
+) -> subprocess.CompletedProcess:
+    """Execute a process using the given args.
 
+    At most `PROCESS_LIMIT` processes run at the same time.
+    The process is stopped if it does not finish within 'timeout' seconds.
+    """
+    return _process_runner.execute(
+        args, PROCESS_TIMEOUT if timeout is None else timeout
+    )
 
-@beartype.beartype
+
+@agent_validate.checked
+def stream_process(
+    args: typing.Sequence[str],
+    timeout: typing.Optional[float] = None,
+    max_bytes: typing.Optional[int] = None,
+    max_lines: typing.Optional[int] = None,
+    chunks: bool = False,
+) -> typing.ContextManager[ProcessStream]:
+    """Execute a process and read the output as it arrives.
+
+    Use as a context manager. The stream gives decoded lines,
+    or raw byte chunks when 'chunks' is true.
+    The process is stopped when there is more than 'max_bytes'
+    or 'max_lines' of output, and the stream is marked as truncated.
+    """
+    return _process_runner.stream(
+        args,
+        PROCESS_TIMEOUT if timeout is None else timeout,
+        max_bytes=max_bytes,
+        max_lines=max_lines,
+        chunks=chunks,
+    )
+
+
+@agent_validate.checked
+def share_result(
+    key: typing.Tuple[str, ...], func: typing.Callable[[], typing.Any]
+) -> typing.Any:
+    """Get the result of 'func', shared with calls with the same key in this run."""
+    return _process_runner.share(key, func)
+
+
+@agent_validate.checked
+def execute_processes(
+    items: typing.Sequence[typing.Sequence[str]],
+    timeout: typing.Optional[float] = None,
+) -> typing.List[subprocess.CompletedProcess]:
+    """Execute processes at the same time, and get the results in the same order."""
+    if len(items) < 2:
+        return [execute_process(i, timeout) for i in items]
+    with futures.ThreadPoolExecutor(max_workers=PROCESS_LIMIT) as executor:
+        # the processes are in the same run as the caller
+        tasks = [
+            executor.submit(contextvars.copy_context().run, execute_process, i, timeout)
+            for i in items
+        ]
+        return [i.result() for i in tasks]
+
+
+@agent_validate.checked
+def process_run() -> typing.ContextManager[ProcessRunner]:
+    """Share the results of identical processes for the duration of a run.
+    Runs that overlap, such as checks run at the same time, each have their own
+    results."""
+    return _process_runner.run()
+
+
+@agent_validate.checked
+def process_records() -> typing.List[agent_model.ProcessRecord]:
+    """Get the processes run by the current, or last, run."""
+    return list(_process_runner.records)
+
+
+@agent_validate.checked
 def log_msg(level: int, msg: str) -> None:
     if logger.isEnabledFor(level):
         if level == logging.INFO:
@@ -45,7 +461,7 @@ def log_msg(level: int, msg: str) -> None:
             logger.log(level, msg)
 
 
-@beartype.beartype
+@agent_validate.checked
 def report_code_from_level(level: str):
     """Convert a report code to report level."""
     if level == agent_model.REPORT_LEVEL_PASS:
@@ -58,7 +474,7 @@ def report_code_from_level(level: str):
         raise ValueError(f"Unknown report level '{level}'.")
 
 
-@beartype.beartype
+@agent_validate.checked
 def report_level_from_code(code: str):
     """Convert a report level to report code."""
     if code == agent_model.REPORT_LEVEL_PASS:
@@ -73,7 +489,7 @@ def report_level_from_code(code: str):
     raise ValueError(f"Unknown report code '{code}'.")
 
 
-@beartype.beartype
+@agent_validate.checked
 def report_evaluate(value: float, test: float) -> typing.Tuple[str, str]:
     """Evaluate a value and test to report whether the value is less than the test."""
     if value < test:
@@ -89,7 +505,8 @@ def report_evaluate(value: float, test: float) -> typing.Tuple[str, str]:
     return status, status_code
 
 
-@beartype.beartype
+@functools.lru_cache(maxsize=None)
+@agent_validate.checked
 def get_version() -> typing.Optional[str]:
     """Get the version of this package."""
     try:
@@ -109,18 +526,231 @@ def get_version() -> typing.Optional[str]:
     return "(version not available)"
 
 
-@beartype.beartype
-def read_config(path: pathlib.Path) -> typing.Optional[typing.Dict[str, typing.Any]]:
-    with path.open("rt") as f:
-        return yaml.safe_load(f)
+@agent_validate.checked
+def read_config(path: pathlib.Path) -> typing.Any:
+    """Parse a yaml config file, using libyaml when it is available."""
+    with path.open("rb") as f:
+        return yaml.load(f, Loader=_YAML_LOADER)
 
 
-@beartype.beartype
+@agent_validate.checked
 def make_options(name: str, item: typing.Any, available: typing.Iterable[str]) -> str:
     opts = ",".join(available or ["(none)"])
     return f"Unrecognised {name}: '{item}'. Must be one of '{opts}'."
 
 
-@beartype.beartype
+@agent_validate.checked
 def raise_options(name: str, item: typing.Any, available: typing.Iterable[str]) -> None:
     raise ValueError(make_options(name, item, available))
+
+
+@functools.lru_cache(maxsize=None)
+def http_session() -> requests.Session:
+    """Get the http session shared by all requests in this process.
+    Connections to the same host are pooled and re-used."""
+    session = requests.Session()
+    adapter = adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = f"{agent_model.APP_NAME_DASH}/{get_version()}"
+    session.hooks["response"].append(agent_profile.http_hook)
+    return session
+
+
+@agent_validate.checked
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Get the seconds to wait before retry number 'attempt' (starting at 0).
+    Uses exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+@agent_validate.checked
+def retry_after_delay(value: typing.Optional[str], default: float) -> float:
+    """Get the seconds to wait from a 'Retry-After' header.
+    The header is a number of seconds or an http date.
+    Uses the default when the header is missing or invalid."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    return max(0.0, (date - now).total_seconds())
+
+
+class TokenBucket:
+    """Limit how often an action can happen.
+    Tokens are added at 'rate' per second, up to 'capacity'.
+    Each action takes one token."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def block(self, seconds: float) -> None:
+        """Take no action for the given number of seconds."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def acquire(self) -> float:
+        """Wait until a token is available, then take it.
+        Returns the number of seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                self.updated = now
+
+                delay = max(0.0, self.blocked_until - now)
+                if not delay and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                if not delay:
+                    delay = (1.0 - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+@agent_validate.checked
+def state_file(name: str) -> pathlib.Path:
+    """Get the path to a file in this user's state directory."""
+    state_home = os.environ.get("XDG_STATE_HOME") or str(
+        pathlib.Path.home() / ".local" / "state"
+    )
+    return pathlib.Path(state_home, agent_model.APP_NAME_DASH, name)
+
+
+@agent_validate.checked
+def cache_dir(name: str) -> pathlib.Path:
+    """Get the path to a directory in this user's cache directory."""
+    base = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(base) / agent_model.APP_NAME_DASH / name
+
+
+@contextlib.contextmanager
+def locked_state(path: pathlib.Path):
+    """Load the json state in a file, and save it if the block succeeds.
+    The state is locked while the block runs, so other processes wait for it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.with_name(path.name + ".lock").open("a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            state = json.loads(path.read_text()) if path.exists() else {}
+        except ValueError:
+            log_msg(logging.WARNING, f"Ignoring invalid state in '{path}'.")
+            state = {}
+
+        yield state
+
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_text(json.dumps(state, sort_keys=True))
+        os.replace(temp_path, path)
+
+
+@agent_validate.checked
+def register_flush(func: typing.Callable[[], None]) -> None:
+    """Register a function that delivers any buffered output.
+    Registered functions are run once by `run_flush` in the same thread."""
+    if func not in _flush_callbacks.items:
+        _flush_callbacks.items.append(func)
+
+
+@agent_validate.checked
+def run_flush() -> None:
+    """Run and remove the registered flush functions.
+    All functions are run, then the first error is raised."""
+    errors = []
+    with agent_profile.span("flush"):
+        while _flush_callbacks.items:
+            func = _flush_callbacks.items.pop(0)
+            try:
+                func()
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        raise errors[0]
+
+
+class BatchWindow:
+    """Collect items for up to 'window' seconds, then pass them all to 'handler'.
+
+    The window starts when the first item is added.
+    Anything still pending is handled by `run_flush`.
+    A window of zero or less handles each item as it is added.
+    An error from handling items when the window ends is raised
+    by the next `flush`, so the caller knows the items were not sent.
+    """
+
+    def __init__(
+        self,
+        handler: typing.Callable[[typing.List[typing.Any]], None],
+        window: float = 2.0,
+    ):
+        self.handler = handler
+        self.window = window
+        self._pending: typing.List[typing.Any] = []
+        self._lock = threading.Lock()
+        self._handle_lock = threading.Lock()
+        self._timer: typing.Optional[threading.Timer] = None
+        self._error: typing.Optional[Exception] = None
+
+    def add(self, item: typing.Any) -> None:
+        with self._lock:
+            self._pending.append(item)
+            if self._timer is None and self.window > 0:
+                self._timer = threading.Timer(self.window, self._flush_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+        register_flush(self.flush)
+
+        if self.window <= 0:
+            self.flush()
+
+    def flush(self) -> int:
+        """Handle all pending items. Returns the number of items handled.
+        Raises the error from handling items when the window ended, if any."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        # waits for items being handled when the window ended
+        with self._handle_lock:
+            error, self._error = self._error, None
+            if pending:
+                self.handler(pending)
+
+        if error is not None:
+            raise error
+        return len(pending)
+
+    def _flush_background(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._timer = None
+
+        if not pending:
+            return
+
+        with self._handle_lock:
+            try:
+                self.handler(pending)
+            except Exception as e:
+                log_msg(logging.ERROR, f"Could not send pending items: {e}")
+                self._error = e
@@ -0,0 +1,190 @@
+"""Timing of the stages of running the agent.
+
+Spans are only recorded after `enable` is called.
+Until then, `span` returns a shared context manager that does nothing.
+"""
+
+import contextlib
+import functools
+import json
+import pathlib
+import threading
+import time
+from urllib import parse
+
+import click
+from beartype import typing
+
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
+
+_NO_SPAN = contextlib.nullcontext()
+
+_profile: typing.Optional["Profile"] = None
+
+_startup: typing.List[agent_model.ProfileSpan] = []
+
+
+class Profile:
+    """The spans recorded while the agent runs."""
+
+    def __init__(self):
+        self.root = agent_model.ProfileSpan(name="total", start=time.perf_counter())
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def stack(self) -> typing.List[agent_model.ProfileSpan]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def add(self, item: agent_model.ProfileSpan) -> None:
+        """Add a span to the innermost open span in this thread."""
+        stack = self.stack()
+        parent = stack[-1] if stack else self.root
+        with self._lock:
+            parent.children.append(item)
+
+    @contextlib.contextmanager
+    def span(self, name: str, detail: typing.Optional[str] = None):
+        item = agent_model.ProfileSpan(
+            name=name,
+            detail=detail,
+            start=time.perf_counter(),
+            thread=threading.current_thread().name,
+        )
+        self.add(item)
+        stack = self.stack()
+        stack.append(item)
+        try:
+            yield item
+        finally:
+            item.duration = time.perf_counter() - item.start
+            stack.pop()
+
+
+def span(name: str, detail: typing.Optional[str] = None):
+    """Time the enclosed block as a stage called 'name'."""
+    if _profile is None:
+        return _NO_SPAN
+    return _profile.span(name, detail)
+
+
+def timed(name: str):
+    """Decorate a function to time each call as a stage called 'name'."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profile is None:
+                return func(*args, **kwargs)
+            detail = func.__name__ if func.__name__ != name else None
+            with _profile.span(name, detail):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@agent_validate.checked
+def record(name: str, start: float, detail: typing.Optional[str] = None) -> None:
+    """Keep the time taken by a stage that finished before profiling started,
+    such as importing the commands."""
+    item = agent_model.ProfileSpan(
+        name=name,
+        detail=detail,
+        start=start,
+        duration=time.perf_counter() - start,
+    )
+    if _profile is None:
+        _startup.append(item)
+    else:
+        _profile.add(item)
+
+
+def http_hook(response, *args, **kwargs):
+    """A requests response hook that records the time taken by a http request.
+    Added to the shared http session."""
+    if _profile is None:
+        return response
+    duration = response.elapsed.total_seconds()
+    request = response.request
+    _profile.add(
+        agent_model.ProfileSpan(
+            name="http",
+            detail=f"{request.method} {parse.urlparse(request.url).netloc}",
+            start=time.perf_counter() - duration,
+            duration=duration,
+            thread=threading.current_thread().name,
+        )
+    )
+    return response
+
+
+@agent_validate.checked
+def enable() -> Profile:
+    """Start recording spans.
+    Http requests sent with the shared http session are timed by 'http_hook'."""
+    global _profile
+    if _profile is None:
+        _profile = Profile()
+        _profile.root.children.extend(_startup)
+        if _startup:
+            _profile.root.start = min(i.start for i in _startup)
+    return _profile
+
+
+@agent_validate.checked
+def disable() -> typing.Optional[Profile]:
+    """Stop recording spans. Returns the finished profile."""
+    global _profile
+    profile, _profile = _profile, None
+    if profile is None:
+        return None
+
+    profile.root.duration = time.perf_counter() - profile.root.start
+    return profile
+
+
+@agent_validate.checked
+def report_text(root: agent_model.ProfileSpan) -> str:
+    """Show the spans as a tree.
+    Spans with the same name and parent are combined."""
+    lines = []
+
+    def add_lines(items: typing.List[agent_model.ProfileSpan], depth: int):
+        groups: typing.Dict[str, typing.List[agent_model.ProfileSpan]] = {}
+        for item in items:
+            groups.setdefault(item.name, []).append(item)
+
+        for name, group in groups.items():
+            details = {i.detail for i in group if i.detail}
+            label = name
+            if len(details) == 1:
+                label += f" {details.pop()}"
+            if len(group) > 1:
+                label += f" x{len(group)}"
+            label = ("  " * depth + label)[:48]
+            total = sum(i.duration or 0.0 for i in group) * 1000
+            lines.append(f"{label:<48} {total:>10.2f} ms")
+            add_lines([c for i in group for c in i.children], depth + 1)
+
+    add_lines([root], 0)
+    return "\n".join(lines)
+
+
+@agent_validate.checked
+def write_report(root: agent_model.ProfileSpan, path: pathlib.Path) -> None:
+    """Write the spans to a json file."""
+    path.write_text(json.dumps(root.to_dict(), indent=2))
+
+
+@agent_validate.checked
+def finish(path: typing.Optional[pathlib.Path] = None) -> None:
+    """Stop recording spans, show them, and write them to 'path' if given."""
+    profile = disable()
+    if profile is None:
+        return
+    click.echo(report_text(profile.root), err=True)
+    if path:
+        write_report(profile.root, path)
@@ -3,35 +3,44 @@ import functools
 import importlib
 import inspect
 import logging
+import queue
+import threading
+import time
 import importlib_resources
 
-import beartype
 import click
 from beartype import typing
 
 from server_monitor_agent.agent import (
     model as agent_model,
     operation as agent_op,
+    profile as agent_profile,
+    validate as agent_validate,
 )
 
+SEND_CHAIN_METAVAR = "SEND1 [ARGS]... [SEND2 [ARGS]...]..."
+
+SEND_QUEUE_SIZE = 16
+"""The number of agent items waiting to be sent to each target."""
+
 
 class BaseRegistry(abc.ABC):
     @functools.cached_property
-    @beartype.beartype
+    @agent_validate.checked
     def package_name(self) -> str:
         return agent_model.APP_NAME_UNDER
 
     @functools.cached_property
-    @beartype.beartype
+    @agent_validate.checked
     def package_dir(self):
         return importlib_resources.files(self.package_name)
 
     @functools.cached_property
-    @beartype.beartype
+    @agent_validate.checked
     def service_dir(self):
         return self.package_dir / "service"
 
-    @beartype.beartype
+    @agent_validate.checked
     def service_module(self, service_name: str) -> str:
         return f"{self.package_name}.service.{service_name}"
 
@@ -42,15 +51,16 @@ class CommandRegistry(BaseRegistry):
     collect_commands: typing.List[agent_model.RegisterCollectCmd] = []
     send_commands: typing.List[agent_model.RegisterSendCmd] = []
 
-    @beartype.beartype
+    @agent_validate.checked
     def collect_module(self, service_name: str) -> str:
         return f"{self.service_module(service_name)}.collect"
 
-    @beartype.beartype
+    @agent_validate.checked
     def send_module(self, service_name: str) -> str:
         return f"{self.service_module(service_name)}.send"
 
-    @beartype.beartype
+    @agent_validate.checked
+    @agent_profile.timed("gather")
     def gather(self):
         """Gather registered collect cli group commands and send commands."""
 
@@ -70,10 +80,18 @@ class CommandRegistry(BaseRegistry):
                 if cmd not in self.send_commands:
                     self.send_commands.append(cmd)
 
-    @beartype.beartype
-    def run(self, group: click.Group):
+    @agent_validate.checked
+    def run(
+        self,
+        group: click.Group,
+        send_chain: typing.Optional[typing.Callable[..., None]] = None,
+    ):
         """Add registered collect commands to the given group.
-        Add registered send commands to the collect groups."""
+        Add registered send commands to the collect groups.
+
+        The send commands of a collect group can be chained,
+        so one collect can be sent to many targets.
+        When the chain has been parsed, 'send_chain' runs the collect and sends."""
 
         for collect_cmd in self.collect_commands:
 
@@ -82,6 +100,11 @@ class CommandRegistry(BaseRegistry):
             )
             group.add_command(collect_cmd.group)
 
+            if send_chain is not None:
+                collect_cmd.group.chain = True
+                collect_cmd.group.subcommand_metavar = SEND_CHAIN_METAVAR
+                collect_cmd.group.result_callback(replace=True)(send_chain)
+
             for send_cmd in self.send_commands:
 
                 if (
@@ -95,7 +118,7 @@ class CommandRegistry(BaseRegistry):
                     )
                     collect_cmd.group.add_command(send_cmd.command)
 
-    @beartype.beartype
+    @agent_validate.checked
     def get_registered_commands(
         self, module_name: str
     ) -> typing.Iterable[agent_model.RegisterCmd]:
@@ -106,61 +129,223 @@ class CommandRegistry(BaseRegistry):
 
 
 class SourceTargetIORegistry(BaseRegistry):
-    """Gather and link 'collect' source inputs and 'send' target outputs."""
+    """Gather and link 'collect' source inputs and 'send' target outputs.
+
+    The inputs and outputs are indexed by the type of their args.
+    The io module of a service is imported the first time
+    one of the service's args types is run."""
 
     collect_inputs: typing.List[agent_model.RegisterCollectInput] = []
     send_outputs: typing.List[agent_model.RegisterSendOutput] = []
 
-    @beartype.beartype
+    collect_by_type: typing.Dict[type, agent_model.RegisterCollectInput] = {}
+    send_by_type: typing.Dict[type, agent_model.RegisterSendOutput] = {}
+    loaded_modules: typing.Set[str] = set()
+
+    @agent_validate.checked
     def io_module(self, service_name: str) -> str:
         return f"{self.service_module(service_name)}.io"
 
-    @beartype.beartype
+    @agent_validate.checked
+    @agent_profile.timed("gather")
     def gather(self):
+        """Import the io modules of all services."""
         for service in self.service_dir.iterdir():
             if service.name.startswith("_"):
                 continue
-
-            io_module = self.io_module(service.name)
-            for item in self.get_registered_sources_and_targets(io_module):
-                if isinstance(item, agent_model.RegisterCollectInput):
-                    if item not in self.collect_inputs:
-                        self.collect_inputs.append(item)
-                elif isinstance(item, agent_model.RegisterSendOutput):
-                    if item not in self.send_outputs:
-                        self.send_outputs.append(item)
-                else:
-                    raise ValueError(f"Unknown item: {repr(item)}")
-
-    @beartype.beartype
+            self.load(self.io_module(service.name))
+
+    @classmethod
+    def clear(cls) -> None:
+        """Remove the registered inputs and outputs."""
+        cls.collect_inputs.clear()
+        cls.send_outputs.clear()
+        cls.collect_by_type.clear()
+        cls.send_by_type.clear()
+        cls.loaded_modules.clear()
+
+    @agent_validate.checked
+    def load(self, module_name: str) -> None:
+        """Import an io module and register its inputs and outputs."""
+        if module_name in self.loaded_modules:
+            return
+
+        with agent_profile.span("gather", module_name):
+            for item in self.get_registered_sources_and_targets(module_name):
+                self.add(item)
+        self.loaded_modules.add(module_name)
+
+    @agent_validate.checked
+    def add(
+        self, item: typing.Union[agent_model.RegisterIO, agent_model.RegisterCmd]
+    ) -> None:
+        """Register an input or output by the type of its args."""
+        args_type = inspect.signature(item.func).parameters["args"].annotation
+        if isinstance(item, agent_model.RegisterCollectInput):
+            if item not in self.collect_inputs:
+                self.collect_inputs.append(item)
+            self.collect_by_type.setdefault(args_type, item)
+        elif isinstance(item, agent_model.RegisterSendOutput):
+            if item not in self.send_outputs:
+                self.send_outputs.append(item)
+            self.send_by_type.setdefault(args_type, item)
+        else:
+            raise ValueError(f"Unknown item: {repr(item)}")
+
+    @agent_validate.checked
+    def find(self, index: typing.Dict[type, typing.Any], args_type: type):
+        """Get the input or output for an args type.
+        Imports the io module of the service that defines the args type,
+        or all io modules if the args type is not in a service."""
+        if args_type not in index:
+            prefix = f"{self.package_name}.service."
+            module_name = args_type.__module__
+            if module_name.startswith(prefix):
+                start = len(prefix)
+                service_name = module_name[start:].split(".")[0]
+                self.load(self.io_module(service_name))
+        if args_type not in index:
+            self.gather()
+        return index.get(args_type)
+
+    @agent_validate.checked
     def run(
         self, collect_args: agent_model.CollectArgs, send_args: agent_model.SendArgs
     ) -> None:
-        match_collect = None
-        for item in self.collect_inputs:
-            item_inspect = inspect.signature(item.func)
-            item_arg_type = item_inspect.parameters["args"].annotation
-            if item_arg_type == type(collect_args):
-                match_collect = item
-                break
-
-        match_send = None
-        for item in self.send_outputs:
-            item_inspect = inspect.signature(item.func)
-            item_arg_type = item_inspect.parameters["args"].annotation
-            if item_arg_type == type(send_args):
-                match_send = item
-                break
-
+        for agent_item in self.collect_items(collect_args):
+            self.send(send_args, agent_item)
+
+    @agent_validate.checked
+    def collect_items(
+        self, collect_args: agent_model.CollectArgs
+    ) -> typing.Iterator[agent_model.AgentItem]:
+        """Run the collect input that matches the collect args,
+        and get the agent items one at a time."""
+        result = self.collect(collect_args)
+        if isinstance(result, agent_model.AgentItem):
+            yield result
+        else:
+            yield from result
+
+    @agent_validate.checked
+    def collect(
+        self, collect_args: agent_model.CollectArgs
+    ) -> typing.Union[agent_model.AgentItem, typing.Iterator[agent_model.AgentItem]]:
+        """Run the collect input that matches the collect args."""
+        match_collect = self.find(self.collect_by_type, type(collect_args))
         if not match_collect:
             raise ValueError(f"Unexpected collect args: {repr(collect_args)}")
+
+        with agent_profile.span("collect", match_collect.func.__name__):
+            return match_collect.func(collect_args)
+
+    @agent_validate.checked
+    def send(
+        self, send_args: agent_model.SendArgs, agent_item: agent_model.AgentItem
+    ) -> None:
+        """Run the send output that matches the send args."""
+        match_send = self.find(self.send_by_type, type(send_args))
         if not match_send:
             raise ValueError(f"Unexpected send args: {repr(send_args)}")
 
-        agent_item = match_collect.func(collect_args)
-        match_send.func(send_args, agent_item)
+        with agent_profile.span("send", match_send.func.__name__):
+            match_send.func(send_args, agent_item)
+
+    @agent_validate.checked
+    def send_all(
+        self,
+        send_args: typing.Sequence[agent_model.SendArgs],
+        agent_items: typing.Iterable[agent_model.AgentItem],
+        timeout: typing.Optional[float] = None,
+    ) -> typing.List[str]:
+        """Send each agent item to every target as the item arrives,
+        then deliver anything the targets buffered.
+
+        Each target has a thread with a queue of items, so the targets send
+        at the same time. A target that fails does not stop the other targets.
+        A target that does not take the next item, or does not finish after
+        the last item, within 'timeout' seconds is left to finish in the background.
+        Returns a message for each send that did not succeed."""
+        if len(send_args) == 1:
+            for agent_item in agent_items:
+                self.send(send_args[0], agent_item)
+            return []
+
+        # find the outputs first, so any io modules are imported in this thread
+        for item in send_args:
+            if not self.find(self.send_by_type, type(item)):
+                raise ValueError(f"Unexpected send args: {repr(item)}")
+
+        queues: typing.List[queue.Queue] = [
+            queue.Queue(maxsize=SEND_QUEUE_SIZE) for _ in send_args
+        ]
+        results: typing.List[typing.List[BaseException]] = [[] for _ in send_args]
+        timed_out = [False] * len(send_args)
+
+        def target(index: int) -> None:
+            while True:
+                agent_item = queues[index].get()
+                if agent_item is None:
+                    break
+                try:
+                    self.send(send_args[index], agent_item)
+                except Exception as e:
+                    results[index].append(e)
+
+            # buffered output is delivered in this thread, so it has a deadline too
+            try:
+                agent_op.run_flush()
+            except Exception as e:
+                results[index].append(e)
+
+        def put(index: int, agent_item: typing.Optional[agent_model.AgentItem]):
+            if timed_out[index]:
+                return
+            try:
+                queues[index].put(agent_item, timeout=timeout)
+            except queue.Full:
+                timed_out[index] = True
+
+        # the worker threads do not stop the process from exiting
+        threads = []
+        for index in range(len(send_args)):
+            thread = threading.Thread(
+                target=target, args=(index,), name=f"send-{index}", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+        try:
+            for agent_item in agent_items:
+                for index in range(len(send_args)):
+                    put(index, agent_item)
+        finally:
+            # tell each target there are no more items
+            for index in range(len(send_args)):
+                put(index, None)
+
+        start = time.monotonic()
+        errors = []
+        for index, (item, thread) in enumerate(zip(send_args, threads)):
+            if not timed_out[index]:
+                remaining = (
+                    None if timeout is None else timeout - (time.monotonic() - start)
+                )
+                thread.join(None if remaining is None else max(0.0, remaining))
+            name = type(item).__name__
+            if thread.is_alive():
+                message = f"{name} did not finish within {timeout}s"
+                agent_op.log_msg(logging.WARNING, f"Send to {message}.")
+                errors.append(message)
+                continue
+
+            for error in results[index]:
+                message = f"{name} failed: '{error.__class__.__name__}': {error}"
+                agent_op.log_msg(logging.WARNING, f"Send to {message}.")
+                errors.append(message)
+        return errors
 
-    @beartype.beartype
+    @agent_validate.checked
     def get_registered_sources_and_targets(
         self, module_name: str
     ) -> typing.Iterable[agent_model.RegisterCmd]:
@@ -0,0 +1,337 @@
+"""Limits on the host resources used by the agent.
+
+The agent runs next to the services it checks, so it can be set to give way
+to them. The limits are set in the 'resources' section of the config file:
+
+    resources:
+      nice: 10
+      io_class: best-effort
+      io_level: 7
+      cgroup: server-monitor-agent
+      cpu_max: 0.5
+      memory_max: 256M
+      rss_max: 200M
+
+'nice' and the io priority ('io_class' of 'idle' or 'best-effort',
+with an 'io_level' from 0 to 7) are set for the agent process.
+'cgroup' is a cgroup v2 group, relative to the cgroup root, that the agent
+moves into, with a limit of 'cpu_max' CPUs and 'memory_max' bytes.
+The cgroup is only used when the agent is permitted to change it.
+'rss_max' starts a watchdog that stops the agent
+when its resident memory is over the limit.
+
+A limit that cannot be applied is logged, and the agent keeps running.
+"""
+
+import _thread
+import logging
+import os
+import pathlib
+import re
+import threading
+import time
+
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
+
+CONFIG_KEY = "resources"
+
+CGROUP_ROOT = pathlib.Path("/sys/fs/cgroup")
+CGROUP_CPU_PERIOD = 100000
+
+IO_CLASS_IDLE = "idle"
+IO_CLASS_BEST_EFFORT = "best-effort"
+IO_CLASSES = [IO_CLASS_IDLE, IO_CLASS_BEST_EFFORT]
+
+RSS_GRACE = 5.0
+"""Seconds to wait for the agent to stop before it is ended."""
+
+RSS_EXIT_CODE = 3
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+_applied: typing.Optional[agent_model.ResourceSettings] = None
+_watchdog: typing.Optional["RssWatchdog"] = None
+
+
+@agent_validate.checked
+def parse_size(value: typing.Union[int, str]) -> int:
+    """Get the number of bytes from a size such as '256M' or '1G'."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    match = re.fullmatch(r"\s*(\d+)\s*([KMGT]?)i?B?\s*", str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size '{value}'.")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+
+
+@agent_validate.checked(boundary=True)
+def read_settings(raw: typing.Any) -> agent_model.ResourceSettings:
+    """Check and build the resource settings from the config file section."""
+    if raw is None:
+        return agent_model.ResourceSettings()
+    if not isinstance(raw, dict):
+        raise ValueError(f"Config for {CONFIG_KEY} must be a mapping.")
+
+    names = list(agent_model.ResourceSettings.__dataclass_fields__)
+    for key in raw:
+        if key not in names:
+            raise ValueError(
+                f"Config for {CONFIG_KEY} has an unknown setting. "
+                f"{agent_op.make_options('name', key, names)}"
+            )
+
+    def number(name: str, kind: type, low: float, high: typing.Optional[float]):
+        value = raw.get(name)
+        if value is None:
+            return None
+        try:
+            value = kind(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Config for {CONFIG_KEY} has an invalid '{name}'.") from e
+        if value < low or (high is not None and value > high):
+            raise ValueError(
+                f"Config for {CONFIG_KEY} '{name}' must be from {low} to "
+                f"{high if high is not None else 'any'}: '{value}'."
+            )
+        return value
+
+    io_class = raw.get("io_class")
+    if io_class is not None and io_class not in IO_CLASSES:
+        raise ValueError(
+            f"Config for {CONFIG_KEY} has an invalid 'io_class'. "
+            f"{agent_op.make_options('io_class', io_class, IO_CLASSES)}"
+        )
+
+    sizes = {}
+    for name in ["memory_max", "rss_max"]:
+        if raw.get(name) is not None:
+            try:
+                sizes[name] = parse_size(raw[name])
+            except ValueError as e:
+                raise ValueError(
+                    f"Config for {CONFIG_KEY} has an invalid '{name}': {e}"
+                ) from e
+
+    cpu_max = number("cpu_max", float, 0.01, None)
+    rss_interval = number("rss_interval", float, 0.1, None)
+    return agent_model.ResourceSettings(
+        nice=number("nice", int, -20, 19),
+        io_class=io_class,
+        io_level=number("io_level", int, 0, 7),
+        cgroup=str(raw["cgroup"]).strip("/") if raw.get("cgroup") else None,
+        cpu_max=cpu_max,
+        memory_max=sizes.get("memory_max"),
+        rss_max=sizes.get("rss_max"),
+        rss_interval=rss_interval or 1.0,
+    )
+
+
+@agent_validate.checked
+def apply(settings: agent_model.ResourceSettings) -> None:
+    """Apply the resource settings to this process.
+    Settings that have already been applied are not applied again."""
+    global _applied, _watchdog
+    if settings == _applied:
+        return
+
+    if settings.nice is not None:
+        set_nice(settings.nice)
+    if settings.io_class is not None:
+        set_io_priority(settings.io_class, settings.io_level)
+    if settings.cgroup:
+        join_cgroup(settings.cgroup, settings.cpu_max, settings.memory_max)
+    if settings.rss_max:
+        if _watchdog is not None:
+            _watchdog.stop()
+        _watchdog = RssWatchdog(settings.rss_max, settings.rss_interval)
+        _watchdog.start()
+
+    _applied = settings
+
+
+@agent_validate.checked
+def set_nice(nice: int) -> None:
+    """Set the scheduling priority of this process.
+    Raising the priority needs more permissions, so is likely to be refused."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, nice)
+    except OSError as e:
+        agent_op.log_msg(logging.WARNING, f"Could not set nice to {nice}: {e}")
+        return
+    agent_op.log_msg(logging.DEBUG, f"Set nice to {nice}.")
+
+
+@agent_validate.checked
+def set_io_priority(io_class: str, io_level: typing.Optional[int] = None) -> None:
+    """Set the io scheduling class and level of this process."""
+    import psutil
+
+    try:
+        if io_class == IO_CLASS_IDLE:
+            psutil.Process().ionice(psutil.IOPRIO_CLASS_IDLE)
+        else:
+            level = 4 if io_level is None else io_level
+            psutil.Process().ionice(psutil.IOPRIO_CLASS_BE, level)
+    except (AttributeError, OSError, psutil.Error) as e:
+        agent_op.log_msg(
+            logging.WARNING, f"Could not set io priority to {io_class}: {e}"
+        )
+        return
+    agent_op.log_msg(logging.DEBUG, f"Set io priority to {io_class}.")
+
+
+@agent_validate.checked
+def join_cgroup(
+    name: str,
+    cpu_max: typing.Optional[float] = None,
+    memory_max: typing.Optional[int] = None,
+    root: typing.Optional[pathlib.Path] = None,
+) -> bool:
+    """Move this process into a cgroup v2 group, and set its limits.
+
+    The limits need the 'cpu' and 'memory' controllers to be enabled
+    for the group, in the 'cgroup.subtree_control' of each group above it.
+    They are enabled if they are available. A limit whose controller
+    cannot be enabled is not set, with a warning.
+    Returns whether the process was moved."""
+    root = root or CGROUP_ROOT
+    if not (root / "cgroup.controllers").exists():
+        agent_op.log_msg(logging.WARNING, f"No cgroup v2 hierarchy at '{root}'.")
+        return False
+
+    path = root / name
+    limits = {}
+    if cpu_max is not None:
+        quota = max(1000, int(cpu_max * CGROUP_CPU_PERIOD))
+        limits["cpu.max"] = f"{quota} {CGROUP_CPU_PERIOD}"
+    if memory_max is not None:
+        limits["memory.max"] = str(memory_max)
+
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+        wanted = {i.split(".")[0] for i in limits}
+        enabled = _enable_controllers(root, path, wanted)
+        for file_name, value in limits.items():
+            controller = file_name.split(".")[0]
+            if controller not in enabled:
+                agent_op.log_msg(
+                    logging.WARNING,
+                    f"Could not set '{file_name}' for cgroup '{path}', "
+                    f"the '{controller}' controller is not enabled.",
+                )
+                continue
+            (path / file_name).write_text(value)
+        (path / "cgroup.procs").write_text(str(os.getpid()))
+    except OSError as e:
+        agent_op.log_msg(logging.WARNING, f"Could not use cgroup '{path}': {e}")
+        return False
+
+    agent_op.log_msg(logging.DEBUG, f"Moved to cgroup '{path}'.")
+    return True
+
+
+def _enable_controllers(
+    root: pathlib.Path, path: pathlib.Path, controllers: typing.Set[str]
+) -> typing.Set[str]:
+    """Enable the controllers for the children of each group above 'path'.
+    Returns the controllers that are enabled for 'path'."""
+    enabled = set(controllers)
+    parent = root
+    for part in path.relative_to(root).parts:
+        available = set((parent / "cgroup.controllers").read_text().split())
+        active = set((parent / "cgroup.subtree_control").read_text().split())
+        missing = sorted((enabled & available) - active)
+        if missing:
+            try:
+                content = " ".join(f"+{i}" for i in missing)
+                (parent / "cgroup.subtree_control").write_text(content)
+                active.update(missing)
+            except OSError as e:
+                agent_op.log_msg(
+                    logging.WARNING,
+                    f"Could not enable cgroup controllers {', '.join(missing)} "
+                    f"in '{parent}': {e}",
+                )
+        enabled &= active
+        parent = parent / part
+    return enabled
+
+
+class RssWatchdog:
+    """Stop the agent when its resident memory is over a limit.
+
+    The main thread is interrupted, so the agent stops as it would for ctrl-c.
+    If the agent is still running after 'grace' seconds, the process is ended.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        interval: float = 1.0,
+        grace: float = RSS_GRACE,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.limit = limit
+        self.interval = interval
+        self.grace = grace
+        self.clock = clock
+        self.exceeded_at: typing.Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="rss-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def rss(self) -> int:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+
+    def check(self) -> None:
+        """Check the resident memory, and stop the agent if it is over the limit."""
+        rss = self.rss()
+        if rss <= self.limit:
+            self.exceeded_at = None
+            return
+
+        now = self.clock()
+        if self.exceeded_at is None:
+            self.exceeded_at = now
+            agent_op.log_msg(
+                logging.ERROR,
+                f"Stopping because memory use of {rss} bytes "
+                f"is over the limit of {self.limit} bytes.",
+            )
+            self.interrupt()
+        elif now - self.exceeded_at >= self.grace:
+            agent_op.log_msg(
+                logging.ERROR,
+                f"Ending because the agent did not stop in {self.grace}s.",
+            )
+            self.end()
+
+    def interrupt(self) -> None:
+        _thread.interrupt_main()
+
+    def end(self) -> None:
+        os._exit(RSS_EXIT_CODE)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                agent_op.log_msg(logging.WARNING, f"Memory watchdog failed: {e}")
+                return
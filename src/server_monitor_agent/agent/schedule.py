@@ -0,0 +1,239 @@
+"""Run the checks for a host from one process, each on its own interval.
+
+The manifest is a yaml file with the checks to run:
+
+    max_concurrent: 2
+    checks:
+      - name: cpu
+        interval: 60
+        args: [cpu, --threshold, "80", stream-output]
+      - name: disk
+        interval: 300
+        jitter: 30
+        args: [disk, --path, /, stream-output]
+
+Each check's args are a collect command and its send commands. The checks run
+in the scheduler's process with the scheduler's top level options, such as
+'--spool-dir' and '--config', so the args cannot have top level options.
+The first run of a check is delayed by up to 'jitter' seconds
+(default a quarter of the interval). The delay is worked out from the host name
+and check name, so it is the same each time the agent starts on a host,
+and different for each check and host. This spreads out the checks
+that would otherwise all start at the same moment.
+
+The next run time for each check is kept in a heap. A check that is still running
+when it is due again is skipped, and no more than 'max_concurrent' checks run at once.
+"""
+
+import collections
+import hashlib
+import heapq
+import itertools
+import logging
+import pathlib
+import platform
+import threading
+import time
+from concurrent import futures
+
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
+
+JITTER_FRACTION = 0.25
+
+STATUS_STARTED = "started"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+
+@agent_validate.checked(boundary=True)
+def read_manifest(path: pathlib.Path) -> agent_model.ScheduleManifest:
+    """Read and check the checks to run from a yaml manifest file."""
+    try:
+        content = agent_op.read_config(path)
+    except Exception as e:
+        raise ValueError(f"Could not read schedule manifest '{path}': {e}") from e
+
+    if not isinstance(content, dict) or not isinstance(content.get("checks"), list):
+        raise ValueError(f"Schedule manifest '{path}' must have a list of 'checks'.")
+
+    max_concurrent = content.get("max_concurrent", agent_op.PROCESS_LIMIT)
+    if not isinstance(max_concurrent, int) or max_concurrent < 1:
+        raise ValueError(
+            "Schedule manifest 'max_concurrent' must be at least 1: "
+            f"'{max_concurrent}'."
+        )
+
+    checks = []
+    for index, raw in enumerate(content["checks"]):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Schedule check {index} must be a mapping.")
+        name = str(raw.get("name") or f"check-{index}")
+        args = raw.get("args")
+        if not isinstance(args, list) or not args:
+            raise ValueError(f"Schedule check '{name}' must have a list of 'args'.")
+        if args[0] == "schedule":
+            raise ValueError(f"Schedule check '{name}' cannot run 'schedule'.")
+        if str(args[0]).startswith("-"):
+            raise ValueError(
+                f"Schedule check '{name}' args must start with a collect command, "
+                "the top level options are the scheduler's."
+            )
+
+        interval = raw.get("interval")
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise ValueError(
+                f"Schedule check '{name}' must have an 'interval' "
+                f"of more than 0 seconds: '{interval}'."
+            )
+        jitter = raw.get("jitter", interval * JITTER_FRACTION)
+        if not isinstance(jitter, (int, float)) or jitter < 0:
+            raise ValueError(
+                f"Schedule check '{name}' must have a 'jitter' "
+                f"of 0 or more seconds: '{jitter}'."
+            )
+
+        if any(i.name == name for i in checks):
+            raise ValueError(f"Schedule check name '{name}' is used more than once.")
+
+        checks.append(
+            agent_model.ScheduleCheck(
+                name=name,
+                args=[str(i) for i in args],
+                interval=float(interval),
+                jitter=float(min(jitter, interval)),
+            )
+        )
+
+    return agent_model.ScheduleManifest(checks=checks, max_concurrent=max_concurrent)
+
+
+@agent_validate.checked
+def jitter_offset(host: str, check: agent_model.ScheduleCheck) -> float:
+    """Get the delay before the first run of a check on a host."""
+    digest = hashlib.sha256(f"{host}\0{check.name}".encode("utf8")).digest()
+    fraction = int.from_bytes(digest[:8], "big") / 2**64
+    return fraction * check.jitter
+
+
+class Scheduler:
+    """Run checks at their intervals, without overlapping runs of the same check."""
+
+    def __init__(
+        self,
+        manifest: agent_model.ScheduleManifest,
+        run: typing.Callable[[agent_model.ScheduleCheck], None],
+        host: typing.Optional[str] = None,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.manifest = manifest
+        self.run_check = run
+        self.host = host or platform.node()
+        self.clock = clock
+        self.counts: typing.Counter[str] = collections.Counter()
+
+        self._heap: typing.List[typing.Tuple] = []
+        self._order = itertools.count()
+        self._running: typing.Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self, now: float) -> None:
+        """Set the first run time of each check."""
+        self._heap = []
+        for check in self.manifest.checks:
+            self._push(now + jitter_offset(self.host, check), check)
+
+    def next_time(self) -> typing.Optional[float]:
+        """Get the time the next check is due."""
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, now: float) -> typing.List[agent_model.ScheduleCheck]:
+        """Get the checks that are due to start at 'now', and set their next run.
+        A check that is still running is skipped."""
+        result = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, check = heapq.heappop(self._heap)
+
+            # keep to the check's interval, and do not catch up on missed runs
+            later = when + check.interval
+            if later <= now:
+                later += ((now - later) // check.interval + 1) * check.interval
+            self._push(later, check)
+
+            with self._lock:
+                if check.name in self._running:
+                    self.counts[STATUS_SKIPPED] += 1
+                    agent_op.log_msg(
+                        logging.WARNING,
+                        f"Skipped check '{check.name}' because it is still running.",
+                    )
+                    continue
+                self._running.add(check.name)
+            result.append(check)
+        return result
+
+    def execute(self, check: agent_model.ScheduleCheck) -> None:
+        """Run a check, and record the outcome."""
+        try:
+            if self._stop.is_set():
+                return
+            self._count(STATUS_STARTED)
+            start = time.perf_counter()
+            agent_op.log_msg(logging.DEBUG, f"Running check '{check.name}'.")
+            self.run_check(check)
+            duration = time.perf_counter() - start
+            agent_op.log_msg(
+                logging.DEBUG, f"Finished check '{check.name}' in {duration:.3f}s."
+            )
+        except Exception as e:
+            self._count(STATUS_FAILED)
+            agent_op.log_msg(
+                logging.WARNING,
+                f"Check '{check.name}' failed: '{e.__class__.__name__}': {e}",
+            )
+        finally:
+            with self._lock:
+                self._running.discard(check.name)
+
+    def run(self, duration: typing.Optional[float] = None) -> None:
+        """Run the checks until 'stop' is called, or for 'duration' seconds."""
+        start = self.clock()
+        end = None if duration is None else start + duration
+        self.start(start)
+
+        workers = self.manifest.max_concurrent
+        with futures.ThreadPoolExecutor(workers, "schedule") as executor:
+            try:
+                while not self._stop.is_set():
+                    now = self.clock()
+                    if end is not None and now >= end:
+                        break
+
+                    for check in self.due(now):
+                        executor.submit(self.execute, check)
+
+                    wait = self.next_time() - self.clock() if self._heap else 1.0
+                    if end is not None:
+                        wait = min(wait, end - self.clock())
+                    if wait > 0:
+                        self._stop.wait(wait)
+            finally:
+                # checks that have not started yet are not run
+                self._stop.set()
+
+    def stop(self) -> None:
+        """Stop starting checks. Checks that are running are finished."""
+        self._stop.set()
+
+    def _count(self, status: str) -> None:
+        with self._lock:
+            self.counts[status] += 1
+
+    def _push(self, when: float, check: agent_model.ScheduleCheck) -> None:
+        heapq.heappush(self._heap, (when, next(self._order), check))
@@ -0,0 +1,267 @@
+"""The recent samples of a metric, kept in a ring buffer in a memory-mapped file.
+
+A threshold applied to one sample treats a short spike the same as sustained
+high use. Each run of a metric check adds its sample to the series for the
+metric, then evaluates a statistic of the samples in the last few minutes:
+
+    server-monitor-agent cpu --window 5 --statistic p90 ...
+
+The file has a header, then the sample times and values as two arrays of
+doubles, the same layout as 'array("d")'. The arrays are used in place through
+the mapping, so adding a sample and evaluating a window do not copy the series.
+The times are from the monotonic clock, so the series is cleared when the
+host restarts. The series holds the latest 'CAPACITY' samples, so a window
+that covers more samples than that only uses the latest ones.
+"""
+
+import array
+import contextlib
+import fcntl
+import logging
+import math
+import mmap
+import os
+import pathlib
+import re
+import struct
+import time
+
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
+
+MAGIC = b"SMAS"
+VERSION = 1
+
+CAPACITY = 1024
+"""The default number of samples in a series."""
+
+SERIES_DIR = "metrics"
+SERIES_SUFFIX = ".series"
+
+BOOT_TOLERANCE = 60.0
+"""Seconds the boot time can drift before the series is treated as
+being from an earlier boot."""
+
+# magic, version, reserved, capacity, count, next index, boot time
+_HEADER = struct.Struct("<4sHHIIId")
+_HEADER_SIZE = 64
+_SAMPLE_SIZE = struct.calcsize("d")
+
+
+@agent_validate.checked
+def series_path(name: str) -> pathlib.Path:
+    """Get the path to the series file for a metric."""
+    safe_name = re.sub(r"[^A-Za-z0-9_.]+", "-", name).strip("-")
+    return agent_op.state_file(SERIES_DIR) / f"{safe_name}{SERIES_SUFFIX}"
+
+
+def _boot_time() -> float:
+    return time.time() - time.monotonic()
+
+
+def _select(values: array.array, size: int, k: int) -> float:
+    """Get the k-th smallest of the first 'size' values.
+    The values are reordered in place."""
+    low, high = 0, size - 1
+    while low < high:
+        pivot = values[(low + high) // 2]
+        i, j = low, high
+        while i <= j:
+            while values[i] < pivot:
+                i += 1
+            while values[j] > pivot:
+                j -= 1
+            if i <= j:
+                values[i], values[j] = values[j], values[i]
+                i += 1
+                j -= 1
+        if k <= j:
+            high = j
+        elif k >= i:
+            low = i
+        else:
+            break
+    return values[k]
+
+
+class MetricSeries:
+    """The ring buffer of samples for one metric, in a mapped series file.
+    Use 'open_series' to get a series."""
+
+    def __init__(
+        self,
+        view: mmap.mmap,
+        capacity: int,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = capacity
+        self.clock = clock
+        self._view = view
+        values_start = _HEADER_SIZE + capacity * _SAMPLE_SIZE
+        buffer = memoryview(view)
+        self._times = buffer[_HEADER_SIZE:values_start].cast("d")
+        self._values = buffer[values_start:].cast("d")
+        buffer.release()
+        # space for the percentile selection, allocated once
+        self._scratch = array.array("d", bytes(capacity * _SAMPLE_SIZE))
+
+    def __len__(self) -> int:
+        return self._position()[0]
+
+    def release(self) -> None:
+        """Release the arrays, so the mapping can be closed."""
+        self._times.release()
+        self._values.release()
+
+    def append(self, value: float, at: typing.Optional[float] = None) -> None:
+        """Add a sample, replacing the oldest sample when the series is full."""
+        at = self.clock() if at is None else at
+        count, index = self._position()
+        if count and at < self._times[(index - 1) % self.capacity]:
+            # the clock has gone backwards, so the samples are not comparable
+            count, index = 0, 0
+
+        self._times[index] = at
+        self._values[index] = value
+        self._set_position(min(count + 1, self.capacity), (index + 1) % self.capacity)
+
+    def statistic(
+        self, name: str, seconds: float, now: typing.Optional[float] = None
+    ) -> typing.Optional[float]:
+        """Get a statistic of the samples in the last 'seconds'.
+        The name is 'mean', 'max', or a percentile such as 'p90'.
+        Returns None if there are no samples in the window."""
+        now = self.clock() if now is None else now
+        size = self._window_size(seconds, now)
+        if size == 0:
+            return None
+
+        if name == agent_model.STATISTIC_MEAN:
+            return self._sum(size) / size
+        if name == agent_model.STATISTIC_MAX:
+            return self._max(size)
+        if name in agent_model.STATISTICS:
+            return self._percentile(size, float(name[1:]))
+        agent_op.raise_options("statistic", name, agent_model.STATISTICS)
+
+    def _position(self) -> typing.Tuple[int, int]:
+        _, _, _, _, count, index, _ = _HEADER.unpack_from(self._view, 0)
+        return count, index
+
+    def _set_position(self, count: int, index: int) -> None:
+        magic, version, reserved, capacity, _, _, boot = _HEADER.unpack_from(
+            self._view, 0
+        )
+        _HEADER.pack_into(
+            self._view, 0, magic, version, reserved, capacity, count, index, boot
+        )
+
+    def _window_size(self, seconds: float, now: float) -> int:
+        """Get the number of latest samples that are in the window."""
+        count, index = self._position()
+        start = now - seconds
+        size = 0
+        while size < count and self._times[(index - 1 - size) % self.capacity] >= start:
+            size += 1
+        return size
+
+    def _sum(self, size: int) -> float:
+        _, index = self._position()
+        total = 0.0
+        for offset in range(1, size + 1):
+            total += self._values[(index - offset) % self.capacity]
+        return total
+
+    def _max(self, size: int) -> float:
+        _, index = self._position()
+        result = -math.inf
+        for offset in range(1, size + 1):
+            result = max(result, self._values[(index - offset) % self.capacity])
+        return result
+
+    def _percentile(self, size: int, percent: float) -> float:
+        """Get the nearest-rank percentile of the latest samples."""
+        _, index = self._position()
+        for offset in range(size):
+            self._scratch[offset] = self._values[(index - 1 - offset) % self.capacity]
+        rank = max(1, math.ceil(percent / 100.0 * size))
+        return _select(self._scratch, size, rank - 1)
+
+
+@contextlib.contextmanager
+def open_series(
+    path: pathlib.Path,
+    capacity: int = CAPACITY,
+    clock: typing.Callable[[], float] = time.monotonic,
+) -> typing.Iterator[MetricSeries]:
+    """Open, and create if needed, a series file, holding its lock.
+    A file from an earlier boot, or with a different layout, is cleared."""
+    size = _HEADER_SIZE + 2 * capacity * _SAMPLE_SIZE
+    boot = _boot_time()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+            os.pwrite(fd, bytes(_HEADER_SIZE), 0)
+
+        with mmap.mmap(fd, size) as view:
+            magic, version, _, stored_capacity, _, _, stored_boot = _HEADER.unpack_from(
+                view, 0
+            )
+            if (
+                magic != MAGIC
+                or version != VERSION
+                or stored_capacity != capacity
+                or abs(stored_boot - boot) > BOOT_TOLERANCE
+            ):
+                agent_op.log_msg(logging.DEBUG, f"Starting metric series '{path}'.")
+                _HEADER.pack_into(view, 0, MAGIC, VERSION, 0, capacity, 0, 0, boot)
+
+            series = MetricSeries(view, capacity, clock)
+            try:
+                yield series
+            finally:
+                series.release()
+    finally:
+        os.close(fd)
+
+
+@agent_validate.checked
+def windowed(
+    name: str,
+    value: float,
+    window: typing.Optional[float],
+    statistic: str = agent_model.STATISTIC_DEFAULT,
+    path: typing.Optional[pathlib.Path] = None,
+) -> float:
+    """Add a sample to the series for a metric, and get the statistic
+    of the samples in the last 'window' minutes.
+    Without a window, or if the series is not available, the sample is used."""
+    if not window:
+        return value
+
+    path = path or series_path(name)
+    try:
+        with open_series(path) as series:
+            series.append(value)
+            result = series.statistic(statistic, window * 60.0)
+    except OSError as e:
+        agent_op.log_msg(logging.WARNING, f"Could not use metric series '{path}': {e}")
+        return value
+    return value if result is None else result
+
+
+@agent_validate.checked
+def describe(window: typing.Optional[float], statistic: str) -> str:
+    """Describe the window a value is from, to go before the threshold."""
+    if not window:
+        return ""
+    return f"{statistic} over {window:g} minutes, "
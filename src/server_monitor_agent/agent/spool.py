@@ -0,0 +1,306 @@
+"""A persistent spool of agent items waiting to be sent.
+
+Each send writes the agent item and the send target to an append-only
+segment file of newline-delimited json records.
+A drainer then sends the records, retrying failed records with backoff
+on later drains. Each attempt is appended to the segment's event file.
+Segments are removed once all their records have been sent.
+"""
+
+import concurrent.futures
+import contextlib
+import dataclasses
+import fcntl
+import importlib
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+import uuid
+
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
+
+SEGMENT_SUFFIX = ".ndjson"
+EVENTS_SUFFIX = ".events"
+LOCK_NAME = "spool.lock"
+DRAIN_LOCK_NAME = "drain.lock"
+
+EVENT_SENT = "sent"
+EVENT_FAILED = "failed"
+
+
+@agent_validate.checked
+def encode_send_args(
+    send_args: agent_model.SendArgs,
+) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+    """Get the send args type name and json-compatible field values."""
+    cls = type(send_args)
+    target = f"{cls.__module__}:{cls.__qualname__}"
+    values = {}
+    for field in dataclasses.fields(send_args):
+        value = getattr(send_args, field.name)
+        if isinstance(value, pathlib.PurePath):
+            value = str(value)
+        elif isinstance(value, tuple):
+            value = list(value)
+        values[field.name] = value
+    return target, values
+
+
+@agent_validate.checked(boundary=True)
+def decode_send_args(
+    target: str, values: typing.Dict[str, typing.Any]
+) -> agent_model.SendArgs:
+    """Build the send args from the type name and field values."""
+    module_name, _, class_name = target.partition(":")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(cls, agent_model.SendArgs):
+        raise ValueError(f"Spool target is not a send args type: '{target}'.")
+
+    hints = typing.get_type_hints(cls)
+    raw = {}
+    for name, value in values.items():
+        hint = hints.get(name)
+        if value is not None and hint in [
+            pathlib.Path,
+            typing.Optional[pathlib.Path],
+        ]:
+            value = pathlib.Path(value)
+        raw[name] = value
+    return cls(**raw)
+
+
+class Spool:
+    """A directory of segment files holding agent items to send."""
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        segment_bytes: int = 1024 * 1024,
+        max_workers: int = 4,
+        per_target: int = 1,
+        retry_base: float = 30.0,
+        retry_cap: float = 3600.0,
+    ):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.max_workers = max_workers
+        self.per_target = per_target
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+
+    @contextlib.contextmanager
+    def _lock(self, name: str, blocking: bool = True):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with (self.path / name).open("a") as f:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(f.fileno(), flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def segments(self) -> typing.List[pathlib.Path]:
+        if not self.path.exists():
+            return []
+        return sorted(self.path.glob(f"*{SEGMENT_SUFFIX}"))
+
+    @staticmethod
+    def _append_line(path: pathlib.Path, data: typing.Dict[str, typing.Any]) -> None:
+        line = json.dumps(data, separators=(",", ":"), default=str) + "\n"
+        fd = os.open(str(path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line.encode("utf8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_lines(path: pathlib.Path) -> typing.Iterator[typing.Dict]:
+        if not path.exists():
+            return
+        with path.open("rt", encoding="utf8") as f:
+            for line in f:
+                # ignore a partly written last line
+                if not line.endswith("\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    agent_op.log_msg(
+                        logging.WARNING, f"Ignoring invalid spool line in '{path}'."
+                    )
+
+    @agent_validate.checked
+    def append(
+        self, send_args: agent_model.SendArgs, item: agent_model.AgentItem
+    ) -> str:
+        """Add an item to send to the spool. Returns the record id."""
+        target, target_args = encode_send_args(send_args)
+        record_id = uuid.uuid4().hex
+        data = {
+            "id": record_id,
+            "created": time.time(),
+            "target": target,
+            "target_args": target_args,
+            "item": item.to_dict(deep=False),
+        }
+        with self._lock(LOCK_NAME):
+            segments = self.segments()
+            if segments and segments[-1].stat().st_size < self.segment_bytes:
+                segment = segments[-1]
+            else:
+                number = int(segments[-1].stem) + 1 if segments else 1
+                segment = self.path / f"{number:012d}{SEGMENT_SUFFIX}"
+            self._append_line(segment, data)
+        return record_id
+
+    @agent_validate.checked
+    def pending(
+        self, now: typing.Optional[float] = None
+    ) -> typing.List[agent_model.SpoolRecord]:
+        """Get the records that have not been sent.
+        If 'now' is given, only get records that are due to be tried."""
+        result = []
+        for segment in self.segments():
+            events: typing.Dict[str, typing.Dict] = {}
+            for event in self._read_lines(segment.with_suffix(EVENTS_SUFFIX)):
+                events[event["id"]] = event
+
+            for data in self._read_lines(segment):
+                event = events.get(data["id"], {})
+                if event.get("status") == EVENT_SENT:
+                    continue
+                record = agent_model.SpoolRecord(
+                    record_id=data["id"],
+                    segment=segment.name,
+                    created=data["created"],
+                    target=data["target"],
+                    target_args=data["target_args"],
+                    item=data["item"],
+                    attempts=event.get("attempts", 0),
+                    next_attempt=event.get("next_attempt", 0.0),
+                    error=event.get("error"),
+                )
+                if now is None or record.next_attempt <= now:
+                    result.append(record)
+        return result
+
+    @agent_validate.checked
+    def drain(
+        self,
+        send: typing.Callable[[agent_model.SendArgs, agent_model.AgentItem], None],
+        now: typing.Optional[float] = None,
+    ) -> typing.Tuple[int, int]:
+        """Try to send the records that are due at 'now' (default: current time).
+        Records for the same target are sent in order by one worker.
+        Returns the number of records sent and the number that failed."""
+
+        with self._lock(DRAIN_LOCK_NAME, blocking=False) as locked:
+            if not locked:
+                agent_op.log_msg(
+                    logging.DEBUG, "Spool is being drained by another process."
+                )
+                return 0, 0
+
+            groups: typing.Dict[str, typing.List[agent_model.SpoolRecord]] = {}
+            for record in self.pending(now=time.time() if now is None else now):
+                groups.setdefault(record.target_key, []).append(record)
+
+            limits: typing.Dict[str, threading.Semaphore] = {}
+            for records in groups.values():
+                target = records[0].target
+                if target not in limits:
+                    limits[target] = threading.Semaphore(self.per_target)
+
+            def deliver(records: typing.List[agent_model.SpoolRecord]) -> int:
+                with limits[records[0].target]:
+                    return self._deliver(records, send)
+
+            sent = 0
+            total = sum(len(i) for i in groups.values())
+            if groups:
+                workers = min(self.max_workers, len(groups))
+                with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                    sent = sum(executor.map(deliver, groups.values()))
+
+            self.compact()
+
+        if total:
+            agent_op.log_msg(
+                logging.DEBUG, f"Spool drained: {sent} sent, {total - sent} failed."
+            )
+        return sent, total - sent
+
+    def _deliver(
+        self,
+        records: typing.List[agent_model.SpoolRecord],
+        send: typing.Callable[[agent_model.SendArgs, agent_model.AgentItem], None],
+    ) -> int:
+        """Send records for one target, then deliver anything they buffered."""
+        error = None
+        try:
+            send_args = decode_send_args(records[0].target, records[0].target_args)
+            for record in records:
+                send(send_args, agent_model.AgentItem.from_dict(record.item))
+            agent_op.run_flush()
+        except Exception as e:
+            error = f"'{e.__class__.__name__}': {e}"
+
+        now = time.time()
+        for record in records:
+            events_path = (self.path / record.segment).with_suffix(EVENTS_SUFFIX)
+            if error is None:
+                self._append_line(
+                    events_path, {"id": record.record_id, "status": EVENT_SENT}
+                )
+                continue
+
+            attempts = record.attempts + 1
+            delay = min(self.retry_cap, self.retry_base * (2 ** (attempts - 1)))
+            self._append_line(
+                events_path,
+                {
+                    "id": record.record_id,
+                    "status": EVENT_FAILED,
+                    "attempts": attempts,
+                    "next_attempt": now + delay,
+                    "error": error,
+                },
+            )
+
+        if error is not None:
+            agent_op.log_msg(
+                logging.WARNING,
+                f"Could not send {len(records)} spooled item(s) "
+                f"to {records[0].target}, will retry: {error}",
+            )
+            return 0
+        return len(records)
+
+    def compact(self) -> None:
+        """Remove segments where every record has been sent."""
+        with self._lock(LOCK_NAME):
+            for segment in self.segments():
+                events_path = segment.with_suffix(EVENTS_SUFFIX)
+                sent = {
+                    i["id"]
+                    for i in self._read_lines(events_path)
+                    if i.get("status") == EVENT_SENT
+                }
+                if all(i["id"] in sent for i in self._read_lines(segment)):
+                    segment.unlink()
+                    if events_path.exists():
+                        events_path.unlink()
@@ -0,0 +1,64 @@
+"""Run-time type checking of models and functions.
+
+The policy is read from the environment variable
+'SERVER_MONITOR_AGENT_VALIDATE' when a class or function is decorated,
+which is when its module is imported:
+
+- 'all' checks every decorated class and function.
+  This is the default in Python development mode ('python -X dev') and for tests.
+- 'boundary' only checks where values come from outside the agent:
+  the cli args models, the collect and send functions,
+  and the functions that read files or decode the wire format. This is the default.
+- 'none' does not check anything.
+
+Classes and functions that are not checked are not changed,
+so building thousands of results in a loop does not pay for the checks.
+This also means the policy cannot change for a module that is already imported,
+set the environment variable before the agent starts.
+"""
+
+import os
+import sys
+
+import beartype
+from beartype import typing
+
+ENV_NAME = "SERVER_MONITOR_AGENT_VALIDATE"
+
+POLICY_ALL = "all"
+POLICY_BOUNDARY = "boundary"
+POLICY_NONE = "none"
+POLICIES = [POLICY_ALL, POLICY_BOUNDARY, POLICY_NONE]
+
+
+def get_policy() -> str:
+    """Get the validation policy from the environment."""
+    value = os.environ.get(ENV_NAME, "").strip().lower()
+    if not value:
+        return POLICY_ALL if sys.flags.dev_mode else POLICY_BOUNDARY
+    if value not in POLICIES:
+        opts = ", ".join(POLICIES)
+        raise ValueError(f"Invalid {ENV_NAME} '{value}'. Choose one of {opts}.")
+    return value
+
+
+policy: typing.Optional[str] = None
+"""The policy to use instead of the environment variable, if set."""
+
+
+def checked(item=None, *, boundary: bool = False):
+    """Decorate a class or function to check its types, depending on the policy.
+
+    Use '@checked' for models and functions used inside the agent,
+    and '@checked(boundary=True)' for those that get values from outside.
+    """
+
+    def decorator(value):
+        current = policy or get_policy()
+        if current == POLICY_ALL or (boundary and current == POLICY_BOUNDARY):
+            return beartype.beartype(value)
+        return value
+
+    if item is None:
+        return decorator
+    return decorator(item)
@@ -0,0 +1,167 @@
+"""A compact binary format for streams of agent items.
+
+A stream starts with a header of the magic bytes and the schema version.
+Each agent item follows as a record, prefixed by its length.
+A record holds the item fields in a fixed order, encoded with 'marshal'.
+A header can also appear between records, so appending a stream to
+another gives a stream that holds the items of both.
+
+The format is for pipes between agent processes and the collectors that
+read from them. Like 'marshal', it is not meant for untrusted data.
+"""
+
+import datetime
+import io
+import marshal
+import struct
+
+from beartype import typing
+
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
+
+MAGIC = b"SMAW"
+VERSION = 1
+MARSHAL_VERSION = 4
+
+_HEADER = struct.Struct(">4sH")
+_LENGTH = struct.Struct(">I")
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+@agent_validate.checked
+def encode_item(item: agent_model.AgentItem) -> bytes:
+    """Encode an agent item as a record, without the length prefix."""
+    date = item.date
+    offset = date.utcoffset()
+    naive = date.replace(tzinfo=None)
+    return marshal.dumps(
+        (
+            item.summary,
+            item.description,
+            item.host_name,
+            item.source_name,
+            item.check_name,
+            (naive - _EPOCH) // _MICROSECOND,
+            None if offset is None else offset // datetime.timedelta(seconds=1),
+            item.status_name,
+            item.service_name,
+            item.extra_data,
+        ),
+        MARSHAL_VERSION,
+    )
+
+
+@agent_validate.checked(boundary=True)
+def decode_item(record: bytes) -> agent_model.AgentItem:
+    """Build an agent item from a record, without the length prefix."""
+    try:
+        fields = marshal.loads(record)
+    except (ValueError, EOFError, TypeError) as e:
+        raise ValueError("Invalid agent item record.") from e
+
+    if not isinstance(fields, tuple) or len(fields) != 10:
+        raise ValueError("Invalid agent item record.")
+
+    (
+        summary,
+        description,
+        host,
+        source,
+        check,
+        micros,
+        offset,
+        status,
+        service,
+        extra,
+    ) = fields
+    try:
+        date = _EPOCH + micros * _MICROSECOND
+        if offset is not None:
+            tz = datetime.timezone(datetime.timedelta(seconds=offset))
+            date = date.replace(tzinfo=tz)
+        return agent_model.AgentItem(
+            summary=summary,
+            description=description,
+            host_name=host,
+            source_name=source,
+            check_name=check,
+            date=date,
+            status_name=status,
+            service_name=service,
+            extra_data=extra,
+        )
+    except Exception as e:
+        raise ValueError(f"Invalid agent item record: {e}") from e
+
+
+@agent_validate.checked
+def write_items(
+    stream: io.BufferedIOBase, items: typing.Iterable[agent_model.AgentItem]
+) -> int:
+    """Write the header and the agent items to a binary stream.
+    Returns the number of items written."""
+    stream.write(_HEADER.pack(MAGIC, VERSION))
+    count = 0
+    for item in items:
+        record = encode_item(item)
+        stream.write(_LENGTH.pack(len(record)))
+        stream.write(record)
+        count += 1
+    return count
+
+
+@agent_validate.checked(boundary=True)
+def read_items(
+    stream: io.BufferedIOBase, max_bytes: typing.Optional[int] = None
+) -> typing.Iterator[agent_model.AgentItem]:
+    """Read the agent items from a binary stream, one at a time.
+    Streams that were written one after the other can be read as one stream.
+    Records longer than 'max_bytes' are not read."""
+    _read_header(stream.read(_HEADER.size))
+
+    while True:
+        prefix = stream.read(_LENGTH.size)
+        if not prefix:
+            return
+        if prefix == MAGIC:
+            _read_header(prefix + stream.read(_HEADER.size - len(prefix)))
+            continue
+        if len(prefix) != _LENGTH.size:
+            raise ValueError("Incomplete agent item record length.")
+        (length,) = _LENGTH.unpack(prefix)
+        if max_bytes is not None and length > max_bytes:
+            raise ValueError(
+                f"Agent item record of {length} bytes is over the limit of "
+                f"{max_bytes} bytes."
+            )
+        record = stream.read(length)
+        if len(record) != length:
+            raise ValueError("Incomplete agent item record.")
+        yield decode_item(record)
+
+
+@agent_validate.checked
+def encode(items: typing.Iterable[agent_model.AgentItem]) -> bytes:
+    """Encode agent items as a binary stream."""
+    buffer = io.BytesIO()
+    write_items(buffer, items)
+    return buffer.getvalue()
+
+
+@agent_validate.checked(boundary=True)
+def decode(content: bytes) -> typing.List[agent_model.AgentItem]:
+    """Decode all the agent items in a binary stream."""
+    return list(read_items(io.BytesIO(content)))
+
+
+def _read_header(header: bytes) -> None:
+    if len(header) != _HEADER.size:
+        raise ValueError("Missing agent item stream header.")
+    magic, version = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not an agent item stream.")
+    if version != VERSION:
+        raise ValueError(
+            f"Unsupported agent item stream version {version} (expected {VERSION})."
+        )
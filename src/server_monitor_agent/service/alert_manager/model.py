@@ -1,21 +1,32 @@
 import dataclasses
 import datetime
+import hashlib
+import json
+import pathlib
 
-import beartype
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class AlertManagerSendArgs(agent_model.SendArgs):
-    """"""
+    """Arguments for sending alerts to an Alertmanager."""
 
     base_url: str
+    resend_interval: float = 3600.0
+    state_file: typing.Optional[pathlib.Path] = None
+    window: float = 2.0
+    timeout: float = 10.0
 
 
-@beartype.beartype
+ALERT_ITEM_KEY = "alert_manager_item"
+LABEL_ALERT_NAME = "alertname"
+LABEL_SEVERITY = "severity"
+
+
+@agent_validate.checked
 @dataclasses.dataclass
 class AlertManagerItem(agent_model.ExternalItem, agent_model.AgentItemConvertMixin):
     labels: typing.Dict
@@ -25,11 +36,18 @@ class AlertManagerItem(agent_model.ExternalItem, agent_model.AgentItemConvertMix
     annotations: typing.Dict = dataclasses.field(default_factory=dict)
     additional_properties: typing.Dict = dataclasses.field(default_factory=dict)
 
+    def __post_init__(self):
+        # dates without a time zone are local time, and are compared with utc dates
+        for name in ["starts_at", "ends_at"]:
+            value = getattr(self, name)
+            if value is not None and value.tzinfo is None:
+                setattr(self, name, value.astimezone(datetime.timezone.utc))
+
     @classmethod
     def data_type_name(cls):
         return "prom-alert-manager"
 
-    @beartype.beartype
+    @agent_validate.checked
     def to_dict(self) -> typing.Dict:
         data = dataclasses.asdict(self)
 
@@ -41,7 +59,7 @@ class AlertManagerItem(agent_model.ExternalItem, agent_model.AgentItemConvertMix
         return data
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_dict(cls, item: typing.Dict) -> agent_model.ExternalItem:
         raw = {**item}
 
@@ -52,45 +70,83 @@ class AlertManagerItem(agent_model.ExternalItem, agent_model.AgentItemConvertMix
 
         return cls(**raw)
 
-    @beartype.beartype
+    @property
+    def identity(self) -> typing.Dict[str, str]:
+        """The labels that identify the check, without the severity."""
+        return {k: v for k, v in self.labels.items() if k != LABEL_SEVERITY}
+
+    @property
+    def fingerprint(self) -> str:
+        """A stable key for the check that raised this alert."""
+        content = json.dumps(self.identity, sort_keys=True)
+        return hashlib.sha256(content.encode("utf8")).hexdigest()[:16]
+
+    @property
+    def is_resolved(self) -> bool:
+        return self.ends_at is not None and self.ends_at <= datetime.datetime.now(
+            datetime.timezone.utc
+        )
+
+    @agent_validate.checked
+    def to_alert(self) -> typing.Dict[str, typing.Any]:
+        """Build the alert in the Alertmanager v2 api format."""
+        alert = {
+            **self.additional_properties,
+            "labels": self.labels,
+            "annotations": self.annotations,
+        }
+        if self.starts_at:
+            alert["startsAt"] = self.starts_at.isoformat(timespec="seconds")
+        if self.ends_at:
+            alert["endsAt"] = self.ends_at.isoformat(timespec="seconds")
+        if self.generator_url:
+            alert["generatorURL"] = self.generator_url
+        return alert
+
+    @agent_validate.checked
     def to_agent_item(self) -> agent_model.AgentItem:
-        key = "alert_manager_item"
-
-        raise NotImplementedError()
-        summary = ""
-        description = ""
-        host_name = ""
-        source_name = ""
-        check_name = ""
-        date = ""
-        status_name = ""
-        service_name = ""
-        extra_data = self.to_dict()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        labels = self.labels
+        severity = labels.get(LABEL_SEVERITY)
+        if self.is_resolved:
+            status_name = agent_model.REPORT_LEVEL_PASS
+        elif severity in agent_model.REPORT_LEVELS:
+            status_name = severity
+        else:
+            status_name = agent_model.REPORT_LEVEL_CRIT
+
+        check_name = labels.get(LABEL_ALERT_NAME, "")
         return agent_model.AgentItem(
-            summary=summary,
-            description=description,
-            host_name=host_name,
-            source_name=source_name,
+            summary=self.annotations.get("summary", check_name),
+            description=self.annotations.get("description", ""),
+            host_name=labels.get("instance", ""),
+            source_name=labels.get("source", "alert-manager"),
             check_name=check_name,
-            date=date,
+            date=(self.ends_at if self.is_resolved else self.starts_at) or now,
             status_name=status_name,
-            service_name=service_name,
-            extra_data={key: extra_data},
+            service_name=labels.get("service", check_name),
+            extra_data={ALERT_ITEM_KEY: self.to_dict()},
         )
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_agent_item(cls, item: agent_model.AgentItem) -> "AlertManagerItem":
-        key = "alert_manager_item"
-        if key in item.extra_data:
-            return cls(**item.extra_data[key])
+        if ALERT_ITEM_KEY in item.extra_data:
+            return cls.from_dict(item.extra_data[ALERT_ITEM_KEY])
+
+        labels = {
+            LABEL_ALERT_NAME: item.check_name,
+            "instance": item.host_name,
+            "service": item.service_name,
+            "source": item.source_name,
+        }
+        is_passing = item.status_name == agent_model.REPORT_LEVEL_PASS
+        if not is_passing:
+            labels[LABEL_SEVERITY] = item.status_name
 
-        raise NotImplementedError()
         return cls(
-            labels={},
-            generator_url="",
-            starts_at="",
-            ends_at="",
-            annotations={},
-            additional_properties={},
+            labels={k: v for k, v in labels.items() if v},
+            starts_at=item.date,
+            ends_at=item.date if is_passing else None,
+            annotations={"summary": item.summary, "description": item.description},
         )
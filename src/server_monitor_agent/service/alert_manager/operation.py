@@ -1,14 +1,194 @@
-import dataclasses
+import datetime
+import logging
+import pathlib
+import time
 
-import beartype
 import requests
+from beartype import typing
 
+from server_monitor_agent.agent import operation as agent_op, validate as agent_validate
 from server_monitor_agent.service.alert_manager import model as alert_model
 
+ALERT_MANAGER_BATCH = 500
+"""The most alerts to send in one request."""
 
-@beartype.beartype
-def submit_alerts(base_url: str, item: alert_model.AlertManagerItem) -> None:
-    url = f"{base_url}/alerts"
-    response = requests.post(url=url, json=dataclasses.asdict(item))
-    if not response.status_code != 200:
-        raise ValueError(f"Unexpected response from slack: {response}")
+ALERT_EXPIRY_FACTOR = 4
+"""Firing alerts expire after this many resend intervals without an update."""
+
+_alert_senders: typing.Dict[typing.Tuple[str, str], "AlertManagerSender"] = {}
+
+
+@agent_validate.checked
+def alerts_url(base_url: str) -> str:
+    """Get the v2 api alerts url from the Alertmanager base url."""
+    base_url = base_url.rstrip("/")
+    if not base_url.endswith("/api/v2"):
+        base_url = f"{base_url}/api/v2"
+    return f"{base_url}/alerts"
+
+
+@agent_validate.checked
+def default_state_file() -> pathlib.Path:
+    """Get the file that stores the alerts sent by this user."""
+    return agent_op.state_file("alert-manager.json")
+
+
+@agent_validate.checked
+def submit_alerts(
+    base_url: str,
+    alerts: typing.List[typing.Dict[str, typing.Any]],
+    max_attempts: int = 5,
+    timeout: float = 10.0,
+) -> None:
+    """Post alerts to an Alertmanager.
+    Retries server and connection errors with jittered exponential backoff."""
+    url = alerts_url(base_url)
+    for start in range(0, len(alerts), ALERT_MANAGER_BATCH):
+        end = start + ALERT_MANAGER_BATCH
+        batch = alerts[start:end]
+        error: typing.Optional[str] = None
+        for attempt in range(max_attempts):
+            try:
+                response = agent_op.http_session().post(
+                    url=url, json=batch, timeout=timeout
+                )
+            except requests.RequestException as e:
+                error = f"'{e.__class__.__name__}': {e}"
+            else:
+                if response.status_code == 200:
+                    error = None
+                    break
+
+                error = f"{response.status_code} {response.text}"
+                if response.status_code < 500:
+                    raise ValueError(f"Unexpected response from alert manager: {error}")
+
+            delay = agent_op.backoff_delay(attempt)
+            agent_op.log_msg(
+                logging.DEBUG, f"Retrying alert manager in {delay:.2f}s after {error}"
+            )
+            time.sleep(delay)
+
+        if error is not None:
+            raise ValueError(
+                f"Could not send alerts to alert manager "
+                f"in {max_attempts} tries: {error}"
+            )
+
+
+@agent_validate.checked
+def plan_alerts(
+    state: typing.Dict[str, typing.Dict[str, typing.Any]],
+    pending: typing.Sequence[typing.Tuple[alert_model.AlertManagerItem, float]],
+    now: datetime.datetime,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Get the alerts to send for the pending items, and update the state.
+
+    The state maps each alert fingerprint to the labels,
+    start date and last sent time of the firing alert.
+    Firing alerts that have not changed are only sent again after
+    the resend interval. Resolving an alert sends its end date.
+    """
+    alerts = []
+    for item, resend_interval in pending:
+        key = item.fingerprint
+        previous = state.get(key)
+        previous_item = None
+        if previous:
+            previous_item = alert_model.AlertManagerItem(
+                labels=previous["labels"],
+                starts_at=datetime.datetime.fromisoformat(previous["starts_at"]),
+                annotations=item.annotations,
+            )
+
+        if item.ends_at is not None and item.ends_at <= now:
+            if previous_item:
+                previous_item.ends_at = item.ends_at
+                alerts.append(previous_item.to_alert())
+                del state[key]
+            continue
+
+        is_same = previous_item is not None and previous_item.labels == item.labels
+        if previous_item and not is_same:
+            # the severity changed, so end the alert with the old severity
+            previous_item.ends_at = now
+            alerts.append(previous_item.to_alert())
+
+        now_ts = now.timestamp()
+        if is_same and now_ts - previous["last_sent"] < resend_interval:
+            continue
+
+        starts_at = previous_item.starts_at if is_same else item.starts_at or now
+        expires = now + datetime.timedelta(
+            seconds=resend_interval * ALERT_EXPIRY_FACTOR
+        )
+        alert = alert_model.AlertManagerItem(
+            labels=item.labels,
+            generator_url=item.generator_url,
+            starts_at=starts_at,
+            ends_at=expires,
+            annotations=item.annotations,
+            additional_properties=item.additional_properties,
+        )
+        alerts.append(alert.to_alert())
+        state[key] = {
+            "labels": item.labels,
+            "starts_at": starts_at.isoformat(timespec="seconds"),
+            "last_sent": now_ts,
+        }
+
+    return alerts
+
+
+class AlertManagerSender:
+    """Send the alerts for one Alertmanager in batches.
+    Alerts submitted within 'window' seconds of the first pending alert
+    are sent together."""
+
+    def __init__(
+        self,
+        base_url: str,
+        state_file: pathlib.Path,
+        window: float = 2.0,
+        timeout: float = 10.0,
+    ):
+        self.base_url = base_url
+        self.state_file = state_file
+        self.timeout = timeout
+        self.batch = agent_op.BatchWindow(self._send, window=window)
+
+    def submit(
+        self, item: alert_model.AlertManagerItem, resend_interval: float
+    ) -> None:
+        self.batch.add((item, resend_interval))
+
+    def flush(self) -> int:
+        """Send all pending alerts. Returns the number of items handled."""
+        return self.batch.flush()
+
+    def _send(
+        self, pending: typing.List[typing.Tuple[alert_model.AlertManagerItem, float]]
+    ) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with agent_op.locked_state(self.state_file) as state:
+            alerts = plan_alerts(state, pending, now)
+            if alerts:
+                submit_alerts(self.base_url, alerts, timeout=self.timeout)
+            agent_op.log_msg(
+                logging.DEBUG,
+                f"Sent {len(alerts)} alerts for {len(pending)} items "
+                f"to {self.base_url}",
+            )
+
+
+@agent_validate.checked
+def alert_sender(args: alert_model.AlertManagerSendArgs) -> AlertManagerSender:
+    """Get the sender for an Alertmanager and state file.
+    There is one sender for each of these in this process."""
+    state_file = args.state_file or default_state_file()
+    key = (args.base_url, str(state_file))
+    if key not in _alert_senders:
+        _alert_senders[key] = AlertManagerSender(
+            args.base_url, state_file, window=args.window, timeout=args.timeout
+        )
+    return _alert_senders[key]
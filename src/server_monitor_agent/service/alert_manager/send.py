@@ -1,4 +1,7 @@
+import pathlib
+
 import click
+from beartype import typing
 
 from server_monitor_agent.agent import io as agent_io, model as agent_model
 from server_monitor_agent.service.alert_manager import model as alert_model
@@ -6,7 +9,8 @@ from server_monitor_agent.service.alert_manager import model as alert_model
 
 @click.command(
     name="alert-manager",
-    epilog="",
+    epilog="Alerts are sent to the Alertmanager v2 api. "
+    "A passing check resolves the alert raised by the same check.",
     help="Let Alert Manager know to send out a notification.",
     short_help="Send a notification using Alert manager.",
 )
@@ -17,14 +21,58 @@ from server_monitor_agent.service.alert_manager import model as alert_model
     required=True,
     help="The base url for the alert manager.",
 )
+@click.option(
+    "-r",
+    "--resend-interval",
+    "resend_interval",
+    default=3600.0,
+    type=float,
+    help="Seconds to wait before sending an unchanged firing alert again.",
+)
+@click.option(
+    "-s",
+    "--state-file",
+    "state_file",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="The file that records the firing alerts. "
+    "Defaults to a file in the user's state directory.",
+)
+@click.option(
+    "-i",
+    "--window",
+    "window",
+    default=2.0,
+    type=float,
+    help="Combine alerts that arrive within this many seconds into one request.",
+)
+@click.option(
+    "-o",
+    "--timeout",
+    "timeout",
+    default=10.0,
+    type=float,
+    help="Seconds to wait for the alert manager to respond.",
+)
 @click.pass_context
-def alert_manager(ctx: click.Context, base_url: str):
-    ctx.obj = alert_model.AlertManagerSendArgs(base_url=base_url)
+def alert_manager(
+    ctx: click.Context,
+    base_url: str,
+    resend_interval: float,
+    state_file: typing.Optional[pathlib.Path],
+    window: float,
+    timeout: float,
+):
+    ctx.obj = alert_model.AlertManagerSendArgs(
+        base_url=base_url,
+        resend_interval=resend_interval,
+        state_file=state_file,
+        window=window,
+        timeout=timeout,
+    )
     agent_io.check_send_context(ctx)
     agent_io.execute_context(ctx)
 
 
-# TODO
-# register_commands = [
-#     agent_model.RegisterSendCmd(alert_manager),
-# ]
+register_commands = [
+    agent_model.RegisterSendCmd(alert_manager),
+]
@@ -1,8 +1,7 @@
 import dataclasses
 
-import beartype
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 from server_monitor_agent.service.consul import (
     model as consul_model,
     operation as consul_op,
@@ -10,7 +9,7 @@ from server_monitor_agent.service.consul import (
 from server_monitor_agent.service.server import operation as server_op
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def health_checks_input(
     args: consul_model.HealthCheckCollectArgs,
 ) -> agent_model.AgentItem:
@@ -38,6 +37,15 @@ def health_checks_input(
     )
 
 
+@agent_validate.checked(boundary=True)
+def ttl_check_output(
+    args: consul_model.ConsulTtlCheckSendArgs, item: agent_model.AgentItem
+) -> None:
+    check = consul_model.ConsulTtlCheckItem.from_agent_item(item, args)
+    consul_op.push_ttl_check(args, check)
+
+
 register_io = [
     agent_model.RegisterCollectInput(health_checks_input),
+    agent_model.RegisterSendOutput(ttl_check_output),
 ]
@@ -1,15 +1,19 @@
 import dataclasses
 import functools
 import pathlib
+import re
 
-import beartype
 import requests
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class ConsulWatchCheckItem(agent_model.ExternalItem, agent_model.AgentItemConvertMixin):
     """A consul watch item that can be a collect source."""
@@ -32,7 +36,7 @@ class ConsulWatchCheckItem(agent_model.ExternalItem, agent_model.AgentItemConver
     def data_type_name(cls):
         return "consul-watch-check"
 
-    @beartype.beartype
+    @agent_validate.checked
     def to_dict(self) -> typing.Dict:
         return {
             "Node": self.node,
@@ -46,7 +50,7 @@ class ConsulWatchCheckItem(agent_model.ExternalItem, agent_model.AgentItemConver
         }
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_dict(cls, item: typing.Dict) -> "ConsulWatchCheckItem":
         return ConsulWatchCheckItem(
             node=item["Node"],
@@ -59,7 +63,7 @@ class ConsulWatchCheckItem(agent_model.ExternalItem, agent_model.AgentItemConver
             service_name=item["ServiceName"],
         )
 
-    @beartype.beartype
+    @agent_validate.checked
     def to_agent_item(self) -> "agent_model.AgentItem":
         key = "consul_watch_check_item"
 
@@ -85,7 +89,7 @@ class ConsulWatchCheckItem(agent_model.ExternalItem, agent_model.AgentItemConver
         )
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_agent_item(cls, item: "agent_model.AgentItem") -> "ConsulWatchCheckItem":
         key = "consul_watch_check_item"
         if key in item.extra_data:
@@ -104,7 +108,8 @@ class ConsulWatchCheckItem(agent_model.ExternalItem, agent_model.AgentItemConver
         )
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_model.slotted
 @dataclasses.dataclass
 class ConsulHealthCheckStateItem(
     agent_model.ExternalItem, agent_model.AgentItemConvertMixin
@@ -128,6 +133,9 @@ class ConsulHealthCheckStateItem(
     service_tags: typing.List[str]  # consul: tags applied to the service
     namespace: typing.Optional[str] = None  # consul: enterprise-only namespace
 
+    def __post_init__(self):
+        agent_model.intern_fields(self, ["node", "status", "notes", "service_name"])
+
     # {
     #         "Node": "test-wsu-blue.redboxresearchdata.com.au",
     #         "CheckID": "system-mem-usage-check",
@@ -193,7 +201,7 @@ class ConsulHealthCheckStateItem(
     def data_type_name(cls):
         return "consul-health-check-state"
 
-    @beartype.beartype
+    @agent_validate.checked
     def to_dict(self) -> typing.Dict:
         return {
             "Node": self.node,
@@ -209,7 +217,7 @@ class ConsulHealthCheckStateItem(
         }
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_dict(cls, item: typing.Dict) -> "ConsulHealthCheckStateItem":
         return ConsulHealthCheckStateItem(
             node=item["Node"],
@@ -224,7 +232,7 @@ class ConsulHealthCheckStateItem(
             namespace=item["Namespace"],
         )
 
-    @beartype.beartype
+    @agent_validate.checked
     def to_agent_item(self) -> "agent_model.AgentItem":
         key = "consul_watch_check_item"
 
@@ -250,7 +258,7 @@ class ConsulHealthCheckStateItem(
         )
 
     @classmethod
-    @beartype.beartype
+    @agent_validate.checked
     def from_agent_item(
         cls, item: "agent_model.AgentItem"
     ) -> "ConsulHealthCheckStateItem":
@@ -273,7 +281,7 @@ class ConsulHealthCheckStateItem(
         )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class HealthCheckCollectArgs(agent_model.CollectArgs):
     http_addr: typing.Optional[str] = None
@@ -285,7 +293,7 @@ class HealthCheckCollectArgs(agent_model.CollectArgs):
     client_key: typing.Optional[pathlib.Path] = None
 
     @functools.cached_property
-    @beartype.beartype
+    @agent_validate.checked
     def to_settings(self) -> "ConsulConnectionSettings":
         return ConsulConnectionSettings(
             http_addr=self.http_addr,
@@ -298,7 +306,7 @@ class HealthCheckCollectArgs(agent_model.CollectArgs):
         )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class ConsulConnectionSettings:
     http_addr: str
@@ -308,17 +316,27 @@ class ConsulConnectionSettings:
     ca_cert_dir: typing.Optional[pathlib.Path] = None
     client_cert: typing.Optional[pathlib.Path] = None
     client_key: typing.Optional[pathlib.Path] = None
-
-    @beartype.beartype
-    def request_api(self, path: str) -> requests.Response:
+    token: typing.Optional[str] = None
+    timeout: float = 10.0
+
+    @agent_validate.checked
+    def request_api(
+        self,
+        path: str,
+        method: str = "GET",
+        json: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        expected: typing.Sequence[int] = (200,),
+    ) -> requests.Response:
+        """Send a request to the consul http api using the shared http session."""
         if not self.http_addr:
             raise ValueError("Consul settings are invalid: must provide http_addr.")
 
-        base_url = f"{self.http_addr}/v1"
+        base_url = f"{self.http_addr.rstrip('/')}/v1"
 
         if self.http_ssl_enabled and not self.http_addr.startswith("https"):
             raise ValueError(
-                "Consul settings are inconsistent: ssl is enabled but http_addr does not start with 'https'."
+                "Consul settings are inconsistent: "
+                "ssl is enabled but http_addr does not start with 'https'."
             )
 
         if self.ca_cert_file and self.http_ssl_enabled:
@@ -328,12 +346,14 @@ class ConsulConnectionSettings:
 
         if self.client_cert and not self.client_cert.exists():
             raise ValueError(
-                f"Consul client cert file is specified but does not exist: {self.client_cert}."
+                "Consul client cert file is specified but does not exist: "
+                f"{self.client_cert}."
             )
 
         if self.client_key and not self.client_key.exists():
             raise ValueError(
-                f"Consul client key file is specified but does not exist: {self.client_key}."
+                "Consul client key file is specified but does not exist: "
+                f"{self.client_key}."
             )
 
         if self.client_cert and self.client_key:
@@ -341,9 +361,110 @@ class ConsulConnectionSettings:
         else:
             cert = None
 
-        req = requests.get(f"{base_url}/{path}", verify=verify, cert=cert)
+        headers = {"X-Consul-Token": self.token} if self.token else None
 
-        if req.status_code != 200:
+        req = agent_op.http_session().request(
+            method=method,
+            url=f"{base_url}/{path}",
+            json=json,
+            headers=headers,
+            verify=verify,
+            cert=cert,
+            timeout=self.timeout,
+        )
+
+        if req.status_code not in expected:
             raise ValueError(f"Consul http api error {req.status_code}: {req.text}")
 
         return req
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ConsulTtlCheckSendArgs(agent_model.SendArgs):
+    """Arguments for pushing check results to consul agent TTL checks."""
+
+    http_addr: str = "http://127.0.0.1:8500"
+    http_ssl_verify: bool = True
+    ca_cert_file: typing.Optional[pathlib.Path] = None
+    client_cert: typing.Optional[pathlib.Path] = None
+    client_key: typing.Optional[pathlib.Path] = None
+    token: typing.Optional[str] = None
+    check_id: typing.Optional[str] = None
+    service_id: typing.Optional[str] = None
+    ttl: int = 300
+    state_file: typing.Optional[pathlib.Path] = None
+    timeout: float = 10.0
+
+    @functools.cached_property
+    @agent_validate.checked
+    def to_settings(self) -> "ConsulConnectionSettings":
+        return ConsulConnectionSettings(
+            http_addr=self.http_addr,
+            http_ssl_enabled=self.http_addr.startswith("https"),
+            http_ssl_verify=self.http_ssl_verify,
+            ca_cert_file=self.ca_cert_file,
+            client_cert=self.client_cert,
+            client_key=self.client_key,
+            token=self.token,
+            timeout=self.timeout,
+        )
+
+
+@agent_validate.checked
+@agent_model.slotted
+@dataclasses.dataclass
+class ConsulTtlCheckItem:
+    """A check result to push to a consul agent TTL check."""
+
+    # Docs: https://developer.hashicorp.com/consul/api-docs/agent/check
+
+    check_id: str  # consul: unique check id
+    name: str  # consul: displayed name
+    status: str  # consul: passing, warning or critical
+    output: str  # consul: the output shown for the check
+    ttl: int  # consul: seconds without an update before the check is critical
+    service_id: typing.Optional[str] = None  # consul: the service of the check
+
+    @agent_validate.checked
+    def to_register(self) -> typing.Dict[str, typing.Any]:
+        """Build the check definition for the agent check register api."""
+        check = {
+            "ID": self.check_id,
+            "Name": self.name,
+            "Notes": f"Updated by {agent_model.APP_NAME_DASH}.",
+            "TTL": f"{self.ttl}s",
+            "Status": self.status,
+        }
+        if self.service_id:
+            check["ServiceID"] = self.service_id
+        return check
+
+    @agent_validate.checked
+    def to_update(self) -> typing.Dict[str, typing.Any]:
+        """Build the body for the agent check update api."""
+        return {"Status": self.status, "Output": self.output}
+
+    @classmethod
+    @agent_validate.checked
+    def from_agent_item(
+        cls, item: agent_model.AgentItem, args: ConsulTtlCheckSendArgs
+    ) -> "ConsulTtlCheckItem":
+        if item.status_name in agent_model.REPORT_LEVELS:
+            status = item.status_name
+        else:
+            status = agent_model.REPORT_LEVEL_CRIT
+
+        name = " ".join(i for i in [item.check_name, item.service_name] if i)
+        # the check id is part of the update url
+        safe_name = re.sub(r"[^A-Za-z0-9_.]+", "-", name).strip("-")
+        check_id = args.check_id or f"{agent_model.APP_NAME_DASH}-{safe_name}"
+        output = "\n".join(i for i in [item.summary, item.description] if i)
+        return cls(
+            check_id=check_id,
+            name=name,
+            status=status,
+            output=output,
+            ttl=args.ttl,
+            service_id=args.service_id,
+        )
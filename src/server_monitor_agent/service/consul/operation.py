@@ -1,17 +1,27 @@
-import beartype
+import datetime
+import logging
+import pathlib
+
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.consul import model as consul_model
 
+CONSUL_TTL_REFRESH = 0.5
+"""Push an unchanged status again after this fraction of the check's TTL."""
+
 
-@beartype.beartype
+@agent_validate.checked
 def leader_private_ipv4(settings: consul_model.ConsulConnectionSettings) -> str:
     req = settings.request_api(settings, path="status/leader")
     return req.text
 
 
-@beartype.beartype
+@agent_validate.checked
 def health_checks(
     settings: consul_model.ConsulConnectionSettings,
     state: typing.Optional[str] = None,
@@ -29,3 +39,101 @@ def health_checks(
     data = req.json()
     items = [consul_model.ConsulHealthCheckStateItem.from_dict(i) for i in data]
     return items
+
+
+@agent_validate.checked
+def default_ttl_state_file() -> pathlib.Path:
+    """Get the file that stores the TTL check statuses pushed by this user."""
+    return agent_op.state_file("consul-ttl-checks.json")
+
+
+@agent_validate.checked
+def ttl_check_due(
+    previous: typing.Optional[typing.Dict[str, typing.Any]],
+    check: consul_model.ConsulTtlCheckItem,
+    now: float,
+) -> bool:
+    """Check whether a TTL check result needs to be pushed.
+    Only a changed status, or a status that is close to expiring, is pushed."""
+    if not previous or previous.get("status") != check.status:
+        return True
+    return now - previous.get("last_sent", 0.0) >= check.ttl * CONSUL_TTL_REFRESH
+
+
+@agent_validate.checked
+def register_ttl_check(
+    settings: consul_model.ConsulConnectionSettings,
+    check: consul_model.ConsulTtlCheckItem,
+) -> None:
+    """Register or replace a TTL check with the local consul agent."""
+    settings.request_api("agent/check/register", "PUT", check.to_register())
+
+
+@agent_validate.checked
+def update_ttl_check(
+    settings: consul_model.ConsulConnectionSettings,
+    check: consul_model.ConsulTtlCheckItem,
+) -> bool:
+    """Push the status and output of a TTL check.
+    Returns False if the consul agent does not know the check."""
+    req = settings.request_api(
+        f"agent/check/update/{check.check_id}",
+        "PUT",
+        check.to_update(),
+        expected=(200, 404, 500),
+    )
+    if req.status_code == 200:
+        return True
+
+    # older consul versions reply to an unknown check with a server error
+    if req.status_code == 404 or "unknown check" in req.text.lower():
+        return False
+
+    raise ValueError(f"Consul http api error {req.status_code}: {req.text}")
+
+
+@agent_validate.checked
+def push_ttl_check(
+    args: consul_model.ConsulTtlCheckSendArgs,
+    check: consul_model.ConsulTtlCheckItem,
+) -> bool:
+    """Push a TTL check result, if it has changed or is close to expiring.
+    The check is registered the first time, or when its TTL changes.
+    Returns whether the result was pushed."""
+    settings = args.to_settings
+    state_file = args.state_file or default_ttl_state_file()
+    key = f"{settings.http_addr} {check.check_id}"
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+
+    with agent_op.locked_state(state_file) as state:
+        previous = state.get(key)
+        if not ttl_check_due(previous, check, now):
+            return False
+
+        registered = {"ttl": check.ttl, "service_id": check.service_id}
+        if not previous or previous.get("registered") != registered:
+            register_ttl_check(settings, check)
+
+        if not update_ttl_check(settings, check):
+            agent_op.log_msg(
+                logging.INFO,
+                f"Registering consul check '{check.check_id}' again.",
+            )
+            register_ttl_check(settings, check)
+            if not update_ttl_check(settings, check):
+                raise ValueError(
+                    f"Consul does not know check '{check.check_id}' "
+                    "after registering it."
+                )
+
+        state[key] = {
+            "status": check.status,
+            "last_sent": now,
+            "registered": registered,
+        }
+
+    agent_op.log_msg(
+        logging.DEBUG,
+        f"Pushed consul check '{check.check_id}' status '{check.status}'.",
+    )
+    return True
@@ -0,0 +1,131 @@
+import pathlib
+
+import click
+from beartype import typing
+
+from server_monitor_agent.agent import io as agent_io, model as agent_model
+from server_monitor_agent.service.consul import model as consul_model
+
+
+@click.command(
+    name="consul-ttl-check",
+    epilog="The check is registered with the local consul agent as a TTL check. "
+    "A result is only pushed when the status changes, "
+    "or when half of the TTL has passed since the last push.",
+    help="Push the check result to a consul agent TTL check.",
+    short_help="Update a consul TTL check.",
+)
+@click.option(
+    "-a",
+    "--http-addr",
+    "http_addr",
+    default="http://127.0.0.1:8500",
+    help="The consul agent http api base url.",
+)
+@click.option(
+    "-v",
+    "--http-ssl-verify",
+    "http_ssl_verify",
+    type=bool,
+    default=True,
+    help="Whether the consul http api should verify the SSL certificate.",
+)
+@click.option(
+    "-f",
+    "--ca-cert-file",
+    "ca_cert_file",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=pathlib.Path),
+    help="Path to the CA cert file.",
+)
+@click.option(
+    "-c",
+    "--client-cert-file",
+    "client_cert",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=pathlib.Path),
+    help="Path to the client cert file.",
+)
+@click.option(
+    "-k",
+    "--client-key-file",
+    "client_key",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=pathlib.Path),
+    help="Path to the client key file.",
+)
+@click.option(
+    "-t",
+    "--token",
+    "token",
+    envvar="CONSUL_HTTP_TOKEN",
+    help="The consul acl token. Defaults to the CONSUL_HTTP_TOKEN variable.",
+)
+@click.option(
+    "-i",
+    "--check-id",
+    "check_id",
+    help="The consul check id. Defaults to an id built from the check and service.",
+)
+@click.option(
+    "-r",
+    "--service-id",
+    "service_id",
+    help="The id of the consul service the check belongs to.",
+)
+@click.option(
+    "-l",
+    "--ttl",
+    "ttl",
+    default=300,
+    type=click.IntRange(min=1),
+    help="Seconds without an update before consul marks the check as critical.",
+)
+@click.option(
+    "-s",
+    "--state-file",
+    "state_file",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="The file that records the pushed statuses. "
+    "Defaults to a file in the user's state directory.",
+)
+@click.option(
+    "-o",
+    "--timeout",
+    "timeout",
+    default=10.0,
+    type=float,
+    help="Seconds to wait for the consul agent to respond.",
+)
+@click.pass_context
+def consul_ttl_check(
+    ctx: click.Context,
+    http_addr: str,
+    http_ssl_verify: bool,
+    ca_cert_file: typing.Optional[pathlib.Path],
+    client_cert: typing.Optional[pathlib.Path],
+    client_key: typing.Optional[pathlib.Path],
+    token: typing.Optional[str],
+    check_id: typing.Optional[str],
+    service_id: typing.Optional[str],
+    ttl: int,
+    state_file: typing.Optional[pathlib.Path],
+    timeout: float,
+):
+    ctx.obj = consul_model.ConsulTtlCheckSendArgs(
+        http_addr=http_addr,
+        http_ssl_verify=http_ssl_verify,
+        ca_cert_file=ca_cert_file,
+        client_cert=client_cert,
+        client_key=client_key,
+        token=token,
+        check_id=check_id,
+        service_id=service_id,
+        ttl=ttl,
+        state_file=state_file,
+        timeout=timeout,
+    )
+    agent_io.check_send_context(ctx)
+    agent_io.execute_context(ctx)
+
+
+register_commands = [
+    agent_model.RegisterSendCmd(consul_ttl_check),
+]
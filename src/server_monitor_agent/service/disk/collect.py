@@ -30,6 +30,22 @@ from server_monitor_agent.service.disk import model as disk_model
 @click.option("-d", "--device", "device", type=click.Path())
 @click.option("-u", "--uuid", "disk_uuid", type=click.UUID)
 @click.option("-l", "--label", "label", type=str)
+@click.option(
+    "-w",
+    "--window",
+    "window",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Evaluate the threshold against the samples "
+    "from this many minutes, instead of the latest sample.",
+)
+@click.option(
+    "-s",
+    "--statistic",
+    "statistic",
+    default=agent_model.STATISTIC_DEFAULT,
+    type=click.Choice(agent_model.STATISTICS, case_sensitive=False),
+    help="The statistic of the samples in the window to evaluate.",
+)
 @click.pass_context
 def disk(
     ctx: click.Context,
@@ -38,11 +54,19 @@ def disk(
     device: typing.Optional[pathlib.Path],
     disk_uuid: typing.Optional[uuid.UUID],
     label: typing.Optional[str],
+    window: typing.Optional[float],
+    statistic: str,
 ):
     """Get the memory usage for this device."""
 
     ctx.obj = disk_model.DiskCollectArgs(
-        threshold=threshold, path=path, device=device, disk_uuid=disk_uuid, label=label
+        threshold=threshold,
+        path=path,
+        device=device,
+        disk_uuid=disk_uuid,
+        label=label,
+        window=window,
+        statistic=statistic,
     )
     agent_io.check_collect_context(ctx)
 
@@ -101,7 +125,7 @@ def file_status(
     "--path",
     "path",
     required=True,
-    type=click.Path(),
+    type=click.Path(path_type=pathlib.Path),
     help="Path to the input file.",
 )
 @click.option(
@@ -112,11 +136,24 @@ def file_status(
     type=click.Choice(agent_model.FORMATS, case_sensitive=False),
     help="Set the input format.",
 )
+@click.option(
+    "-e",
+    "--serialise",
+    "serialise_format",
+    default=agent_model.SERIALISE_DEFAULT,
+    type=click.Choice(agent_model.SERIALISE_FORMATS, case_sensitive=False),
+    help="Set how the content is encoded. Use ndjson or binary for many items.",
+)
 @click.pass_context
 def file_input(
-    ctx: click.Context, path: typing.Optional[pathlib.Path], file_format: str
+    ctx: click.Context,
+    path: typing.Optional[pathlib.Path],
+    file_format: str,
+    serialise_format: str,
 ):
-    ctx.obj = disk_model.FileInputCollectArgs(path=path, format=file_format)
+    ctx.obj = disk_model.FileInputCollectArgs(
+        path=path, format=file_format, serialise_format=serialise_format
+    )
     agent_io.check_collect_context(ctx)
 
 
@@ -1,5 +1,6 @@
 """Input (parsing) and output (formatting) functions for disks and files."""
-import beartype
+
+from beartype import typing
 from boltons import strutils
 
 try:
@@ -8,15 +9,18 @@ except ImportError:
     from backports import zoneinfo
 
 from server_monitor_agent.agent import (
+    board as agent_board,
     model as agent_model,
     operation as agent_op,
     convert as agent_convert,
+    series as agent_series,
+    validate as agent_validate,
 )
 from server_monitor_agent.service.disk import model as disk_model, operation as disk_op
 from server_monitor_agent.service.server import operation as server_op
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def disk_status_input(args: disk_model.DiskCollectArgs) -> agent_model.AgentItem:
     """Build the agent item for the device disk usage."""
 
@@ -26,24 +30,28 @@ def disk_status_input(args: disk_model.DiskCollectArgs) -> agent_model.AgentItem
     mnt = disk_op.disk_mounts(args.path, args.device, args.disk_uuid, args.label)
     partition = disk_op.disk_partitions(args.path, args.device, mnt.source, mnt.target)
 
-    usage = partition.percent_usage
-    test = float(args.threshold) / 100.0
-    status, status_code = agent_op.report_evaluate(usage, test)
-
     mount_point = partition.mountpoint
     path = mnt.target
 
+    usage = partition.percent_usage
+    test = float(args.threshold) / 100.0
+    value = agent_series.windowed(
+        f"disk {mount_point}", usage, args.window, args.statistic
+    )
+    window = agent_series.describe(args.window, args.statistic)
+    status, status_code = agent_op.report_evaluate(value, test)
+
     if status == agent_model.REPORT_LEVEL_PASS:
         title = f"Typical disk {path} use"
         descr = (
             f"Typical disk {path} ({mount_point}) "
-            f"use of {usage:.1%} (threshold {test:.1%})."
+            f"use of {value:.1%} ({window}threshold {test:.1%})."
         )
     else:
         title = f"High disk {path} use"
         descr = (
             f"High disk {path} ({mount_point}) "
-            f"use of {usage:.1%} (threshold {test:.1%}). "
+            f"use of {value:.1%} ({window}threshold {test:.1%}). "
             "Check instance for excessive log files or "
             "increased application storage use."
         )
@@ -66,29 +74,49 @@ def disk_status_input(args: disk_model.DiskCollectArgs) -> agent_model.AgentItem
             "free": strutils.bytes2human(partition.free),
             "used": strutils.bytes2human(partition.used),
             "usage": usage,
+            "value": value,
             "threshold": args.threshold,
         },
     )
 
 
-@beartype.beartype
-def file_input(args: disk_model.FileInputCollectArgs) -> agent_model.AgentItem:
-    content = disk_op.read_file(args.path)
-    data = agent_convert.from_content(content, "json")
-    item = agent_convert.to_agent_item(data, args.format)
-    return item
+@agent_validate.checked(boundary=True)
+def file_input(
+    args: disk_model.FileInputCollectArgs,
+) -> typing.Iterator[agent_model.AgentItem]:
+    with disk_op.open_file(args.path) as stream:
+        yield from agent_convert.iter_serialised(
+            stream, args.serialise_format, args.format
+        )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def file_output(
     args: disk_model.FileOutputSendArgs, item: agent_model.AgentItem
 ) -> None:
     data = agent_convert.from_agent_item(item, args.format)
-    content = agent_convert.to_content(data, "json")
-    disk_op.write_file(args.path, content)
+    content = agent_convert.to_content(data, args.serialise_format)
+    append = args.serialise_format in agent_model.SERIALISE_STREAMS
+    disk_op.write_file(args.path, content, append=append)
+
+
+@agent_validate.checked(boundary=True)
+def status_board_output(
+    args: disk_model.StatusBoardSendArgs, item: agent_model.AgentItem
+) -> None:
+    """Publish the item as the latest result of a check on the status board."""
+    if item.status_name in agent_model.REPORT_LEVELS:
+        exit_code = int(agent_op.report_code_from_level(item.status_name))
+    else:
+        exit_code = int(agent_model.REPORT_CODE_CRIT)
+
+    name = " ".join(i for i in [item.check_name, item.service_name] if i)
+    check_id = args.check_id or agent_board.default_check_id(name)
+    text = "\n".join(i for i in [item.summary, item.description] if i)
+    agent_board.publish(str(args.path), check_id, exit_code, text)
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def file_status_input(args: disk_model.FileStatusCollectArgs) -> agent_model.AgentItem:
     """Build the agent item for a file status."""
 
@@ -215,4 +243,5 @@ register_io = [
     agent_model.RegisterCollectInput(disk_status_input),
     agent_model.RegisterCollectInput(file_status_input),
     agent_model.RegisterSendOutput(file_output),
+    agent_model.RegisterSendOutput(status_board_output),
 ]
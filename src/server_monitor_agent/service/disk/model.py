@@ -3,13 +3,12 @@ import functools
 import pathlib
 import uuid
 
-import beartype
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class DiskCollectArgs(agent_model.CollectArgs):
     threshold: int = 80
@@ -17,8 +16,10 @@ class DiskCollectArgs(agent_model.CollectArgs):
     device: typing.Optional[pathlib.Path] = None
     disk_uuid: typing.Optional[uuid.UUID] = None
     label: typing.Optional[str] = None
+    window: typing.Optional[float] = None
+    statistic: str = agent_model.STATISTIC_DEFAULT
 
-    @beartype.beartype
+    @agent_validate.checked
     def validate(self):
         items = [self.path, self.device, self.disk_uuid, self.label]
         if not any([i for i in items if i]):
@@ -27,7 +28,7 @@ class DiskCollectArgs(agent_model.CollectArgs):
             )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class FileStatusCollectArgs(agent_model.CollectArgs):
     path: pathlib.Path
@@ -35,21 +36,31 @@ class FileStatusCollectArgs(agent_model.CollectArgs):
     content: typing.List[agent_model.TextCompareEntry]
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class FileInputCollectArgs(agent_model.CollectArgs):
     path: pathlib.Path
     format: str
+    serialise_format: str = agent_model.SERIALISE_DEFAULT
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class FileOutputSendArgs(agent_model.SendArgs):
     path: pathlib.Path
     format: str
+    serialise_format: str = agent_model.SERIALISE_DEFAULT
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class StatusBoardSendArgs(agent_model.SendArgs):
+    path: pathlib.Path
+    check_id: typing.Optional[str] = None
+
+
+@agent_validate.checked
+@agent_model.slotted
 @dataclasses.dataclass
 class FindMntResult(agent_model.OpResult):
     name: str
@@ -61,8 +72,11 @@ class FindMntResult(agent_model.OpResult):
     options: typing.Optional[str] = None
     label: typing.Optional[str] = None
 
+    def __post_init__(self):
+        agent_model.intern_fields(self, ["name", "fstype", "options"])
+
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class LsBlkResult(agent_model.OpResult):
     name: typing.Optional[str] = None
@@ -72,7 +86,7 @@ class LsBlkResult(agent_model.OpResult):
     type: typing.Optional[str] = None
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class DfResult(agent_model.OpResult):
     source: typing.Optional[str] = None
@@ -85,7 +99,7 @@ class DfResult(agent_model.OpResult):
     target: typing.Optional[str] = None
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class PartitionResult(agent_model.OpResult):
     device: str
@@ -100,6 +114,6 @@ class PartitionResult(agent_model.OpResult):
     percent: float
 
     @functools.cached_property
-    @beartype.beartype
+    @agent_validate.checked
     def percent_usage(self):
         return self.percent / 100.0
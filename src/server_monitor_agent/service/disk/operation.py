@@ -1,20 +1,27 @@
 """Functions to obtain information about disks and files."""
 
+import contextlib
+import io
 import json
 import logging
 import pathlib
 import uuid
 
-import beartype
 import psutil
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    profile as agent_profile,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.disk import model as disk_model
 
 logger = logging.getLogger(f"{agent_model.APP_NAME_UNDER}.device.disk")
 
 
+@agent_profile.timed("psutil")
 def partitions() -> typing.List[disk_model.PartitionResult]:
     """Get details of the disks available."""
 
@@ -91,10 +98,9 @@ def findmnt() -> typing.List[disk_model.FindMntResult]:
     }
 
     output = []
-    for k, v in sources.items():
-        args = [*common, v]
-        result = agent_op.execute_process(args)
-
+    items = [[*common, v] for v in sources.values()]
+    results = agent_op.execute_processes(items)
+    for k, args, result in zip(sources.keys(), items, results):
         agent_op.log_msg(logging.DEBUG, f"Result from '{' '.join(args)}': {result}")
 
         if result.returncode != 0:
@@ -220,19 +226,28 @@ def df() -> typing.List[disk_model.DfResult]:
     return output
 
 
-@beartype.beartype
-def write_file(out_target: pathlib.Path, content: str) -> None:
+@agent_validate.checked
+def write_file(
+    out_target: pathlib.Path, content: typing.Union[str, bytes], append: bool = False
+) -> None:
     if not out_target:
         raise ValueError(f"Must provide path to write.")
 
     out_target.parent.mkdir(parents=True, exist_ok=True)
-    out_target.write_text(content, encoding="utf8")
-
-
-@beartype.beartype
-def read_file(in_target: pathlib.Path) -> str:
+    mode = "a" if append else "w"
+    if isinstance(content, bytes):
+        with out_target.open(f"{mode}b") as f:
+            f.write(content)
+    else:
+        with out_target.open(mode, encoding="utf8") as f:
+            f.write(content)
+
+
+@contextlib.contextmanager
+def open_file(in_target: pathlib.Path) -> typing.Iterator[io.BufferedIOBase]:
+    """Open a file to read as a binary stream."""
     if not in_target or not in_target.exists():
         raise ValueError(f"File to read must exist: '{in_target}'.")
 
-    content = in_target.read_text(encoding="utf8")
-    return content
+    with in_target.open("rb") as f:
+        yield f
@@ -5,7 +5,11 @@ import pathlib
 import click
 from beartype import typing
 
-from server_monitor_agent.agent import io as agent_io, model as agent_model
+from server_monitor_agent.agent import (
+    board as agent_board,
+    io as agent_io,
+    model as agent_model,
+)
 from server_monitor_agent.service.disk import model as disk_model
 
 
@@ -20,7 +24,7 @@ from server_monitor_agent.service.disk import model as disk_model
     "--path",
     "path",
     required=True,
-    type=click.Path(),
+    type=click.Path(path_type=pathlib.Path),
     help="Path to the output file.",
 )
 @click.option(
@@ -31,16 +35,69 @@ from server_monitor_agent.service.disk import model as disk_model
     type=click.Choice(agent_model.FORMATS, case_sensitive=False),
     help="Set the output format.",
 )
+@click.option(
+    "-e",
+    "--serialise",
+    "serialise_format",
+    default=agent_model.SERIALISE_DEFAULT,
+    type=click.Choice(agent_model.SERIALISE_FORMATS, case_sensitive=False),
+    help="Set how the content is encoded. Items in ndjson or binary are appended.",
+)
 @click.pass_context
 def file_output(
-    ctx: click.Context, path: typing.Optional[pathlib.Path], out_format: str
+    ctx: click.Context,
+    path: typing.Optional[pathlib.Path],
+    out_format: str,
+    serialise_format: str,
 ):
     """Write to a file."""
-    ctx.obj = disk_model.FileOutputSendArgs(path=path, format=out_format)
+    ctx.obj = disk_model.FileOutputSendArgs(
+        path=path, format=out_format, serialise_format=serialise_format
+    )
+    agent_io.check_send_context(ctx)
+    agent_io.execute_context(ctx)
+
+
+@click.command(
+    name="status-board",
+    epilog="Read a result with 'server-monitor-agent-status PATH CHECK_ID'.",
+    help="Publish the output as the latest result of a check "
+    "to a memory-mapped status board file.",
+    short_help="Publish to a status board.",
+)
+@click.option(
+    "-p",
+    "--path",
+    "path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="Path to the status board file. It is created if it does not exist.",
+)
+@click.option(
+    "-i",
+    "--check-id",
+    "check_id",
+    help="The id of the check on the board. "
+    "Defaults to the check and service names.",
+)
+@click.pass_context
+def status_board(
+    ctx: click.Context,
+    path: pathlib.Path,
+    check_id: typing.Optional[str],
+):
+    """Publish to a status board."""
+    if check_id is not None:
+        try:
+            agent_board.validate_check_id(check_id)
+        except ValueError as e:
+            raise click.BadParameter(str(e), ctx=ctx, param_hint="'--check-id'")
+    ctx.obj = disk_model.StatusBoardSendArgs(path=path, check_id=check_id)
     agent_io.check_send_context(ctx)
     agent_io.execute_context(ctx)
 
 
 register_commands = [
     agent_model.RegisterSendCmd(file_output),
+    agent_model.RegisterSendCmd(status_board),
 ]
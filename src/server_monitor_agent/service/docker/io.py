@@ -1,4 +1,3 @@
-import beartype
 
 
 try:
@@ -6,7 +5,11 @@ try:
 except ImportError:
     from backports import zoneinfo
 
-from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.docker import (
     model as docker_model,
     operation as docker_op,
@@ -15,7 +18,7 @@ from server_monitor_agent.service.disk import operation as server_op
 from server_monitor_agent.service.server import operation as server_op
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def container_status_input(
     args: docker_model.ContainerStatusCollectArgs,
 ) -> agent_model.AgentItem:
@@ -1,12 +1,11 @@
 import dataclasses
 
-import beartype
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class ContainerStatusCollectArgs(agent_model.CollectArgs):
     name: str
@@ -14,7 +13,7 @@ class ContainerStatusCollectArgs(agent_model.CollectArgs):
     health: str
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class ContainerStatusResult(agent_model.OpResult):
     name: str
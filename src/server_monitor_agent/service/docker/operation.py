@@ -1,12 +1,14 @@
 import json
 
-import beartype
 
-from server_monitor_agent.agent import operation as agent_operation
+from server_monitor_agent.agent import (
+    operation as agent_operation,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.docker import model
 
 
-@beartype.beartype
+@agent_validate.checked
 def container_ls(name: str) -> model.ContainerStatusResult:
     if not name or not name.strip():
         raise ValueError("Must provide docker container name or id.")
@@ -0,0 +1,109 @@
+"""Commands for collecting information about network reachability."""
+
+import click
+from beartype import typing
+
+from server_monitor_agent.agent import io as agent_io, model as agent_model
+from server_monitor_agent.service.network import model as network_model
+
+
+def _parse_targets(
+    parse: typing.Callable[[str], network_model.ProbeTargetEntry],
+) -> typing.Callable:
+    """Build an option callback that parses each value as a probe target."""
+
+    def callback(ctx: click.Context, param: click.Parameter, values):
+        try:
+            return [parse(i) for i in values]
+        except ValueError as e:
+            raise click.BadParameter(str(e), ctx=ctx, param=param)
+
+    return callback
+
+
+@click.group(
+    name="reachability",
+    epilog="TCP probes open a connection to the port. "
+    "ICMP probes need the agent user's group to be "
+    "in the sysctl 'net.ipv4.ping_group_range'.",
+    help="Check whether network hosts and ports can be reached. "
+    + agent_model.TEXT_CHOOSE_NOTIFICATION,
+    short_help="Check network host reachability.",
+    no_args_is_help=False,
+    invoke_without_command=True,
+)
+@click.option(
+    "-t",
+    "--tcp",
+    "tcp_targets",
+    type=str,
+    multiple=True,
+    callback=_parse_targets(network_model.ProbeTargetEntry.from_tcp),
+    help="A 'host:port' to connect to.",
+)
+@click.option(
+    "-p",
+    "--icmp",
+    "icmp_targets",
+    type=str,
+    multiple=True,
+    callback=_parse_targets(network_model.ProbeTargetEntry.from_icmp),
+    help="A host to send ICMP echo (ping) requests to.",
+)
+@click.option(
+    "-n",
+    "--count",
+    "count",
+    default=3,
+    type=click.IntRange(min=1),
+    help="The number of probes to send to each target.",
+)
+@click.option(
+    "-w",
+    "--timeout",
+    "timeout",
+    default=2.0,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds to wait for each probe.",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    "concurrency",
+    default=256,
+    type=click.IntRange(min=1),
+    help="The maximum number of probes in flight at once.",
+)
+@click.option(
+    "-r",
+    "--rtt-threshold",
+    "threshold",
+    type=float,
+    help="Average round trip time in milliseconds over which is a warning.",
+)
+@click.pass_context
+def reachability(
+    ctx: click.Context,
+    tcp_targets: typing.Sequence[network_model.ProbeTargetEntry],
+    icmp_targets: typing.Sequence[network_model.ProbeTargetEntry],
+    count: int,
+    timeout: float,
+    concurrency: int,
+    threshold: typing.Optional[float],
+):
+    """Check network host reachability."""
+    ctx.obj = network_model.ReachabilityCollectArgs(
+        targets=[*tcp_targets, *icmp_targets],
+        count=count,
+        timeout=timeout,
+        concurrency=concurrency,
+        threshold=threshold,
+    )
+    agent_io.check_collect_context(ctx)
+    if not ctx.obj.targets:
+        raise click.UsageError("Must specify at least one --tcp or --icmp target.", ctx)
+
+
+register_commands = [
+    agent_model.RegisterCollectCmd(reachability),
+]
@@ -0,0 +1,100 @@
+"""Input (parsing) and output (formatting) functions for network reachability."""
+
+import dataclasses
+
+
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
+from server_monitor_agent.service.network import (
+    model as network_model,
+    operation as network_op,
+)
+from server_monitor_agent.service.server import operation as server_op
+
+
+@agent_validate.checked(boundary=True)
+def reachability_input(
+    args: network_model.ReachabilityCollectArgs,
+) -> agent_model.AgentItem:
+    """Build the agent item for the reachability of network targets."""
+
+    if not args.targets:
+        raise ValueError("Must specify at least one target to probe.")
+
+    hostname = server_op.hostname()
+    date = server_op.timezone().now
+
+    results = network_op.probe(
+        args.targets,
+        count=args.count,
+        timeout=args.timeout,
+        concurrency=args.concurrency,
+    )
+
+    unreachable = [i for i in results if not i.received]
+    lossy = [i for i in results if i.received and i.loss > 0]
+    slow = [
+        i
+        for i in results
+        if args.threshold is not None
+        and i.rtt_avg is not None
+        and i.rtt_avg > args.threshold
+    ]
+
+    if unreachable:
+        status = agent_model.REPORT_LEVEL_CRIT
+    elif lossy or slow:
+        status = agent_model.REPORT_LEVEL_WARN
+    else:
+        status = agent_model.REPORT_LEVEL_PASS
+
+    total = len(results)
+    if status == agent_model.REPORT_LEVEL_PASS:
+        title = "Targets reachable"
+        descr = f"All {total} targets were reachable."
+    else:
+        title = "Targets unreachable" if unreachable else "Targets degraded"
+        descr_items = [
+            (
+                f"{len(unreachable)} of {total} targets were unreachable."
+                if unreachable
+                else ""
+            ),
+            *[f"{i.display_name}: {i.error}." for i in unreachable],
+            *[f"{i.display_name}: lost {i.loss:.0%} of probes." for i in lossy],
+            *[
+                f"{i.display_name}: average round trip "
+                f"{i.rtt_avg:.1f}ms (threshold {args.threshold:.1f}ms)."
+                for i in slow
+            ],
+            "Check the network path and the services on the unreachable hosts.",
+        ]
+        descr = " ".join(i for i in descr_items if i)
+
+    return agent_model.AgentItem(
+        summary=title,
+        description=descr.strip(),
+        host_name=hostname,
+        source_name="network",
+        check_name="reachability",
+        date=date,
+        status_name=status,
+        service_name="reachability",
+        extra_data={
+            "targets": {
+                i.display_name: {
+                    k: v
+                    for k, v in dataclasses.asdict(i).items()
+                    if k not in ["host", "port", "protocol"]
+                }
+                for i in results
+            },
+            "count": args.count,
+            "timeout": args.timeout,
+            "threshold": args.threshold,
+        },
+    )
+
+
+register_io = [
+    agent_model.RegisterCollectInput(reachability_input),
+]
@@ -0,0 +1,79 @@
+import dataclasses
+
+from beartype import typing
+
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
+
+PROTOCOL_TCP = "tcp"
+PROTOCOL_ICMP = "icmp"
+PROTOCOLS = [PROTOCOL_TCP, PROTOCOL_ICMP]
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ProbeTargetEntry:
+    host: str
+    protocol: str = dataclasses.field(default=PROTOCOL_TCP)
+    port: typing.Optional[int] = None
+
+    @property
+    def display_name(self) -> str:
+        if self.port is None:
+            return f"{self.protocol}://{self.host}"
+        return f"{self.protocol}://{self.host}:{self.port}"
+
+    @classmethod
+    def from_tcp(cls, value: str) -> "ProbeTargetEntry":
+        host, sep, port = value.rpartition(":")
+        if not sep or not host or not port.isdigit():
+            raise ValueError(f"TCP target must be 'host:port', not '{value}'.")
+        return cls(host=host.strip("[]"), protocol=PROTOCOL_TCP, port=int(port))
+
+    @classmethod
+    def from_icmp(cls, value: str) -> "ProbeTargetEntry":
+        if not value or not value.strip():
+            raise ValueError("ICMP target must be a host name or address.")
+        return cls(host=value.strip(), protocol=PROTOCOL_ICMP)
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ReachabilityCollectArgs(agent_model.CollectArgs):
+    targets: typing.List[ProbeTargetEntry] = dataclasses.field(default_factory=list)
+    count: int = 3
+    timeout: float = 2.0
+    concurrency: int = 256
+    threshold: typing.Optional[float] = None
+    """Average round trip time in milliseconds over which a target is a warning."""
+
+
+@agent_validate.checked
+@dataclasses.dataclass
+class ProbeResult(agent_model.OpResult):
+    host: str
+    protocol: str
+    port: typing.Optional[int] = None
+    address: typing.Optional[str] = None
+    sent: int = 0
+    received: int = 0
+    rtt_min: typing.Optional[float] = None
+    """minimum round trip time in milliseconds"""
+    rtt_avg: typing.Optional[float] = None
+    """mean round trip time in milliseconds"""
+    rtt_max: typing.Optional[float] = None
+    """maximum round trip time in milliseconds"""
+    rtt_stdev: typing.Optional[float] = None
+    """population standard deviation of the round trip time in milliseconds"""
+    error: typing.Optional[str] = None
+
+    @property
+    def loss(self) -> float:
+        if not self.sent:
+            return 1.0
+        return (self.sent - self.received) / self.sent
+
+    @property
+    def display_name(self) -> str:
+        return ProbeTargetEntry(
+            host=self.host, protocol=self.protocol, port=self.port
+        ).display_name
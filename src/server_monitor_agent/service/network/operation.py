@@ -0,0 +1,214 @@
+"""Operations to check whether network hosts can be reached."""
+
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import statistics
+import struct
+import time
+
+from beartype import typing
+
+from server_monitor_agent.agent import operation as agent_op, validate as agent_validate
+from server_monitor_agent.service.network import model as network_model
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+_icmp_sequence = itertools.count(1)
+
+
+def _icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_packet(family: int, sequence: int) -> bytes:
+    """Build an echo request.
+    The kernel sets the identifier for datagram ICMP sockets."""
+    kind = ICMP_ECHO_REQUEST if family == socket.AF_INET else ICMPV6_ECHO_REQUEST
+    payload = struct.pack("!d", time.monotonic()) + os.urandom(8)
+    header = struct.pack("!BBHHH", kind, 0, 0, 0, sequence)
+    checksum = _icmp_checksum(header + payload)
+    header = struct.pack("!BBHHH", kind, 0, checksum, 0, sequence)
+    return header + payload
+
+
+def _icmp_socket(family: int) -> socket.socket:
+    proto = socket.IPPROTO_ICMP if family == socket.AF_INET else socket.IPPROTO_ICMPV6
+    sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+    sock.setblocking(False)
+    return sock
+
+
+@agent_validate.checked
+def icmp_available(family: int = socket.AF_INET) -> bool:
+    """Check whether unprivileged ICMP echo is allowed on this system.
+    See the sysctl 'net.ipv4.ping_group_range'."""
+    try:
+        _icmp_socket(family).close()
+        return True
+    except OSError:
+        return False
+
+
+async def _resolve(
+    loop: asyncio.AbstractEventLoop, host: str, port: typing.Optional[int]
+) -> typing.Tuple[int, typing.Tuple]:
+    infos = await loop.getaddrinfo(
+        host, port or 0, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP
+    )
+    if not infos:
+        raise OSError(f"Could not resolve '{host}'.")
+    family, _, _, _, address = infos[0]
+    return family, address
+
+
+async def _tcp_probe(family: int, address: typing.Tuple, timeout: float) -> float:
+    start = time.perf_counter()
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(host=address[0], port=address[1], family=family),
+        timeout=timeout,
+    )
+    elapsed = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return elapsed
+
+
+async def _icmp_probe(family: int, address: typing.Tuple, timeout: float) -> float:
+    loop = asyncio.get_running_loop()
+    sequence = next(_icmp_sequence) & 0xFFFF
+    reply = ICMP_ECHO_REPLY if family == socket.AF_INET else ICMPV6_ECHO_REPLY
+    sock = _icmp_socket(family)
+    try:
+        await loop.sock_connect(sock, (address[0], 0))
+        start = time.perf_counter()
+        await loop.sock_sendall(sock, _icmp_packet(family, sequence))
+
+        async def wait_reply() -> float:
+            while True:
+                data = await loop.sock_recv(sock, 1024)
+                if len(data) < 8:
+                    continue
+                kind, _, _, _, seq = struct.unpack("!BBHHH", data[:8])
+                if kind == reply and seq == sequence:
+                    return time.perf_counter() - start
+
+        return await asyncio.wait_for(wait_reply(), timeout=timeout)
+    finally:
+        sock.close()
+
+
+async def _probe_target(
+    target: network_model.ProbeTargetEntry,
+    count: int,
+    timeout: float,
+    semaphore: asyncio.Semaphore,
+) -> network_model.ProbeResult:
+    loop = asyncio.get_running_loop()
+    result = network_model.ProbeResult(
+        exit_code=0, host=target.host, protocol=target.protocol, port=target.port
+    )
+
+    if target.protocol == network_model.PROTOCOL_TCP:
+        probe = _tcp_probe
+    elif target.protocol == network_model.PROTOCOL_ICMP:
+        probe = _icmp_probe
+    else:
+        agent_op.raise_options(
+            "probe protocol", target.protocol, network_model.PROTOCOLS
+        )
+
+    try:
+        async with semaphore:
+            family, address = await asyncio.wait_for(
+                _resolve(loop, target.host, target.port), timeout=timeout
+            )
+    except (OSError, asyncio.TimeoutError) as e:
+        result.exit_code = 2
+        result.error = f"Could not resolve host: {e or e.__class__.__name__}"
+        return result
+
+    result.address = address[0]
+
+    async def attempt() -> typing.Union[float, BaseException]:
+        async with semaphore:
+            try:
+                return await probe(family, address, timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                return e
+
+    outcomes = await asyncio.gather(*[attempt() for _ in range(count)])
+
+    rtts = [i * 1000.0 for i in outcomes if isinstance(i, float)]
+    errors = [i for i in outcomes if not isinstance(i, float)]
+
+    result.sent = count
+    result.received = len(rtts)
+    if rtts:
+        result.rtt_min = round(min(rtts), 3)
+        result.rtt_avg = round(statistics.fmean(rtts), 3)
+        result.rtt_max = round(max(rtts), 3)
+        result.rtt_stdev = round(statistics.pstdev(rtts), 3)
+    if errors:
+        error = errors[0]
+        result.error = str(error) or error.__class__.__name__
+    if not rtts:
+        result.exit_code = 2
+
+    return result
+
+
+async def _probe_all(
+    targets: typing.Sequence[network_model.ProbeTargetEntry],
+    count: int,
+    timeout: float,
+    concurrency: int,
+) -> typing.List[network_model.ProbeResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+    return list(
+        await asyncio.gather(
+            *[_probe_target(t, count, timeout, semaphore) for t in targets]
+        )
+    )
+
+
+@agent_validate.checked
+def probe(
+    targets: typing.Sequence[network_model.ProbeTargetEntry],
+    count: int = 3,
+    timeout: float = 2.0,
+    concurrency: int = 256,
+) -> typing.List[network_model.ProbeResult]:
+    """Probe the targets concurrently from a single event loop.
+    Each target is sent 'count' probes, each with its own timeout in seconds.
+    At most 'concurrency' probes are in flight at once."""
+
+    if count < 1:
+        raise ValueError("Must send at least one probe to each target.")
+    if concurrency < 1:
+        raise ValueError("Must allow at least one probe at a time.")
+    if not targets:
+        return []
+
+    result = asyncio.run(_probe_all(targets, count, timeout, concurrency))
+
+    agent_op.log_msg(
+        logging.DEBUG,
+        f"Result from probing {len(targets)} targets: "
+        f"{sum(1 for i in result if i.received)} reachable",
+    )
+
+    return result
@@ -0,0 +1,27 @@
+"""Output (formatting) functions for Prometheus metrics."""
+
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
+from server_monitor_agent.service.prometheus import (
+    model as prom_model,
+    operation as prom_op,
+)
+
+
+@agent_validate.checked(boundary=True)
+def textfile_output(
+    args: prom_model.PrometheusTextfileSendArgs, item: agent_model.AgentItem
+) -> None:
+    prom_op.write_textfile(args.path, item)
+
+
+@agent_validate.checked(boundary=True)
+def serve_metrics_output(
+    args: prom_model.ServeMetricsSendArgs, item: agent_model.AgentItem
+) -> None:
+    prom_op.metrics_registry().update(item)
+
+
+register_io = [
+    agent_model.RegisterSendOutput(textfile_output),
+    agent_model.RegisterSendOutput(serve_metrics_output),
+]
@@ -0,0 +1,43 @@
+import dataclasses
+import pathlib
+
+from beartype import typing
+
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
+
+METRIC_PREFIX = agent_model.APP_NAME_UNDER
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class PrometheusTextfileSendArgs(agent_model.SendArgs):
+    """Arguments for writing metrics to a node exporter textfile."""
+
+    path: pathlib.Path
+
+
+@agent_validate.checked(boundary=True)
+@dataclasses.dataclass
+class ServeMetricsSendArgs(agent_model.SendArgs):
+    """Arguments for serving metrics over http."""
+
+    host: str = "0.0.0.0"
+    port: int = 9847
+    interval: float = 60.0
+
+
+@agent_validate.checked
+@dataclasses.dataclass
+class MetricSample:
+    """One value of a gauge metric."""
+
+    name: str
+    labels: typing.Dict[str, str]
+    value: float
+    help_text: str = ""
+
+    @property
+    def key(self) -> typing.Tuple[str, typing.Tuple[typing.Tuple[str, str], ...]]:
+        return self.name, tuple(sorted(self.labels.items()))
@@ -0,0 +1,314 @@
+import fcntl
+import logging
+import os
+import pathlib
+import re
+import tempfile
+import threading
+import time
+from http import server
+
+from beartype import typing
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
+from server_monitor_agent.service.prometheus import model as prom_model
+
+_METRIC_NAME_INVALID = re.compile(r"[^a-zA-Z0-9_]+")
+_STATE_KEY = re.compile(r"(^|_)(state|health)$")
+_SAMPLE_LINE = re.compile(
+    r"^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?P<labels>.*)\})? (?P<value>\S+)$"
+)
+_SAMPLE_LABEL = re.compile(
+    r'(?P<key>[a-zA-Z_][a-zA-Z0-9_]*)="(?P<value>(?:[^"\\]|\\.)*)"'
+)
+
+_metrics_registry: typing.Optional["MetricRegistry"] = None
+
+
+@agent_validate.checked
+def metric_name(*parts: str) -> str:
+    """Build a valid metric name from the parts."""
+    name = "_".join(_METRIC_NAME_INVALID.sub("_", i).strip("_") for i in parts if i)
+    name = re.sub("_+", "_", name).lower()
+    if name[:1].isdigit():
+        name = f"_{name}"
+    return name
+
+
+@agent_validate.checked
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+@agent_validate.checked
+def unescape_label_value(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+@agent_validate.checked
+def format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in [float("inf"), float("-inf")]:
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+@agent_validate.checked
+def sample_line(sample: prom_model.MetricSample) -> str:
+    labels = ",".join(
+        f'{k}="{escape_label_value(v)}"' for k, v in sorted(sample.labels.items())
+    )
+    labels = f"{{{labels}}}" if labels else ""
+    return f"{sample.name}{labels} {format_value(sample.value)}"
+
+
+@agent_validate.checked
+def item_labels(item: agent_model.AgentItem) -> typing.Dict[str, str]:
+    """Get the labels that identify the check that built the agent item."""
+    return {
+        "check": item.check_name,
+        "source": item.source_name,
+        "service": item.service_name,
+        "host": item.host_name,
+    }
+
+
+@agent_validate.checked
+def item_samples(item: agent_model.AgentItem) -> typing.List[prom_model.MetricSample]:
+    """Get the metrics from an agent item.
+
+    There is always a status and a timestamp sample.
+    Numbers in the extra data become gauges named after the check and key.
+    Nested dictionaries with keys that are not names, such as hosts,
+    add a 'key' label. Text values are only used for keys ending in
+    'state' or 'health', as a gauge of 1 with the text in a 'value' label.
+    """
+    labels = item_labels(item)
+    prefix = prom_model.METRIC_PREFIX
+    samples = [
+        prom_model.MetricSample(
+            name=metric_name(prefix, "status"),
+            labels=labels,
+            value=float(agent_op.report_code_from_level(item.status_name)),
+            help_text="The check status: 0 passing, 1 warning, 2 critical.",
+        ),
+        prom_model.MetricSample(
+            name=metric_name(prefix, "last_run_timestamp_seconds"),
+            labels=labels,
+            value=item.date.timestamp(),
+            help_text="The time the check was run.",
+        ),
+    ]
+
+    def add(name: str, key: str, value: typing.Any, extra: typing.Dict[str, str]):
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                sub_key = str(sub_key)
+                if re.fullmatch(r"[a-zA-Z_][a-zA-Z0-9_]*", sub_key):
+                    add(metric_name(name, sub_key), sub_key, sub_value, extra)
+                else:
+                    add(name, key, sub_value, {**extra, "key": sub_key})
+            return
+
+        if isinstance(value, bool):
+            number = 1.0 if value else 0.0
+        elif isinstance(value, (int, float)):
+            number = float(value)
+        elif isinstance(value, str) and _STATE_KEY.search(key):
+            extra = {**extra, "value": value}
+            number = 1.0
+        elif isinstance(value, str):
+            try:
+                number = float(value)
+            except ValueError:
+                return
+        else:
+            return
+
+        samples.append(
+            prom_model.MetricSample(name=name, labels={**labels, **extra}, value=number)
+        )
+
+    add(metric_name(prefix, item.check_name), "", item.extra_data, {})
+    return samples
+
+
+class MetricRegistry:
+    """The latest metrics for each check.
+    The text exposition is built once after each change."""
+
+    def __init__(self):
+        self._samples: typing.Dict[typing.Tuple, prom_model.MetricSample] = {}
+        self._lock = threading.Lock()
+        self._text: typing.Optional[str] = None
+
+    def update(self, item: agent_model.AgentItem) -> None:
+        """Replace the metrics for the check that built the agent item."""
+        self.replace(item_labels(item), item_samples(item))
+
+    def replace(
+        self,
+        labels: typing.Dict[str, str],
+        samples: typing.Iterable[prom_model.MetricSample],
+    ) -> None:
+        """Replace the samples that have all the given labels."""
+        with self._lock:
+            self._samples = {
+                k: v
+                for k, v in self._samples.items()
+                if any(v.labels.get(lk) != lv for lk, lv in labels.items())
+            }
+            for sample in samples:
+                self._samples[sample.key] = sample
+            self._text = None
+
+    def load_text(self, content: str) -> None:
+        """Add the samples from text in the exposition format."""
+        helps = {}
+        samples = []
+        for line in content.splitlines():
+            if line.startswith("# HELP "):
+                _, _, name, help_text = line.split(" ", 3)
+                helps[name] = help_text
+                continue
+            match = _SAMPLE_LINE.match(line)
+            if not match:
+                continue
+            labels = {
+                i.group("key"): unescape_label_value(i.group("value"))
+                for i in _SAMPLE_LABEL.finditer(match.group("labels") or "")
+            }
+            name = match.group("name")
+            samples.append(
+                prom_model.MetricSample(
+                    name=name,
+                    labels=labels,
+                    value=float(match.group("value")),
+                    help_text=helps.get(name, ""),
+                )
+            )
+        with self._lock:
+            for sample in samples:
+                self._samples[sample.key] = sample
+            self._text = None
+
+    def render(self) -> str:
+        """Get the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            if self._text is not None:
+                return self._text
+
+            families: typing.Dict[str, typing.List[prom_model.MetricSample]] = {}
+            for key in sorted(self._samples.keys()):
+                sample = self._samples[key]
+                families.setdefault(sample.name, []).append(sample)
+
+            lines = []
+            for name, samples in families.items():
+                help_text = next((i.help_text for i in samples if i.help_text), "")
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(sample_line(i) for i in samples)
+
+            self._text = "\n".join(lines) + "\n" if lines else ""
+            return self._text
+
+
+@agent_validate.checked
+def metrics_registry() -> MetricRegistry:
+    """Get the metrics registry for this process."""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricRegistry()
+    return _metrics_registry
+
+
+@agent_validate.checked
+def write_textfile(path: pathlib.Path, item: agent_model.AgentItem) -> None:
+    """Update the metrics for the agent item in a node exporter textfile.
+    The file is replaced atomically, so the exporter never reads a partial file.
+    Metrics for other checks in the file are kept."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.with_name(f".{path.name}.lock").open("a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+
+        registry = MetricRegistry()
+        if path.exists():
+            registry.load_text(path.read_text())
+        registry.update(item)
+
+        fd, temp_name = tempfile.mkstemp(
+            dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wt") as f:
+                f.write(registry.render())
+            os.chmod(temp_name, 0o644)
+            os.replace(temp_name, path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+
+class MetricsHTTPRequestHandler(server.BaseHTTPRequestHandler):
+    """Serve the metrics registry at '/metrics'."""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        content = self.server.registry.render().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", prom_model.CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        agent_op.log_msg(logging.DEBUG, f"Metrics request: {format % args}")
+
+
+@agent_validate.checked
+def start_metrics_server(
+    host: str, port: int, registry: typing.Optional[MetricRegistry] = None
+) -> server.ThreadingHTTPServer:
+    """Serve the metrics in a background thread."""
+    httpd = server.ThreadingHTTPServer((host, port), MetricsHTTPRequestHandler)
+    httpd.daemon_threads = True
+    httpd.registry = registry or metrics_registry()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    agent_op.log_msg(
+        logging.INFO, f"Serving metrics at http://{host}:{httpd.server_port}/metrics"
+    )
+    return httpd
+
+
+@agent_validate.checked
+def run_every(
+    interval: float,
+    func: typing.Callable[[], None],
+    stop: typing.Optional[threading.Event] = None,
+) -> None:
+    """Run a function every 'interval' seconds until 'stop' is set.
+    Errors are logged, and do not stop the next run."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            func()
+        except Exception as e:
+            agent_op.log_msg(
+                logging.ERROR,
+                f"Could not update metrics: '{e.__class__.__name__}': {e}",
+            )
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
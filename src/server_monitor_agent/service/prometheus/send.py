@@ -0,0 +1,82 @@
+"""Commands for making metrics available to Prometheus."""
+
+import pathlib
+
+import click
+
+from server_monitor_agent.agent import io as agent_io, model as agent_model
+from server_monitor_agent.service.prometheus import (
+    model as prom_model,
+    operation as prom_op,
+)
+
+
+@click.command(
+    name="prometheus-textfile",
+    epilog="Metrics for other checks in the file are kept. "
+    "Use the node exporter textfile collector directory.",
+    help="Write the metrics from the check to a Prometheus textfile.",
+    short_help="Write to a Prometheus textfile.",
+)
+@click.option(
+    "-p",
+    "--path",
+    "path",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="Path to the '.prom' file.",
+)
+@click.pass_context
+def prometheus_textfile(ctx: click.Context, path: pathlib.Path):
+    """Write to a Prometheus textfile."""
+    ctx.obj = prom_model.PrometheusTextfileSendArgs(path=path)
+    agent_io.check_send_context(ctx)
+    agent_io.execute_context(ctx)
+
+
+@click.command(
+    name="serve-metrics",
+    epilog="The check runs on the interval, not for each request. "
+    "Runs until stopped.",
+    help="Run the check repeatedly and serve the latest metrics at '/metrics'.",
+    short_help="Serve metrics over http.",
+)
+@click.option(
+    "-h",
+    "--host",
+    "host",
+    default="0.0.0.0",
+    help="The address to listen on.",
+)
+@click.option(
+    "-p",
+    "--port",
+    "port",
+    default=9847,
+    type=click.IntRange(min=0, max=65535),
+    help="The port to listen on.",
+)
+@click.option(
+    "-i",
+    "--interval",
+    "interval",
+    default=60.0,
+    type=click.FloatRange(min=1.0),
+    help="Seconds between each run of the check.",
+)
+@click.pass_context
+def serve_metrics(ctx: click.Context, host: str, port: int, interval: float):
+    """Serve metrics over http."""
+    ctx.obj = prom_model.ServeMetricsSendArgs(host=host, port=port, interval=interval)
+    agent_io.check_send_context(ctx)
+    httpd = prom_op.start_metrics_server(host, port)
+    try:
+        prom_op.run_every(interval, lambda: agent_io.execute_now(ctx))
+    finally:
+        httpd.shutdown()
+
+
+register_commands = [
+    agent_model.RegisterSendCmd(prometheus_textfile),
+    agent_model.RegisterSendCmd(serve_metrics),
+]
@@ -1,6 +1,7 @@
 """Commands for collecting details about a server instance."""
 
 import click
+from beartype import typing
 
 from server_monitor_agent.agent import io as agent_io, model as agent_model
 from server_monitor_agent.service.server import (
@@ -34,10 +35,34 @@ from server_monitor_agent.service.server import (
     type=float,
     help="Sample the CPU usage over this time in seconds.",
 )
+@click.option(
+    "-w",
+    "--window",
+    "window",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Evaluate the threshold against the samples "
+    "from this many minutes, instead of the latest sample.",
+)
+@click.option(
+    "-s",
+    "--statistic",
+    "statistic",
+    default=agent_model.STATISTIC_DEFAULT,
+    type=click.Choice(agent_model.STATISTICS, case_sensitive=False),
+    help="The statistic of the samples in the window to evaluate.",
+)
 @click.pass_context
-def cpu(ctx: click.Context, threshold: int, interval: float):
+def cpu(
+    ctx: click.Context,
+    threshold: int,
+    interval: float,
+    window: typing.Optional[float],
+    statistic: str,
+):
     """Get the overall CPU usage."""
-    ctx.obj = server_model.CpuCollectArgs(threshold=threshold, interval=interval)
+    ctx.obj = server_model.CpuCollectArgs(
+        threshold=threshold, interval=interval, window=window, statistic=statistic
+    )
     agent_io.check_collect_context(ctx)
 
 
@@ -59,10 +84,33 @@ def cpu(ctx: click.Context, threshold: int, interval: float):
     type=int,
     help="Usage over this threshold in percent is critical.",
 )
+@click.option(
+    "-w",
+    "--window",
+    "window",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Evaluate the threshold against the samples "
+    "from this many minutes, instead of the latest sample.",
+)
+@click.option(
+    "-s",
+    "--statistic",
+    "statistic",
+    default=agent_model.STATISTIC_DEFAULT,
+    type=click.Choice(agent_model.STATISTICS, case_sensitive=False),
+    help="The statistic of the samples in the window to evaluate.",
+)
 @click.pass_context
-def memory(ctx: click.Context, threshold: int):
+def memory(
+    ctx: click.Context,
+    threshold: int,
+    window: typing.Optional[float],
+    statistic: str,
+):
     """Get the memory usage."""
-    ctx.obj = server_model.MemoryCollectArgs(threshold=threshold)
+    ctx.obj = server_model.MemoryCollectArgs(
+        threshold=threshold, window=window, statistic=statistic
+    )
     agent_io.check_collect_context(ctx)
 
 
@@ -90,10 +138,22 @@ def memory(ctx: click.Context, threshold: int):
     type=click.Choice(agent_model.FORMATS, case_sensitive=False),
     help="Set the input format.",
 )
+@click.option(
+    "-e",
+    "--serialise",
+    "serialise_format",
+    default=agent_model.SERIALISE_DEFAULT,
+    type=click.Choice(agent_model.SERIALISE_FORMATS, case_sensitive=False),
+    help="Set how the content is encoded. Use ndjson or binary for many items.",
+)
 @click.pass_context
-def stream_input(ctx: click.Context, source: str, in_format: str):
+def stream_input(
+    ctx: click.Context, source: str, in_format: str, serialise_format: str
+):
     """Read input from a stream."""
-    ctx.obj = server_model.StreamInputCollectArgs(source=source, format=in_format)
+    ctx.obj = server_model.StreamInputCollectArgs(
+        source=source, format=in_format, serialise_format=serialise_format
+    )
     agent_io.check_collect_context(ctx)
 
 
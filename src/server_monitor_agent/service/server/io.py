@@ -1,7 +1,7 @@
 """Input (parsing) and output (formatting) functions for a server instance."""
 import math
 
-import beartype
+from beartype import typing
 
 try:
     import zoneinfo
@@ -12,6 +12,8 @@ from server_monitor_agent.agent import (
     model as agent_model,
     operation as agent_op,
     convert as agent_convert,
+    series as agent_series,
+    validate as agent_validate,
 )
 from server_monitor_agent.service.server import (
     model as server_model,
@@ -19,31 +21,31 @@ from server_monitor_agent.service.server import (
 )
 
 
-@beartype.beartype
-def stream_input(args: server_model.StreamInputCollectArgs) -> agent_model.AgentItem:
-    content = server_op.read_stream(args.source)
-    data = agent_convert.from_content(content, "json")
-    item = agent_convert.to_agent_item(data, args.format)
-    return item
+@agent_validate.checked(boundary=True)
+def stream_input(
+    args: server_model.StreamInputCollectArgs,
+) -> typing.Iterator[agent_model.AgentItem]:
+    stream = server_op.open_stream(args.source)
+    yield from agent_convert.iter_serialised(stream, args.serialise_format, args.format)
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def stream_output(
     args: server_model.StreamOutputSendArgs, item: agent_model.AgentItem
 ) -> None:
     data = agent_convert.from_agent_item(item, args.format)
-    content = agent_convert.to_content(data, "json")
+    content = agent_convert.to_content(data, args.serialise_format)
     server_op.write_stream(args.target, content)
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def users_message_output(
     args: server_model.LoggedInUsersSendArgs, item: agent_model.AgentItem
 ) -> None:
     server_op.user_message(item, args.user_group)
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def cpu_status_input(args: server_model.CpuCollectArgs) -> agent_model.AgentItem:
     """Build the agent item for the device cpu usage."""
 
@@ -52,17 +54,22 @@ def cpu_status_input(args: server_model.CpuCollectArgs) -> agent_model.AgentItem
 
     usage = server_op.cpu_usage(interval=args.interval)
     threshold = float(args.threshold) / 100.0
+    value = agent_series.windowed("cpu", usage, args.window, args.statistic)
+    window = agent_series.describe(args.window, args.statistic)
 
-    status, status_code = agent_op.report_evaluate(usage, threshold)
+    status, status_code = agent_op.report_evaluate(value, threshold)
 
     if status == agent_model.REPORT_LEVEL_PASS:
         title = "Typical CPU use"
-        descr = f"Typical CPU use of {usage:.1%} " f"(threshold {threshold:.1%})."
+        descr = (
+            f"Typical CPU use of {value:.1%} "
+            f"({window}threshold {threshold:.1%})."
+        )
     else:
         title = "High CPU use"
         descr = (
-            f"High CPU use of {usage:.1%} "
-            f"(threshold {threshold:.1%}). "
+            f"High CPU use of {value:.1%} "
+            f"({window}threshold {threshold:.1%}). "
             f"Check instance for unexpected or faulty processes."
         )
 
@@ -75,11 +82,11 @@ def cpu_status_input(args: server_model.CpuCollectArgs) -> agent_model.AgentItem
         date=date,
         status_name=status,
         service_name="cpu",
-        extra_data={"threshold": args.threshold, "usage": usage},
+        extra_data={"threshold": args.threshold, "usage": usage, "value": value},
     )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def memory_status_input(
     args: server_model.MemoryCollectArgs,
 ) -> agent_model.AgentItem:
@@ -92,20 +99,22 @@ def memory_status_input(
     percent = float(usage.percent) / 100.0
     amount_gib = round(usage.available / (math.pow(1024, 3)), 2)
     threshold = float(args.threshold) / 100.0
+    value = agent_series.windowed("memory", percent, args.window, args.statistic)
+    window = agent_series.describe(args.window, args.statistic)
 
-    status, status_code = agent_op.report_evaluate(percent, threshold)
+    status, status_code = agent_op.report_evaluate(value, threshold)
 
     if status == agent_model.REPORT_LEVEL_PASS:
         title = "Typical memory use"
         descr = (
-            f"Typical memory use of {percent:.1%} "
-            f"({amount_gib}GiB, threshold {threshold:.1%})."
+            f"Typical memory use of {value:.1%} "
+            f"({amount_gib}GiB, {window}threshold {threshold:.1%})."
         )
     else:
         title = "High memory use"
         descr = (
-            f"High memory use of {percent:.1%} "
-            f"({amount_gib}GiB, threshold {threshold:.1%}). "
+            f"High memory use of {value:.1%} "
+            f"({amount_gib}GiB, {window}threshold {threshold:.1%}). "
             f"Check instance for excessive or changed memory use."
         )
 
@@ -127,6 +136,7 @@ def memory_status_input(
             "percentage": percent,
             "amount_gib": amount_gib,
             "threshold": threshold,
+            "value": value,
         },
     )
 
@@ -2,7 +2,6 @@ import dataclasses
 import datetime
 import functools
 
-import beartype
 from beartype import typing
 
 try:
@@ -10,43 +9,49 @@ try:
 except ImportError:
     from backports import zoneinfo
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class CpuCollectArgs(agent_model.CollectArgs):
     threshold: int = 80
     interval: float = 2.0
+    window: typing.Optional[float] = None
+    statistic: str = agent_model.STATISTIC_DEFAULT
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class MemoryCollectArgs(agent_model.CollectArgs):
     threshold: int = 80
+    window: typing.Optional[float] = None
+    statistic: str = agent_model.STATISTIC_DEFAULT
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class LoggedInUsersSendArgs(agent_model.SendArgs):
     user_group: typing.Optional[str] = None
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class StreamInputCollectArgs(agent_model.CollectArgs):
     source: str
     format: str
+    serialise_format: str = agent_model.SERIALISE_DEFAULT
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class StreamOutputSendArgs(agent_model.SendArgs):
     target: str
     format: str
+    serialise_format: str = agent_model.SERIALISE_DEFAULT
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class NetworkResult(agent_model.OpResult):
     name: str
@@ -60,7 +65,7 @@ class NetworkResult(agent_model.OpResult):
     dropout: int
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class MemoryResult(agent_model.OpResult):
     total: int
@@ -76,7 +81,8 @@ class MemoryResult(agent_model.OpResult):
     shared: int
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_model.slotted
 @dataclasses.dataclass
 class ProcessResult(agent_model.OpResult):
     user: typing.Optional[str] = None
@@ -103,21 +109,24 @@ class ProcessResult(agent_model.OpResult):
     cpu_usable_count: typing.Optional[int] = None
     """gauge of number of cpus process can use"""
 
+    def __post_init__(self):
+        agent_model.intern_fields(self, ["user"])
 
-@beartype.beartype
+
+@agent_validate.checked
 @dataclasses.dataclass
 class TimeZoneResult(agent_model.OpResult):
     raw: typing.Optional[str]
 
     @functools.cached_property
-    @beartype.beartype
+    @agent_validate.checked
     def zone_info(self) -> typing.Optional[zoneinfo.ZoneInfo]:
         if not self.raw:
             return None
         return zoneinfo.ZoneInfo(self.raw)
 
     @property
-    @beartype.beartype
+    @agent_validate.checked
     def now(self) -> typing.Optional[datetime.datetime]:
         if not self.raw:
             return None
@@ -1,22 +1,28 @@
 """Operations on a server instance."""
 
 import datetime
+import io
 import logging
 import platform
 import socket
 import sys
 
-import beartype
 import psutil
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    profile as agent_profile,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.server import model as server_model
 
 logger = logging.getLogger(f"{agent_model.APP_NAME_UNDER}.device.instance")
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("psutil")
 def network() -> typing.List[server_model.NetworkResult]:
     """Get the network information."""
 
@@ -45,7 +51,8 @@ def network() -> typing.List[server_model.NetworkResult]:
     return output
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("psutil")
 def memory() -> server_model.MemoryResult:
     """Get the memory information."""
 
@@ -69,7 +76,8 @@ def memory() -> server_model.MemoryResult:
     )
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("hostname")
 def hostname() -> str:
     """Get the local hostname."""
 
@@ -91,7 +99,8 @@ def hostname() -> str:
     raise ValueError("Could not get hostname.")
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("timezone")
 def timezone() -> server_model.TimeZoneResult:
     """Get the configured local time zone."""
 
@@ -109,7 +118,8 @@ def timezone() -> server_model.TimeZoneResult:
     return server_model.TimeZoneResult(exit_code=result.returncode, raw=output)
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("psutil")
 def uptime() -> int:
     """Get the time since the local machine booted."""
 
@@ -127,7 +137,8 @@ def uptime() -> int:
     return output
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("psutil")
 def cpu_usage(interval: float = 2.0) -> float:
     """Get the cpu usage."""
 
@@ -141,7 +152,8 @@ def cpu_usage(interval: float = 2.0) -> float:
     return float(output)
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_profile.timed("psutil")
 def processes() -> typing.List[server_model.ProcessResult]:
     """Get a list of the local processes."""
 
@@ -228,7 +240,7 @@ def processes() -> typing.List[server_model.ProcessResult]:
     return result
 
 
-@beartype.beartype
+@agent_validate.checked
 def user_message(
     item: agent_model.AgentItem, user_group: typing.Optional[str] = None
 ) -> None:
@@ -278,21 +290,32 @@ def user_message(
         raise ValueError(f"Could not send local system message due to :{result}")
 
 
-@beartype.beartype
-def write_stream(out_target: str, content: str) -> None:
+@agent_validate.checked
+def write_stream(out_target: str, content: typing.Union[str, bytes]) -> None:
     if out_target == agent_model.STREAM_STDOUT:
-        sys.stdout.write(content)
+        stream = sys.stdout
 
     elif out_target == agent_model.STREAM_STDERR:
-        sys.stderr.write(content)
+        stream = sys.stderr
 
     else:
         agent_op.raise_options("stream target", out_target, agent_model.STREAM_TARGETS)
 
+    if isinstance(content, bytes):
+        # write any buffered text first, to keep the output in order
+        stream.flush()
+        stream.buffer.write(content)
+        stream.buffer.flush()
+    else:
+        # flush each item, so the next program in a pipeline gets it straight away
+        stream.write(content)
+        stream.flush()
+
 
-@beartype.beartype
-def read_stream(in_source: str) -> str:
+@agent_validate.checked
+def open_stream(in_source: str) -> io.BufferedIOBase:
+    """Get the binary stream to read from."""
     if in_source == agent_model.STREAM_STDIN:
-        return sys.stdin.read()
+        return sys.stdin.buffer
 
     agent_op.raise_options("stream source", in_source, agent_model.STREAM_SOURCES)
@@ -51,9 +51,21 @@ def users_message_output(ctx: click.Context, user_group: typing.Optional[str]):
     type=click.Choice(agent_model.FORMATS, case_sensitive=False),
     help="Set the output format.",
 )
+@click.option(
+    "-e",
+    "--serialise",
+    "serialise_format",
+    default=agent_model.SERIALISE_DEFAULT,
+    type=click.Choice(agent_model.SERIALISE_FORMATS, case_sensitive=False),
+    help="Set how the content is encoded. Use ndjson or binary for many items.",
+)
 @click.pass_context
-def stream_output(ctx: click.Context, target: str, out_format: str):
-    ctx.obj = server_model.StreamOutputSendArgs(target=target, format=out_format)
+def stream_output(
+    ctx: click.Context, target: str, out_format: str, serialise_format: str
+):
+    ctx.obj = server_model.StreamOutputSendArgs(
+        target=target, format=out_format, serialise_format=serialise_format
+    )
     agent_io.check_send_context(ctx)
     agent_io.execute_context(ctx)
 
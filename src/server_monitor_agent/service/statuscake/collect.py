@@ -1,4 +1,5 @@
 import click
+from beartype import typing
 from click import Context
 
 from server_monitor_agent.agent import io as agent_io, model as agent_model
@@ -22,9 +23,17 @@ from server_monitor_agent.service.statuscake import model as sc_model
     type=float,
     help="Sample the CPU usage over this time in seconds.",
 )
+@click.option(
+    "-p",
+    "--ping-host",
+    "ping_host",
+    type=str,
+    help="The host to ping to measure the round trip time. "
+    "The round trip time is empty if no host is given.",
+)
 @click.pass_context
-def statuscake(ctx: Context, interval: float):
-    ctx.obj = sc_model.StatusCakeCollectArgs(interval=interval)
+def statuscake(ctx: Context, interval: float, ping_host: typing.Optional[str]):
+    ctx.obj = sc_model.StatusCakeCollectArgs(interval=interval, ping_host=ping_host)
     agent_io.check_collect_context(ctx)
 
 
@@ -1,6 +1,4 @@
-import beartype
-
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 from server_monitor_agent.service.server import (
     operation as server_op,
 )
@@ -10,7 +8,7 @@ from server_monitor_agent.service.statuscake import (
 )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def statuscake_input(
     args: sc_model.StatusCakeCollectArgs,
 ) -> agent_model.AgentItem:
@@ -35,7 +33,7 @@ def statuscake_input(
 
     process = sc_op.processes()
 
-    ping = ""
+    ping = sc_op.ping(args.ping_host)
 
     items = {
         "rx": rx,
@@ -72,7 +70,7 @@ def statuscake_input(
     )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def statuscake_output(
     args: sc_model.StatusCakeSendArgs, item: agent_model.AgentItem
 ) -> None:
@@ -1,17 +1,18 @@
 import dataclasses
 
-import beartype
+from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class StatusCakeCollectArgs(agent_model.CollectArgs):
     interval: float = 2.0
+    ping_host: typing.Optional[str] = None
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class StatusCakeSendArgs(agent_model.SendArgs):
     """"""
@@ -1,19 +1,26 @@
 import logging
 import math
 
-import beartype
 import requests
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.disk import operation as disk_op
+from server_monitor_agent.service.network import (
+    model as network_model,
+    operation as network_op,
+)
 from server_monitor_agent.service.server import (
     model as server_model,
     operation as server_op,
 )
 
 
-@beartype.beartype
+@agent_validate.checked
 def disks() -> typing.Tuple[int, int, str]:
     hdd = 0
     thdd = 0
@@ -35,7 +42,7 @@ def disks() -> typing.Tuple[int, int, str]:
     return int(hdd), int(thdd), drive_str
 
 
-@beartype.beartype
+@agent_validate.checked
 def network() -> typing.Dict[str, typing.Union[str, int]]:
     selected: typing.Optional[server_model.NetworkResult] = None
     device_network = server_op.network()
@@ -57,7 +64,7 @@ def network() -> typing.Dict[str, typing.Union[str, int]]:
     }
 
 
-@beartype.beartype
+@agent_validate.checked
 def processes() -> str:
     item_sep = ":::"
     attr_sep = "|"
@@ -82,7 +89,25 @@ def processes() -> str:
     return output
 
 
-@beartype.beartype
+@agent_validate.checked
+def ping(host: typing.Optional[str], count: int = 2, timeout: float = 2.0) -> str:
+    """Get the average ICMP round trip time to the host in milliseconds.
+    The result is empty if the host could not be reached,
+    or if unprivileged ICMP is not allowed."""
+    if not host or not network_op.icmp_available():
+        return ""
+
+    target = network_model.ProbeTargetEntry.from_icmp(host)
+    result = network_op.probe([target], count=count, timeout=timeout)[0]
+
+    agent_op.log_msg(logging.DEBUG, f"Result from ping '{host}': {result}")
+
+    if result.rtt_avg is None:
+        return ""
+    return f"{result.rtt_avg:.3f}"
+
+
+@agent_validate.checked
 def submit_statuscake(item: agent_model.AgentItem) -> None:
     """Send data to statuscake url."""
 
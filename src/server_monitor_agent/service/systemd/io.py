@@ -1,9 +1,8 @@
 import dataclasses
 import datetime
 
-import beartype
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 from server_monitor_agent.service.server import operation as server_op
 from server_monitor_agent.service.systemd import (
     model as systemd_model,
@@ -11,7 +10,7 @@ from server_monitor_agent.service.systemd import (
 )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def unit_status_input(
     args: systemd_model.SystemdUnitStatusCollectArgs,
 ) -> agent_model.AgentItem:
@@ -87,7 +86,7 @@ def unit_status_input(
     )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def unit_logs_input(
     args: systemd_model.SystemdUnitLogsCollectArgs,
 ) -> agent_model.AgentItem:
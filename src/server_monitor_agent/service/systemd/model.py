@@ -1,13 +1,12 @@
 import dataclasses
 import datetime
 
-import beartype
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class SystemdUnitStatusCollectArgs(agent_model.CollectArgs):
     name: str
@@ -16,13 +15,14 @@ class SystemdUnitStatusCollectArgs(agent_model.CollectArgs):
     )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class SystemdUnitLogsCollectArgs(agent_model.CollectArgs):
     name: str
 
 
-@beartype.beartype
+@agent_validate.checked
+@agent_model.slotted
 @dataclasses.dataclass
 class SystemCtlShowResult(agent_model.OpResult):
     name: str
@@ -56,8 +56,32 @@ class SystemCtlShowResult(agent_model.OpResult):
     last_trigger_u_sec: typing.Optional[str] = None
     triggers: typing.Optional[str] = None
 
+    truncated: typing.Optional[bool] = None
+    """True when the output was over the byte limit, so properties may be missing."""
 
-@beartype.beartype
+    def __post_init__(self):
+        agent_model.intern_fields(
+            self,
+            [
+                "load_state",
+                "active_state",
+                "sub_state",
+                "unit_file_state",
+                "unit_file_preset",
+                "can_start",
+                "can_stop",
+                "exec_main_code",
+                "standard_output",
+                "standard_error",
+                "user",
+                "group",
+                "result",
+            ],
+        )
+
+
+@agent_validate.checked
+@agent_model.slotted
 @dataclasses.dataclass
 class JournalCtlResult(agent_model.OpResult):
     name: str
@@ -66,3 +90,6 @@ class JournalCtlResult(agent_model.OpResult):
     timestamp: typing.Optional[datetime.datetime] = None
     hostname: typing.Optional[str] = None
     unit: typing.Optional[str] = None
+
+    def __post_init__(self):
+        agent_model.intern_fields(self, ["name", "hostname", "unit"])
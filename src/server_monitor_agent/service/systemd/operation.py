@@ -1,4 +1,5 @@
 import json
+import logging
 from datetime import datetime
 
 from beartype import typing
@@ -8,16 +9,20 @@ from boltons.strutils import camel2under
 from server_monitor_agent.agent import operation as agent_op
 from server_monitor_agent.service.systemd import model
 
+SYSTEMCTL_MAX_BYTES = 1024 * 1024
+JOURNALCTL_MAX_BYTES = 32 * 1024 * 1024
+
 
 def systemctl_show(name: str) -> Optional[model.SystemCtlShowResult]:
     if not name or not name.strip():
         return None
 
+    # the output is streamed, so share the parsed result in the run instead
     args = ["systemctl", "show", name, "--all"]
-    result = agent_op.execute_process(args)
-    if result.returncode != 0:
-        return model.SystemCtlShowResult(name=name, exit_code=result.returncode)
+    return agent_op.share_result(tuple(args), lambda: _systemctl_show(name, args))
 
+
+def _systemctl_show(name: str, args: typing.List[str]) -> model.SystemCtlShowResult:
     keys = [
         "Id",
         "LoadState",
@@ -50,24 +55,33 @@ def systemctl_show(name: str) -> Optional[model.SystemCtlShowResult]:
     ]
 
     data = {}
-    props = result.stdout.splitlines()
-    for prop in props:
-        k, v = prop.split("=", 1)
-        if k not in keys:
-            continue
+    with agent_op.stream_process(args, max_bytes=SYSTEMCTL_MAX_BYTES) as result:
+        for prop in result:
+            k, v = prop.rstrip("\n").split("=", 1)
+            if k not in keys:
+                continue
 
-        key = camel2under(k)
-        if key == "id":
-            key = "identifier"
-        if key in data:
-            raise ValueError(f"Duplicate key '{k}' in systemctl output.")
-        data[key] = v
+            key = camel2under(k)
+            if key == "id":
+                key = "identifier"
+            if key in data:
+                raise ValueError(f"Duplicate key '{k}' in systemctl output.")
+            data[key] = v
+
+    if result.truncated:
+        # the properties after the limit are missing, so this is not a success
+        agent_op.log_msg(
+            logging.WARNING,
+            f"Output of '{' '.join(args)}' is over {SYSTEMCTL_MAX_BYTES} bytes.",
+        )
+        return model.SystemCtlShowResult(
+            name=name, exit_code=result.returncode or 1, truncated=True, **data
+        )
+
+    if result.returncode != 0:
+        return model.SystemCtlShowResult(name=name, exit_code=result.returncode)
 
-    return model.SystemCtlShowResult(
-        name=name,
-        exit_code=result.returncode,
-        **data,
-    )
+    return model.SystemCtlShowResult(name=name, exit_code=result.returncode, **data)
 
 
 def journalctl(name: str) -> Optional[typing.List[model.JournalCtlResult]]:
@@ -84,24 +98,54 @@ def journalctl(name: str) -> Optional[typing.List[model.JournalCtlResult]]:
         name,
         "--output-fields=MESSAGE,JOB_RESULT,UNIT,_HOSTNAME,__REALTIME_TIMESTAMP",
     ]
-    result = agent_op.execute_process(args)
+    return agent_op.share_result(tuple(args), lambda: _journalctl(name, args))
 
-    if result.returncode != 0:
-        return [model.JournalCtlResult(name=name, exit_code=result.returncode)]
-    data = json.loads("[" + result.stdout.replace("}\n{", "},{") + "]")
 
+def _journalctl(
+    name: str, args: typing.List[str]
+) -> typing.List[model.JournalCtlResult]:
     date_key = "__REALTIME_TIMESTAMP"
-    result = [
-        model.JournalCtlResult(
-            name=name,
-            exit_code=result.returncode,
-            message=i.get("MESSAGE"),
-            timestamp=datetime.fromtimestamp(int(float(i.get(date_key)) / 1000000))
-            if i.get(date_key)
-            else None,
-            hostname=i.get("_HOSTNAME"),
-            unit=i.get("UNIT"),
+    items = []
+    with agent_op.stream_process(args, max_bytes=JOURNALCTL_MAX_BYTES) as result:
+        for i in journal_entries(result):
+            items.append(
+                model.JournalCtlResult(
+                    name=name,
+                    exit_code=0,
+                    message=i.get("MESSAGE"),
+                    timestamp=(
+                        datetime.fromtimestamp(int(float(i.get(date_key)) / 1000000))
+                        if i.get(date_key)
+                        else None
+                    ),
+                    hostname=i.get("_HOSTNAME"),
+                    unit=i.get("UNIT"),
+                )
+            )
+
+    if result.truncated:
+        # the entries before the limit are still useful
+        agent_op.log_msg(
+            logging.WARNING,
+            f"Output of '{' '.join(args)}' is over {JOURNALCTL_MAX_BYTES} bytes, "
+            f"using the first {len(items)} entries.",
         )
-        for i in data
-    ]
-    return result
+    elif result.returncode != 0:
+        return [model.JournalCtlResult(name=name, exit_code=result.returncode)]
+    return items
+
+
+def journal_entries(lines: typing.Iterable[str]) -> typing.Iterator[typing.Dict]:
+    """Parse the journal entries one at a time from
+    'journalctl --output=json-pretty' or '--output=json'."""
+    buffer = []
+    for line in lines:
+        if not buffer and line.startswith("{") and line.rstrip().endswith("}"):
+            yield json.loads(line)
+            continue
+        if not buffer and not line.startswith("{"):
+            continue
+        buffer.append(line)
+        if line.rstrip() == "}":
+            yield json.loads("".join(buffer))
+            buffer = []
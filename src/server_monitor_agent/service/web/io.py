@@ -1,152 +1,160 @@
-import beartype
+import html
+
 import requests
+from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 from server_monitor_agent.service.web import model as web_model, operation as web_op
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def email_message_output(
     args: web_model.EmailMessageSendArgs, item: agent_model.AgentItem
 ) -> None:
-    subject = item.summary
-
-    # TODO: improve body content
-    body_text = item.description
-
-    # TODO: create html version
-    body_html = item.description
-
-    web_op.submit_email(
-        mail_host=args.host,
-        mail_port=args.port,
-        mail_user=args.username,
-        mail_pass=args.password,
-        msg_subject=subject,
-        msg_from_address=args.from_address,
-        msg_to_addresses=args.to_addresses,
-        msg_body_text=body_text,
-        msg_body_html=body_html,
+    subject = f"{item.status_name.capitalize()}: {item.summary} on {item.host_name}"
+    digest = web_op.email_digest(args)
+    digest.submit(subject, email_text(item), email_html(item))
+
+
+@agent_validate.checked
+def email_text(item: agent_model.AgentItem) -> str:
+    """Build the plain text email body for an agent item."""
+    date = item.date.isoformat(timespec="seconds")
+    lines = [
+        item.summary,
+        "",
+        item.description,
+        "",
+        f"Status: {item.status_name}",
+        f"Service: {item.service_name}",
+        f"Host: {item.host_name}",
+        f"Date: {date}",
+        f"Check: {item.check_name} (from {item.source_name})",
+    ]
+    extra = _email_extra(item)
+    if extra:
+        lines.extend(["", "Details:", *[f"- {k}: {v}" for k, v in extra]])
+    return "\n".join(lines)
+
+
+@agent_validate.checked
+def email_html(item: agent_model.AgentItem) -> str:
+    """Build the html email body for an agent item."""
+    date = item.date.isoformat(timespec="seconds")
+    rows = [
+        ("Status", item.status_name),
+        ("Service", item.service_name),
+        ("Host", item.host_name),
+        ("Date", date),
+        ("Check", f"{item.check_name} (from {item.source_name})"),
+        *_email_extra(item),
+    ]
+    table = "\n".join(
+        f"<tr><th>{html.escape(str(k))}</th><td>{html.escape(str(v))}</td></tr>"
+        for k, v in rows
+    )
+    return (
+        f"<p><strong>{html.escape(item.summary)}</strong></p>\n"
+        f"<p>{html.escape(item.description)}</p>\n"
+        f"<table>\n{table}\n</table>"
     )
 
 
-@beartype.beartype
+def _email_extra(item: agent_model.AgentItem) -> typing.List[typing.Tuple[str, str]]:
+    return [
+        (k, str(v))
+        for k, v in item.extra_data.items()
+        if isinstance(v, (str, int, float, bool)) and v != ""
+    ]
+
+
+@agent_validate.checked(boundary=True)
 def slack_message_output(
     args: web_model.SlackMessageSendArgs, item: agent_model.AgentItem
 ) -> None:
-    # if item.status_name == self._pass:
-    #     emoji1 = ":white_check_mark:"
-    #     emoji2 = ":large_green_circle:"
-    #     prefix = "Passing"
-    # elif item.status_name == self._warn:
-    #     emoji1 = ":warning:"
-    #     emoji2 = ":large_yellow_circle:"
-    #     prefix = "Warning"
-    # elif item.status_name == self._crit:
-    #     emoji1 = ":fire:"
-    #     emoji2 = ":red_circle:"
-    #     prefix = "Critical"
-    # else:
-    #     emoji1 = ":grey_question:"
-    #     emoji2 = ":white_circle:"
-    #     prefix = "Unknown"
-    #
-    # extra = [
-    #     f"Server: {item.host_name}",
-    #     f"Source: {item.source_name}",
-    #     f"Status: {item.status_name}",
-    #     f"Enabled: {'yes' if item.is_enabled is True else '*no*'}",
-    #     f"Active: {'yes' if item.is_active is True else '*no*'}",
-    # ]
-    # if item.date_next:
-    #     extra.append(f"Trigger upcoming: {self.date_display(item.date_next)}")
-    # if item.date_triggered:
-    #     extra.append(f"Triggered on: {self.date_display(item.date_triggered)}")
-    # if item.trigger_by:
-    #     extra.append(f"Triggered by: {item.trigger_by}")
-    # if item.trigger_for:
-    #     extra.append(f"Trigger for: {item.trigger_for}")
-    #
-    # extra_str = "\n".join([f"- {i}" for i in extra])
-    # check_str = f"Check: {item.check_name}  |  {item.check_type}"
-    # descr = "\n".join([i for i in [item.title, item.description] if i and i.strip()])
-    # notify_str = f"{emoji2}  *The check for {item.name} is {item.status}.*"
-    #
-    # if isinstance(item.date.tzinfo, zoneinfo.ZoneInfo):
-    #     time_zone = str(item.date.tzinfo)
-    # elif isinstance(item.date.tzinfo, StaticTzInfo):
-    #     time_zone = item.date.tzinfo.tzname(None)
-    # else:
-    #     time_zone = None
-    # date_str = f"Occurred *{self.date_display(item.date)}*"
-    # if time_zone and time_zone not in date_str:
-    #     date_str += f" ({time_zone})"
-    #
-    # header_str = f"{emoji1}  {prefix}: {item.name} \non {item.hostname}"
-    #
-    # blocks = [
-    #     {"type": "header", "text": {"type": "plain_text", "text": header_str}},
-    #     {"type": "context", "elements": [{"type": "mrkdwn", "text": date_str}]},
-    #     {"type": "divider"},
-    #     {"type": "section", "text": {"type": "mrkdwn", "text": notify_str}},
-    #     {"type": "section", "text": {"type": "mrkdwn", "text": descr}},
-    # ]
-    #
-    # if item.logs:
-    #     logs_raw = "\n".join([">" + i for i in item.logs])
-    #     logs_str = f"Logs:\n{logs_raw}" if item.logs else "No logs."
-    #     blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": logs_str}})
-    #
-    # blocks.extend(
-    #     [
-    #         {"type": "section", "text": {"type": "mrkdwn", "text": extra_str}},
-    #         {
-    #             "type": "context",
-    #             "elements": [{"type": "mrkdwn", "text": check_str}],
-    #         },
-    #     ]
-    # )
-    #
-    # msg = {"blocks": blocks}
-    # print(msg)
-    # return msg
+    blocks = slack_blocks(item)
+    text = f"{item.status_name}: {item.summary} on {item.host_name}"
+    sender = web_op.slack_sender(args.webhook, window=args.window)
+    sender.submit(blocks, text)
 
-    # https://projects.iamcal.com/emoji-data/table.htm
 
-    # attributes
-    # node / server: 🖥️ 	desktop computer 	:desktop_computer:
-    # date: 📅 	calendar 	:date:
+@agent_validate.checked
+def slack_blocks(item: agent_model.AgentItem) -> typing.List[typing.Dict]:
+    """Build the slack Block Kit blocks for an agent item."""
 
-    # passing:
-    # 🟢 	large green circle 	:large_green_circle:
-    # 🔵 	large blue circle 	:large_blue_circle:
-    # 🏅 	sports medal 	:sports_medal:
-    # 🎉 	party popper 	:tada:
-    # 🙂 	slightly smiling face 	:slightly_smiling_face:
-    # 🧯 	fire extinguisher 	:fire_extinguisher:
-    # ⭐ 	white medium star 	:star:
-
-    # warning:
-    # 🟠 	large orange circle 	:large_orange_circle:
-    # 🟡 	large yellow circle 	:large_yellow_circle:
-    # ⚠️ 	warning sign 	:warning:
-    # 🏃 	runner 	:runner:
-    # 😐 	neutral face 	:neutral_face:
-    # 🐛 	bug 	:bug:
-
-    # critical:
-    # 🔴 	large red circle 	:red_circle:
-    # 💥 	collision symbol 	:boom:
-    # 🚨 	police cars revolving light 	:rotating_light:
-    # 💣 	bomb 	:bomb:
-    # 🙁 	slightly frowning face 	:slightly_frowning_face:
+    # https://projects.iamcal.com/emoji-data/table.htm
+    if item.status_name == agent_model.REPORT_LEVEL_PASS:
+        emoji1 = ":white_check_mark:"
+        emoji2 = ":large_green_circle:"
+        prefix = "Passing"
+    elif item.status_name == agent_model.REPORT_LEVEL_WARN:
+        emoji1 = ":warning:"
+        emoji2 = ":large_yellow_circle:"
+        prefix = "Warning"
+    elif item.status_name == agent_model.REPORT_LEVEL_CRIT:
+        emoji1 = ":fire:"
+        emoji2 = ":red_circle:"
+        prefix = "Critical"
+    else:
+        emoji1 = ":grey_question:"
+        emoji2 = ":white_circle:"
+        prefix = "Unknown"
+
+    header_str = f"{emoji1}  {prefix}: {item.summary or item.check_name}"
+    date_str = f":date: Occurred *{item.date.isoformat(timespec='seconds')}*"
+    host_str = f":desktop_computer: {item.host_name}"
+    notify_str = f"{emoji2}  *The check for {item.service_name} is {item.status_name}.*"
+    check_str = f"Check: {item.check_name}  |  Source: {item.source_name}"
+
+    blocks = [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": _truncate(header_str, 150)},
+        },
+        {
+            "type": "context",
+            "elements": [
+                {"type": "mrkdwn", "text": date_str},
+                {"type": "mrkdwn", "text": host_str},
+            ],
+        },
+        {"type": "section", "text": {"type": "mrkdwn", "text": notify_str}},
+    ]
+
+    if item.description:
+        blocks.append(
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": _truncate(item.description, 3000)},
+            }
+        )
+
+    extra = [
+        f"- {k}: {v}"
+        for k, v in item.extra_data.items()
+        if isinstance(v, (str, int, float, bool)) and v != ""
+    ]
+    if extra:
+        blocks.append(
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": _truncate("\n".join(extra), 3000)},
+            }
+        )
+
+    blocks.append(
+        {"type": "context", "elements": [{"type": "mrkdwn", "text": check_str}]}
+    )
+    return blocks
 
-    payload = {}
 
-    web_op.submit_slack_message(args.webhook, payload)
+def _truncate(value: str, length: int) -> str:
+    if len(value) <= length:
+        return value
+    return value[: length - 1] + "…"
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 def request_url_input(args: web_model.RequestUrlCollectArgs) -> agent_model.AgentItem:
     """Request a url."""
 
@@ -1,12 +1,11 @@
 import dataclasses
 
-import beartype
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import model as agent_model, validate as agent_validate
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class UrlRequestEntry:
     url: str
@@ -14,7 +13,7 @@ class UrlRequestEntry:
     headers: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class UrlResponseEntry:
     status_code: int = dataclasses.field(default=200)
@@ -26,14 +25,14 @@ class UrlResponseEntry:
     )
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class RequestUrlCollectArgs(agent_model.CollectArgs):
     request: UrlRequestEntry
     response: UrlResponseEntry
 
 
-@beartype.beartype
+@agent_validate.checked
 @dataclasses.dataclass
 class UrlResponseResult(agent_model.OpResult):
     match_status: bool
@@ -41,7 +40,7 @@ class UrlResponseResult(agent_model.OpResult):
     match_headers: typing.List[typing.Dict]
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class EmailMessageSendArgs(agent_model.SendArgs):
     host: str
@@ -50,9 +49,15 @@ class EmailMessageSendArgs(agent_model.SendArgs):
     password: str
     from_address: str
     to_addresses: typing.Sequence[str]
+    window: float = 2.0
+    """Send emails that arrive within this many seconds as one digest."""
+    timeout: float = 30.0
+    """Seconds to wait to connect to the mail server, and for each command."""
 
 
-@beartype.beartype
+@agent_validate.checked(boundary=True)
 @dataclasses.dataclass
 class SlackMessageSendArgs(agent_model.SendArgs):
     webhook: str
+    window: float = 2.0
+    """Send messages that arrive within this many seconds together."""
@@ -1,16 +1,25 @@
+import atexit
+import html
+import logging
 import smtplib
+import socket
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-import beartype
 import requests
 from beartype import typing
 
-from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    validate as agent_validate,
+)
 from server_monitor_agent.service.web import collect as web_collect, model as web_model
 
 
-@beartype.beartype
+@agent_validate.checked
 def request_url(
     request: web_model.UrlRequestEntry,
     response: web_model.UrlResponseEntry,
@@ -31,21 +40,131 @@ def request_url(
     raise NotImplementedError()
 
 
-@beartype.beartype
-def submit_email(
-    mail_host: str,
-    mail_port: int,
-    mail_user: str,
-    mail_pass: str,
+SMTP_TIMEOUT = 30.0
+"""Seconds to wait to connect to the mail server, and for each command."""
+
+SMTP_IDLE_TIMEOUT = 60.0
+"""Seconds an unused mail server connection is kept open."""
+
+
+class SmtpConnectionPool:
+    """Keep one logged-in connection for each mail server and user."""
+
+    def __init__(self, idle_timeout: float = SMTP_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._connections: typing.Dict[
+            typing.Tuple[str, int, str], typing.Tuple[smtplib.SMTP, float]
+        ] = {}
+        self._lock = threading.RLock()
+        self._timer: typing.Optional[threading.Timer] = None
+
+    def send(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        msg: MIMEMultipart,
+        timeout: float = SMTP_TIMEOUT,
+    ) -> typing.Dict:
+        """Send a message. Returns the refused recipients.
+        A connection that was closed by the server is re-opened once."""
+        key = (host, port, user)
+        from_address = msg["From"]
+        to_addresses = [i.strip() for i in msg["To"].split(",")]
+        content = msg.as_string()
+
+        with self._lock:
+            for attempt in range(2):
+                server = self._connect(key, password, timeout)
+                try:
+                    refused = server.sendmail(from_address, to_addresses, content)
+                except (
+                    smtplib.SMTPServerDisconnected,
+                    ConnectionError,
+                    socket.timeout,
+                ):
+                    self._discard(key)
+                    if attempt:
+                        raise
+                    continue
+
+                self._connections[key] = (server, time.monotonic())
+                self._schedule_close_idle()
+                return refused
+
+    def close_idle(self) -> None:
+        """Close connections that have not been used for the idle timeout."""
+        with self._lock:
+            self._timer = None
+            now = time.monotonic()
+            for key, (_, last_used) in list(self._connections.items()):
+                if now - last_used >= self.idle_timeout:
+                    self._discard(key)
+            if self._connections:
+                self._schedule_close_idle()
+
+    def close(self) -> None:
+        """Close all connections."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            for key in list(self._connections.keys()):
+                self._discard(key)
+
+    def _connect(
+        self, key: typing.Tuple[str, int, str], password: str, timeout: float
+    ) -> smtplib.SMTP:
+        if key in self._connections:
+            server, last_used = self._connections[key]
+            if time.monotonic() - last_used < self.idle_timeout:
+                return server
+            self._discard(key)
+
+        host, port, user = key
+        agent_op.log_msg(logging.DEBUG, f"Connecting to mail server {host}:{port}")
+        server = smtplib.SMTP_SSL(host, port, timeout=timeout)
+        try:
+            server.login(user, password)
+        except Exception:
+            server.close()
+            raise
+        self._connections[key] = (server, time.monotonic())
+        return server
+
+    def _discard(self, key: typing.Tuple[str, int, str]) -> None:
+        server, _ = self._connections.pop(key, (None, None))
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _schedule_close_idle(self) -> None:
+        if self._timer is None:
+            self._timer = threading.Timer(self.idle_timeout, self.close_idle)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+_smtp_pool = SmtpConnectionPool()
+atexit.register(_smtp_pool.close)
+
+_email_digests: typing.Dict[typing.Tuple, "EmailDigest"] = {}
+
+
+@agent_validate.checked
+def build_email(
     msg_subject: str,
     msg_from_address: str,
     msg_to_addresses: typing.Sequence[str],
     msg_body_text: str,
     msg_body_html: str,
-) -> typing.Dict:
-    """Send an email."""
+) -> MIMEMultipart:
+    """Build an email with text and html parts."""
 
-    # build message
     # based on https://stackoverflow.com/questions/9087158/amazon-ses-smtp-python-usage
     # use MIME type 'multipart/alternative' - for AWS SES
     msg = MIMEMultipart("alternative")
@@ -54,8 +173,8 @@ def submit_email(
     msg["To"] = ", ".join(msg_to_addresses)
 
     # Record the MIME types of both parts - text/plain and text/html.
-    part1 = MIMEText(msg_body_text, "plain")
-    part2 = MIMEText(msg_body_html, "html")
+    part1 = MIMEText(msg_body_text, "plain", "utf-8")
+    part2 = MIMEText(msg_body_html, "html", "utf-8")
 
     # Attach parts into message container.
     # According to RFC 2046, the last part of a multipart message, in this case
@@ -63,25 +182,258 @@ def submit_email(
     msg.attach(part1)
     msg.attach(part2)
 
-    # send message
-    result = {}
+    return msg
+
+
+@agent_validate.checked
+def submit_email(
+    mail_host: str,
+    mail_port: int,
+    mail_user: str,
+    mail_pass: str,
+    msg_subject: str,
+    msg_from_address: str,
+    msg_to_addresses: typing.Sequence[str],
+    msg_body_text: str,
+    msg_body_html: str,
+    timeout: float = SMTP_TIMEOUT,
+) -> typing.Dict:
+    """Send an email using a re-used connection to the mail server.
+    Returns the refused recipients."""
+
+    msg = build_email(
+        msg_subject, msg_from_address, msg_to_addresses, msg_body_text, msg_body_html
+    )
     try:
-        with smtplib.SMTP_SSL(mail_host, mail_port) as server:
-            result["login"] = server.login(mail_user, mail_pass)
-            result["send"] = server.sendmail(
-                msg_from_address, msg_to_addresses, msg.as_string()
+        return _smtp_pool.send(
+            mail_host, mail_port, mail_user, mail_pass, msg, timeout=timeout
+        )
+    except (smtplib.SMTPException, OSError) as e:
+        raise ValueError(
+            f"Could not send email using {mail_host}:{mail_port}: "
+            f"'{e.__class__.__name__}': {e}"
+        ) from e
+
+
+@agent_validate.checked
+def digest_email(
+    parts: typing.Sequence[typing.Tuple[str, str, str]],
+) -> typing.Tuple[str, str, str]:
+    """Combine several (subject, text, html) emails into one digest email."""
+
+    if len(parts) == 1:
+        return parts[0]
+
+    subject = f"{len(parts)} notifications: {parts[0][0]} and {len(parts) - 1} more"
+
+    text_sep = "\n\n" + ("-" * 40) + "\n\n"
+    text = text_sep.join(
+        [f"{len(parts)} notifications", *[f"{s}\n\n{t}" for s, t, _ in parts]]
+    )
+
+    body = "\n<hr>\n".join(
+        f"<section><h2>{html.escape(s)}</h2>\n{h}</section>" for s, _, h in parts
+    )
+    html_content = (
+        "<!DOCTYPE html>\n<html><body>\n"
+        f"<h1>{len(parts)} notifications</h1>\n{body}\n"
+        "</body></html>"
+    )
+    return subject, text, html_content
+
+
+class EmailDigest:
+    """Combine emails to the same recipients into one digest email.
+    Emails submitted within 'window' seconds of the first pending email
+    are sent together."""
+
+    def __init__(
+        self,
+        args: web_model.EmailMessageSendArgs,
+    ):
+        self.args = args
+        self.batch = agent_op.BatchWindow(self._send, window=args.window)
+
+    def submit(self, subject: str, text: str, html_content: str) -> None:
+        self.batch.add((subject, text, html_content))
+
+    def flush(self) -> int:
+        """Send all pending emails. Returns the number of emails combined."""
+        return self.batch.flush()
+
+    def _send(self, pending: typing.List[typing.Tuple[str, str, str]]) -> None:
+        subject, text, html_content = digest_email(pending)
+        submit_email(
+            mail_host=self.args.host,
+            mail_port=self.args.port,
+            mail_user=self.args.username,
+            mail_pass=self.args.password,
+            msg_subject=subject,
+            msg_from_address=self.args.from_address,
+            msg_to_addresses=self.args.to_addresses,
+            msg_body_text=text,
+            msg_body_html=html_content,
+            timeout=self.args.timeout,
+        )
+
+
+@agent_validate.checked
+def email_digest(args: web_model.EmailMessageSendArgs) -> EmailDigest:
+    """Get the digest for a mail server, sender and set of recipients.
+    There is one digest for each in this process."""
+    key = (
+        args.host,
+        args.port,
+        args.username,
+        args.from_address,
+        tuple(sorted(set(args.to_addresses))),
+    )
+    if key not in _email_digests:
+        _email_digests[key] = EmailDigest(args)
+    return _email_digests[key]
+
+
+SLACK_MAX_BLOCKS = 50
+"""Slack allows at most 50 blocks in one message."""
+
+SLACK_RATE = 1.0
+"""Slack allows about one message per second for each incoming webhook."""
+
+_slack_senders: typing.Dict[typing.Tuple[str, float], "SlackSender"] = {}
+
+
+@agent_validate.checked
+def submit_slack_message(
+    webhook: str,
+    payload: typing.Dict[str, typing.Any],
+    bucket: typing.Optional[agent_op.TokenBucket] = None,
+    max_attempts: int = 5,
+    timeout: float = 10.0,
+) -> None:
+    """Post a message to a slack webhook.
+    Honours '429 Too Many Requests' and retries server and connection errors
+    with jittered exponential backoff."""
+
+    if bucket is None:
+        bucket = agent_op.TokenBucket(rate=SLACK_RATE)
+
+    error: typing.Optional[str] = None
+    for attempt in range(max_attempts):
+        bucket.acquire()
+        try:
+            response = agent_op.http_session().post(
+                url=webhook, json=payload, timeout=timeout
             )
-            server.close()
+        except requests.RequestException as e:
+            error = f"'{e.__class__.__name__}': {e}"
+        else:
+            if response.status_code == 200:
+                return
+
+            error = f"{response.status_code} {response.text}"
+            if response.status_code == 429:
+                retry_after = agent_op.retry_after_delay(
+                    response.headers.get("Retry-After"),
+                    agent_op.backoff_delay(attempt),
+                )
+                agent_op.log_msg(
+                    logging.WARNING,
+                    f"Slack rate limit reached, waiting {retry_after:.2f}s.",
+                )
+                bucket.block(retry_after)
+                continue
+
+            if response.status_code < 500:
+                raise ValueError(f"Unexpected response from slack: {error}")
+
+        delay = agent_op.backoff_delay(attempt)
+        agent_op.log_msg(
+            logging.DEBUG, f"Retrying slack message in {delay:.2f}s after {error}"
+        )
+        time.sleep(delay)
+
+    raise ValueError(f"Could not send slack message in {max_attempts} tries: {error}")
+
+
+@agent_validate.checked
+def slack_payloads(
+    items: typing.Sequence[typing.Sequence[typing.Dict[str, typing.Any]]],
+    fallback: typing.Sequence[str],
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Combine the blocks for several items into as few messages as possible.
+    An item with more blocks than fit in a message is cut short."""
+
+    if len(items) == 1:
+        return [{"text": fallback[0], "blocks": _slack_fit(items[0], SLACK_MAX_BLOCKS)}]
+
+    text = f"{len(items)} notifications"
+    header = {"type": "header", "text": {"type": "plain_text", "text": text}}
 
-    except smtplib.SMTPException as e:
-        result["error"] = e
+    payloads = []
+    blocks = [header]
+    texts = []
+    for item_blocks, item_text in zip(items, fallback):
+        item_blocks = [{"type": "divider"}, *item_blocks]
+        if texts and len(blocks) + len(item_blocks) > SLACK_MAX_BLOCKS:
+            payloads.append({"text": "\n".join(texts), "blocks": blocks})
+            blocks = []
+            texts = []
+        blocks.extend(_slack_fit(item_blocks, SLACK_MAX_BLOCKS - len(blocks)))
+        texts.append(item_text)
 
-    return result
+    if blocks:
+        payloads.append({"text": "\n".join(texts), "blocks": blocks})
+
+    return payloads
+
+
+def _slack_fit(
+    blocks: typing.Sequence[typing.Dict[str, typing.Any]], room: int
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Get the blocks that fit in the room left in a message."""
+    if len(blocks) > room:
+        agent_op.log_msg(
+            logging.WARNING,
+            f"Slack message has {len(blocks)} blocks, "
+            f"only sending the first {room}.",
+        )
+    return list(blocks[:room])
+
+
+class SlackSender:
+    """Coalesce slack messages for one webhook into as few posts as possible.
+    Messages submitted within 'window' seconds of the first pending message
+    are sent together."""
+
+    def __init__(self, webhook: str, window: float = 2.0, max_attempts: int = 5):
+        self.webhook = webhook
+        self.max_attempts = max_attempts
+        self.bucket = agent_op.TokenBucket(rate=SLACK_RATE)
+        self.batch = agent_op.BatchWindow(self._send, window=window)
+
+    def submit(self, blocks: typing.List[typing.Dict], text: str) -> None:
+        self.batch.add((blocks, text))
+
+    def flush(self) -> int:
+        """Send all pending messages. Returns the number of messages sent."""
+        return self.batch.flush()
+
+    def _send(self, pending: typing.List[typing.Tuple[typing.List, str]]) -> None:
+        payloads = slack_payloads([i[0] for i in pending], [i[1] for i in pending])
+        for payload in payloads:
+            submit_slack_message(
+                self.webhook,
+                payload,
+                bucket=self.bucket,
+                max_attempts=self.max_attempts,
+            )
 
 
-@beartype.beartype
-def submit_slack_message(webhook: str, payload: typing.Any):
-    # send the post request with json body
-    response = requests.post(url=webhook, json=payload)
-    if not response.status_code != 200:
-        raise ValueError(f"Unexpected response from slack: {response}")
+@agent_validate.checked
+def slack_sender(webhook: str, window: float = 2.0) -> SlackSender:
+    """Get the sender for a slack webhook and window.
+    There is one sender for each webhook and window in this process."""
+    key = (webhook, window)
+    if key not in _slack_senders:
+        _slack_senders[key] = SlackSender(webhook, window=window)
+    return _slack_senders[key]
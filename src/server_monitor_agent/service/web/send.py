@@ -56,6 +56,22 @@ from server_monitor_agent.service.web import model as web_model
     multiple=True,
     help="The email addresses that will receive the message.",
 )
+@click.option(
+    "-i",
+    "--window",
+    "window",
+    default=2.0,
+    type=float,
+    help="Combine emails that arrive within this many seconds into a digest.",
+)
+@click.option(
+    "-o",
+    "--timeout",
+    "timeout",
+    default=30.0,
+    type=float,
+    help="Seconds to wait to connect to the email server, and for each command.",
+)
 @click.pass_context
 def email_message(
     ctx: click.Context,
@@ -65,6 +81,8 @@ def email_message(
     password: str,
     from_address: str,
     to_addresses: typing.Sequence[str],
+    window: float,
+    timeout: float,
 ):
     ctx.obj = web_model.EmailMessageSendArgs(
         host=host,
@@ -73,6 +91,8 @@ def email_message(
         password=password,
         from_address=from_address,
         to_addresses=to_addresses,
+        window=window,
+        timeout=timeout,
     )
     agent_io.check_send_context(ctx)
     agent_io.execute_context(ctx)
@@ -85,9 +105,17 @@ def email_message(
     short_help="Send a slack message.",
 )
 @click.option("-w", "--webhook", "webhook", required=True, help="The webhook url.")
+@click.option(
+    "-i",
+    "--window",
+    "window",
+    default=2.0,
+    type=float,
+    help="Combine messages that arrive within this many seconds into one message.",
+)
 @click.pass_context
-def slack_message(ctx: click.Context, webhook: str):
-    ctx.obj = web_model.SlackMessageSendArgs(webhook=webhook)
+def slack_message(ctx: click.Context, webhook: str, window: float):
+    ctx.obj = web_model.SlackMessageSendArgs(webhook=webhook, window=window)
     agent_io.check_send_context(ctx)
     agent_io.execute_context(ctx)
 
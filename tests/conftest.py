@@ -1,8 +1,16 @@
+import os
+
+# check all types in tests, set before the agent is imported
+os.environ.setdefault("SERVER_MONITOR_AGENT_VALIDATE", "all")
+
 import pytest
+import requests
 from collections import namedtuple
 
 from psutil._common import sdiskpart, sdiskusage, snetio
 
+_session_request = requests.sessions.Session.request
+
 
 @pytest.fixture(autouse=True)
 def no_run_cmd(monkeypatch):
@@ -24,6 +32,12 @@ def no_requests(monkeypatch):
     monkeypatch.setattr("requests.sessions.Session.request", run_cmd)
 
 
+@pytest.fixture()
+def allow_requests(monkeypatch):
+    """Allow requests to be sent, for tests that use a local stand-in server."""
+    monkeypatch.setattr("requests.sessions.Session.request", _session_request)
+
+
 @pytest.fixture()
 def methods_require_mock(monkeypatch, mocker):
     """Throw error for methods that are slow or can't be used in tests."""
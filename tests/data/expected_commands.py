@@ -12,15 +12,20 @@ expected_items = {
         {"command": "systemd-unit-status", "args": "SystemdUnitLogsCollectArgs"},
         {"command": "systemd-unit-logs", "args": "SystemdUnitStatusCollectArgs"},
         {"command": "web-app", "args": "RequestUrlCollectArgs"},
+        {"command": "reachability", "args": "ReachabilityCollectArgs"},
     ],
     "send": [
-        # {"command": "alert-manager", "args": "AlertManagerSendArgs"},
+        {"command": "alert-manager", "args": "AlertManagerSendArgs"},
+        {"command": "consul-ttl-check", "args": "ConsulTtlCheckSendArgs"},
         {"command": "file-output", "args": "FileOutputSendArgs"},
+        {"command": "status-board", "args": "StatusBoardSendArgs"},
         {"command": "logged-in-users", "args": "LoggedInUsersSendArgs"},
         {"command": "stream-output", "args": "StreamOutputSendArgs"},
         {"command": "statuscake", "args": "StatusCakeSendArgs"},
         {"command": "email-message", "args": "EmailMessageSendArgs"},
         {"command": "slack-message", "args": "SlackMessageSendArgs"},
+        {"command": "prometheus-textfile", "args": "PrometheusTextfileSendArgs"},
+        {"command": "serve-metrics", "args": "ServeMetricsSendArgs"},
     ],
     "exclusions": [
         ("consul-checks", "statuscake"),
@@ -34,6 +39,7 @@ expected_items = {
         ("systemd-unit-status", "statuscake"),
         ("systemd-unit-logs", "statuscake"),
         ("web-app", "statuscake"),
+        ("reachability", "statuscake"),
     ],
     "pairs": [],
 }
@@ -1,34 +1,148 @@
+import contextlib
+import socketserver
+import threading
 import typing
 from http import server
 
-from tests.data import completed_process_examples as cp_eg
+from benchmarks import replay
+from server_monitor_agent.agent import operation as agent_op
 
 
 class EchoHTTPRequestHandler(server.BaseHTTPRequestHandler):
-    pass
+    """Record each request and reply with the next scripted response."""
 
+    def do_GET(self):
+        self._reply()
 
-# ADDR = "127.0.0.1"
-# PORT = 8000
-# Handler = EchoHTTPRequestHandler
-# with socketserver.TCPServer((ADDR, PORT), Handler) as httpd:
-#     print("serving at port", PORT)
-#     httpd.serve_forever()
+    def do_POST(self):
+        self._reply()
 
+    def do_PUT(self):
+        self._reply()
 
-def execute_process_side_effect(args: typing.Sequence[str]):
-    match_any = "__MATCH_ANY__"
-    for item in cp_eg.examples:
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.received.append(
+            {
+                "method": self.command,
+                "path": self.path,
+                "headers": dict(self.headers),
+                "body": body,
+            }
+        )
 
-        if args == item.args:
-            return item
+        if self.server.responses:
+            status, headers, content = self.server.responses.pop(0)
+        else:
+            status, headers, content = 200, {}, b"ok"
 
-        if match_any in item.args:
-            match_any_index = item.args.index(match_any)
-            args_without = args[:match_any_index] + args[match_any_index + 1 :]
-            item_args_without = (
-                item.args[:match_any_index] + item.args[match_any_index + 1 :]
-            )
-            if args_without == item_args_without:
-                return item
-    raise ValueError(f"Must handle args '{args}'.")
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def http_stand_in(
+    responses: typing.Optional[typing.List[typing.Tuple[int, dict, bytes]]] = None,
+):
+    """Run a local http server that records requests.
+    Replies with the given (status, headers, content) responses in order,
+    then with '200 ok'."""
+    httpd = server.ThreadingHTTPServer(("127.0.0.1", 0), EchoHTTPRequestHandler)
+    httpd.received = []
+    httpd.responses = list(responses or [])
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield httpd
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join(timeout=5)
+
+
+class SmtpStandInHandler(socketserver.StreamRequestHandler):
+    """Speak enough plain SMTP for smtplib to log in and send messages."""
+
+    def handle(self):
+        self.server.connections += 1
+        self._send("220 localhost stand-in ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self._send("250-localhost")
+                self._send("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                self.server.logins += 1
+                self._send("235 authenticated")
+            elif verb == "MAIL":
+                self.envelope = {"from": command, "to": []}
+                self._send("250 ok")
+            elif verb == "RCPT":
+                self.envelope["to"].append(command)
+                self._send("250 ok")
+            elif verb == "DATA":
+                self._send("354 end with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b""):
+                        break
+                    data.append(data_line)
+                self.envelope["data"] = b"".join(data)
+                self.server.messages.append(self.envelope)
+                self._send("250 queued")
+            elif verb == "QUIT":
+                self._send("221 bye")
+                return
+            else:
+                self._send("250 ok")
+
+    def _send(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+
+class SmtpStandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+
+@contextlib.contextmanager
+def smtp_stand_in():
+    """Run a local plain-text SMTP server that records connections and messages."""
+    smtpd = SmtpStandInServer(("127.0.0.1", 0), SmtpStandInHandler)
+    smtpd.connections = 0
+    smtpd.logins = 0
+    smtpd.messages = []
+    smtpd.port = smtpd.server_address[1]
+
+    thread = threading.Thread(target=smtpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield smtpd
+    finally:
+        smtpd.shutdown()
+        smtpd.server_close()
+        thread.join(timeout=5)
+
+
+# replays the recorded command outputs
+execute_process_side_effect = replay.replay_process
+
+
+def stream_process_side_effect(args: typing.Sequence[str], **kwargs):
+    result = execute_process_side_effect(args)
+    return contextlib.nullcontext(agent_op.ProcessStream.from_result(result))
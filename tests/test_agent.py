@@ -1,11 +1,35 @@
+import datetime
 import inspect
+import json
+import pathlib
+import threading
 
+import click
+import pytest
 from click.testing import CliRunner
 
-from server_monitor_agent.agent import registry as agent_registry
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    registry as agent_registry,
+)
 from tests.data import expected_commands as ex_cmd
 
 
+def _agent_item() -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name="critical",
+        service_name="/data",
+        extra_data={},
+    )
+
+
 def test_main(tmp_path, mocker, requests_mock):
 
     execute_process_mock = mocker.patch(
@@ -51,10 +75,28 @@ def test_main(tmp_path, mocker, requests_mock):
   collection source from the Commands.
 
 Options:
-  --debug / --no-debug  Turn on debug logging.  [default: no-debug]
-  -c, --config PATH     Provide a config file.
-  --version             Show the version and exit.
-  --help                Show this message and exit.
+  --debug / --no-debug        Turn on debug logging.  [default: no-debug]
+  -c, --config PATH           Provide a config file.
+  --spool-dir DIRECTORY       Keep notifications in this directory until they
+                              are sent, and retry notifications that could not
+                              be sent.
+  --cache-ttl FLOAT RANGE     Use the items collected by the same check within
+                              this many seconds, instead of running the check.
+                              Stale items are sent, then the check runs again.
+                              [x>0]
+  --cache-dir DIRECTORY       Keep the cached items in this directory. Defaults
+                              to a directory in the user's cache directory.
+  --send-timeout FLOAT RANGE  When sending to more than one target, stop waiting
+                              for a target after this many seconds, including
+                              delivering buffered output. A target that is still
+                              sending is left to finish in the background.
+                              [default: 120.0; x>0]
+  --profile / --no-profile    Show the time taken by each stage when finished.
+                              [default: no-profile]
+  --profile-file FILE         Write the time taken by each stage to this json
+                              file.
+  --version                   Show the version and exit.
+  --help                      Show this message and exit.
 
 Commands:
   consul-checks        Get a summary of consul check statuses.
@@ -64,6 +106,8 @@ Commands:
   file-input           Load input from a file.
   file-status          Get information about a file.
   memory               Get the memory usage.
+  reachability         Check network host reachability.
+  schedule             Run checks on a schedule.
   statuscake           Collect data for the statuscake agent.
   stream-input         Read input from a stream.
   systemd-unit-logs    Get the logs for a systemd unit.
@@ -132,11 +176,38 @@ def test_gather_io():
         assert item_arg_type.__name__ in expected_send_args
 
 
+
+def test_io_dispatch_by_type():
+    from server_monitor_agent.service.disk import model as disk_model
+
+    agent_registry.SourceTargetIORegistry.clear()
+    reg = agent_registry.SourceTargetIORegistry()
+
+    args = disk_model.FileInputCollectArgs(
+        path=pathlib.Path("/tmp/item.json"), format="agent-item"
+    )
+    match = reg.find(reg.collect_by_type, type(args))
+    assert match.func.__name__ == "file_input"
+    assert reg.loaded_modules == {"server_monitor_agent.service.disk.io"}
+
+    match = reg.find(reg.send_by_type, disk_model.FileOutputSendArgs)
+    assert match.func.__name__ == "file_output"
+    assert len(reg.loaded_modules) == 1
+
+    class OtherArgs(agent_model.CollectArgs):
+        pass
+
+    with pytest.raises(ValueError, match="Unexpected collect args"):
+        reg.collect(OtherArgs())
+    assert len(reg.loaded_modules) > 1
+
 def test_command_links():
     from server_monitor_agent.agent import command as agent_command
 
     actual = []
     for group_name, group_data in agent_command.cli.commands.items():
+        if not isinstance(group_data, click.Group):
+            continue
         for cmd_name, cmd_data in group_data.commands.items():
             actual.append((group_name, cmd_name))
 
@@ -146,3 +217,127 @@ def test_command_links():
 
     assert len(actual) == len(expected)
     assert sorted(actual) == sorted(expected)
+
+
+class _TestSendArgs(agent_model.SendArgs):
+    def __init__(self, name: str):
+        self.name = name
+
+
+def test_send_all_isolates_targets():
+    sent = []
+    release = threading.Event()
+
+    def test_output(args: _TestSendArgs, item: agent_model.AgentItem) -> None:
+        if args.name == "fail":
+            raise ValueError("Target is down.")
+        if args.name == "slow":
+            release.wait(5)
+        sent.append(args.name)
+
+    reg = agent_registry.SourceTargetIORegistry()
+    reg.add(agent_model.RegisterSendOutput(test_output))
+    try:
+        targets = [_TestSendArgs(i) for i in ["ok", "fail", "slow"]]
+        errors = reg.send_all(targets, [_agent_item()], timeout=0.2)
+    finally:
+        release.set()
+        agent_registry.SourceTargetIORegistry.clear()
+
+    assert sent[0] == "ok"
+    assert errors == [
+        "_TestSendArgs failed: 'ValueError': Target is down.",
+        "_TestSendArgs did not finish within 0.2s",
+    ]
+
+
+def test_send_all_flushes_in_targets():
+    delivered = []
+    release = threading.Event()
+
+    def test_output(args: _TestSendArgs, item: agent_model.AgentItem) -> None:
+        def flush():
+            if args.name == "fail":
+                raise ValueError("Could not deliver.")
+            if args.name == "slow":
+                release.wait(5)
+            delivered.append(args.name)
+
+        agent_op.register_flush(flush)
+
+    reg = agent_registry.SourceTargetIORegistry()
+    reg.add(agent_model.RegisterSendOutput(test_output))
+    try:
+        targets = [_TestSendArgs(i) for i in ["ok", "fail", "slow"]]
+        errors = reg.send_all(targets, [_agent_item()], timeout=0.2)
+    finally:
+        release.set()
+        agent_registry.SourceTargetIORegistry.clear()
+
+    # buffered output is delivered by each target within the timeout
+    assert delivered == ["ok"]
+    assert errors == [
+        "_TestSendArgs failed: 'ValueError': Could not deliver.",
+        "_TestSendArgs did not finish within 0.2s",
+    ]
+    agent_op.run_flush()
+    assert delivered == ["ok"]
+
+
+@pytest.mark.parametrize("names", [["one"], ["one", "two"]])
+def test_send_all_streams_items(names):
+    received = {i: threading.Event() for i in names}
+
+    def test_output(args: _TestSendArgs, item: agent_model.AgentItem) -> None:
+        received[args.name].set()
+
+    def agent_items():
+        yield _agent_item()
+        # the next item is only collected after every target has the first item
+        for event in received.values():
+            assert event.wait(5), "The first item was not sent before the input ended."
+        yield _agent_item()
+
+    reg = agent_registry.SourceTargetIORegistry()
+    reg.add(agent_model.RegisterSendOutput(test_output))
+    try:
+        targets = [_TestSendArgs(i) for i in names]
+        assert reg.send_all(targets, agent_items(), timeout=10.0) == []
+    finally:
+        agent_registry.SourceTargetIORegistry.clear()
+
+
+def test_send_chain_cli(tmp_path):
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item().to_dict()))
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            *["file-input", "-p", str(source)],
+            *["file-output", "-p", str(tmp_path / "one.json")],
+            *["file-output", "-p", str(tmp_path / "two.json")],
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+    for name in ["one.json", "two.json"]:
+        content = json.loads((tmp_path / name).read_text())
+        assert content["summary"] == "High disk /data use"
+
+    # a target that fails does not stop the other targets
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            *["file-input", "-p", str(source)],
+            *["file-output", "-p", str(tmp_path)],
+            *["file-output", "-p", str(tmp_path / "three.json")],
+        ],
+    )
+    assert result.exit_code == 1
+    assert "1 sends did not succeed: FileOutputSendArgs failed" in str(
+        result.exception
+    )
+    assert (tmp_path / "three.json").exists()
@@ -0,0 +1,186 @@
+import datetime
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.service.alert_manager import (
+    io as alert_io,
+    model as alert_model,
+    operation as alert_op,
+)
+from tests import helpers
+
+
+def _agent_item(status: str = "critical") -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime.now(datetime.timezone.utc),
+        status_name=status,
+        service_name="/data",
+        extra_data={"usage": 0.95},
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(agent_op, "backoff_delay", lambda *args, **kwargs: 0.0)
+    monkeypatch.setattr(alert_op, "_alert_senders", {})
+    yield
+    agent_op._flush_callbacks.items.clear()
+
+
+def _send(args, *statuses):
+    for status in statuses:
+        alert_io.alert_manager_output(args, _agent_item(status))
+    agent_op.run_flush()
+
+
+def _alerts(httpd):
+    assert all(i["path"] == "/api/v2/alerts" for i in httpd.received)
+    return [json.loads(i["body"]) for i in httpd.received]
+
+
+def test_alert_fire_dedup_resolve(allow_requests, tmp_path):
+    with helpers.http_stand_in() as httpd:
+        args = alert_model.AlertManagerSendArgs(
+            base_url=httpd.url, state_file=tmp_path / "state.json", window=60.0
+        )
+        _send(args, "critical")
+        _send(args, "critical")
+        _send(args, "passing")
+        _send(args, "passing")
+
+    fired, resolved = _alerts(httpd)
+    assert len(fired) == 1
+    assert fired[0]["labels"] == {
+        "alertname": "disk",
+        "instance": "test-instance.example.com",
+        "service": "/data",
+        "source": "server",
+        "severity": "critical",
+    }
+    assert fired[0]["annotations"]["summary"] == "High disk /data use"
+
+    assert resolved[0]["labels"] == fired[0]["labels"]
+    assert resolved[0]["startsAt"] == fired[0]["startsAt"]
+    assert resolved[0]["endsAt"] < fired[0]["endsAt"]
+
+
+def test_alert_resend_and_severity_change(allow_requests, tmp_path):
+    with helpers.http_stand_in() as httpd:
+        args = alert_model.AlertManagerSendArgs(
+            base_url=httpd.url,
+            resend_interval=0.0,
+            state_file=tmp_path / "state.json",
+            window=60.0,
+        )
+        _send(args, "warning")
+        _send(args, "warning")
+        _send(args, "critical")
+
+    first, resent, changed = _alerts(httpd)
+    assert resent[0]["startsAt"] == first[0]["startsAt"]
+    assert [i["labels"]["severity"] for i in changed] == ["warning", "critical"]
+    assert "endsAt" in changed[0]
+
+
+def test_alert_batch_and_retry(allow_requests, tmp_path):
+    with helpers.http_stand_in([(503, {}, b"unavailable")]) as httpd:
+        args = alert_model.AlertManagerSendArgs(
+            base_url=f"{httpd.url}/api/v2/",
+            state_file=tmp_path / "state.json",
+            window=60.0,
+        )
+        for index in range(3):
+            item = _agent_item()
+            item.service_name = f"/data{index}"
+            alert_io.alert_manager_output(args, item)
+        agent_op.run_flush()
+
+    assert [len(i) for i in _alerts(httpd)] == [3, 3]
+
+
+def test_alert_client_error_keeps_state(allow_requests, tmp_path):
+    state_file = tmp_path / "state.json"
+    with helpers.http_stand_in([(400, {}, b"bad alert")]) as httpd:
+        args = alert_model.AlertManagerSendArgs(
+            base_url=httpd.url, state_file=state_file, window=60.0
+        )
+        with pytest.raises(ValueError, match="400 bad alert"):
+            _send(args, "critical")
+
+    assert not state_file.exists()
+
+
+def test_alert_naive_date(allow_requests, tmp_path):
+    naive = datetime.datetime.now() - datetime.timedelta(minutes=5)
+    item = _agent_item("passing")
+    item.date = naive
+    assert alert_model.AlertManagerItem.from_agent_item(item).ends_at == (
+        naive.astimezone(datetime.timezone.utc)
+    )
+
+    # a naive date read from a file is compared with the current time
+    with helpers.http_stand_in() as httpd:
+        args = alert_model.AlertManagerSendArgs(
+            base_url=httpd.url, state_file=tmp_path / "state.json", window=60.0
+        )
+        _send(args, "critical")
+        alert_io.alert_manager_output(
+            args,
+            agent_model.AgentItem.from_dict(
+                {**item.to_dict(), "date": naive.isoformat()}
+            ),
+        )
+        agent_op.run_flush()
+
+    fired, resolved = _alerts(httpd)
+    assert resolved[0]["endsAt"].endswith("+00:00")
+
+
+def test_alert_item_round_trip():
+    item = alert_model.AlertManagerItem.from_agent_item(_agent_item("warning"))
+    agent_item = item.to_agent_item()
+    assert agent_item.status_name == "warning"
+    assert agent_item.check_name == "disk"
+    assert agent_item.host_name == "test-instance.example.com"
+    again = alert_model.AlertManagerItem.from_agent_item(agent_item)
+    assert again.fingerprint == item.fingerprint
+    assert again.annotations == item.annotations
+
+    resolved = alert_model.AlertManagerItem.from_agent_item(_agent_item("passing"))
+    assert "severity" not in resolved.labels
+    assert resolved.to_agent_item().status_name == "passing"
+
+
+def test_alert_manager_cli(allow_requests, tmp_path):
+    path = tmp_path / "item.json"
+    path.write_text(json.dumps(_agent_item().to_dict()))
+
+    from server_monitor_agent.agent import command as agent_command
+
+    with helpers.http_stand_in() as httpd:
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(
+            agent_command.cli,
+            [
+                "file-input",
+                "-p",
+                str(path),
+                "alert-manager",
+                "-u",
+                httpd.url,
+                "-s",
+                str(tmp_path / "state.json"),
+            ],
+        )
+
+    assert result.exit_code == 0, result.stderr
+    (alerts,) = _alerts(httpd)
+    assert alerts[0]["labels"]["severity"] == "critical"
@@ -0,0 +1,131 @@
+import dataclasses
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from benchmarks import collectors, models, serialise, startup, validate
+
+
+@pytest.mark.benchmark
+def test_collectors_measure():
+    scenarios = collectors.scenarios(scale=0.01)
+    results = [collectors.measure(i, repeat=1) for i in scenarios]
+
+    assert len(results) == len(scenarios)
+    assert all(i.best > 0 and i.peak_memory > 0 for i in results)
+
+    baseline = {i.name: {**i.to_dict(), "median": i.median / 10} for i in results}
+    regressions = collectors.compare(results, baseline, tolerance=2.0)
+    assert len(regressions) == len(results)
+    assert collectors.compare(results, {}, tolerance=2.0) == []
+
+
+@pytest.mark.benchmark
+def test_collectors_cli(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    runner = CliRunner(mix_stderr=False)
+    args = ["-n", "1", "-s", "0.01", "-k", "memory", "-b", str(baseline)]
+
+    result = runner.invoke(collectors.main, [*args, "--save"])
+    assert result.exit_code == 0, result.stderr
+    assert list(json.loads(baseline.read_text())) == ["memory"]
+
+    result = runner.invoke(collectors.main, [*args, "-t", "1000"])
+    assert result.exit_code == 0, result.stderr
+    assert "memory" in result.stdout
+
+
+def test_startup_budget():
+    content = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   click.types\n"
+        "import time:      1500 |       1620 | server_monitor_agent.agent.command\n"
+    )
+    imports = startup.parse_import_times(content)
+    assert [i.name.strip() for i in imports] == [
+        "click.types",
+        "server_monitor_agent.agent.command",
+    ]
+
+    result = startup.StartupMeasurement(
+        name="help",
+        runs=1,
+        wall_seconds=0.5,
+        cpu_seconds=0.4,
+        peak_rss_kib=40000,
+        exit_code=0,
+        imports=imports,
+    )
+    budget = {
+        "commands": {"help": {"wall_seconds": 0.4, "peak_rss_kib": 50000}},
+        "modules": {"server_monitor_agent.agent.command": 0.001},
+    }
+    assert startup.check_budget([result], budget) == [
+        "help: wall_seconds 0.500 over 0.400",
+        "help: import of server_monitor_agent.agent.command 0.002s over 0.001s",
+    ]
+    assert startup.check_budget([result], startup.build_budget([result], 1.5)) == []
+
+    # the time budgets are scaled, and the memory budgets moved, by the baseline
+    baseline = dataclasses.replace(
+        result, name="baseline", wall_seconds=0.04, peak_rss_kib=12000, imports=[]
+    )
+    budget["baseline"] = {"wall_seconds": 0.02, "peak_rss_kib": 9000}
+    scale = startup.machine_scale(budget, baseline)
+    assert scale == pytest.approx(2.0)
+    assert startup.check_budget([result], budget, scale, baseline) == []
+    assert startup.machine_scale({}, baseline) == 1.0
+
+    # a command that fails is reported, whatever its times
+    failed = dataclasses.replace(result, exit_code=1)
+    assert startup.check_budget([failed], {}) == ["help: exited with code 1"]
+
+
+@pytest.mark.benchmark
+def test_startup_cli(tmp_path):
+    budget = tmp_path / "budget.json"
+    runner = CliRunner(mix_stderr=False)
+    args = ["-n", "1", "-k", "version", "-b", str(budget), "--top", "3"]
+
+    result = runner.invoke(startup.main, [*args, "--save"])
+    assert result.exit_code == 0, result.stderr
+    saved = json.loads(budget.read_text())
+    assert list(saved["commands"]) == ["version"]
+    assert saved["baseline"]["wall_seconds"] > 0
+    assert "Slowest module imports for 'version'" in result.stdout
+
+    result = runner.invoke(startup.main, [*args, "--scale", "100"])
+    assert result.exit_code == 0, result.stderr
+    assert "(exit 0)" in result.stdout
+    assert "Time budgets scaled by 100.00" in result.stdout
+
+
+@pytest.mark.benchmark
+def test_models_cli(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    runner = CliRunner(mix_stderr=False)
+    args = ["-c", "100", "-b", str(baseline)]
+
+    result = runner.invoke(models.main, [*args, "--save"])
+    assert result.exit_code == 0, result.stderr
+    assert len(json.loads(baseline.read_text())) == len(models.scenarios())
+
+    result = runner.invoke(models.main, [*args, "-t", "1000"])
+    assert result.exit_code == 0, result.stderr
+    assert "agent-item" in result.stdout
+
+
+@pytest.mark.benchmark
+def test_serialise_compare():
+    for name, item in serialise.items(scale=0.01).items():
+        results = serialise.compare(name, item, repeat=1)
+        assert [i.name for i in results] == [f"encode {name}", f"decode {name}"]
+
+
+@pytest.mark.benchmark
+def test_validate_measure():
+    result = validate.measure("none", count=10)
+    assert result.policy == "none"
+    assert sorted(result.item_seconds) == sorted(validate.SCENARIOS)
+    assert result.import_seconds > 0
@@ -0,0 +1,152 @@
+import datetime
+import json
+import mmap
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import board as agent_board, model as agent_model
+
+
+def _agent_item(status: str = "warning") -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 85.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name=status,
+        service_name="data",
+        extra_data={},
+    )
+
+
+def test_publish_and_read(tmp_path):
+    path = str(tmp_path / "board")
+    agent_board.publish(path, "cpu", 0, "CPU is fine.", updated=100.0)
+    agent_board.publish(path, "disk", 2, "Disk is full.", updated=200.0)
+
+    # the record for a check is replaced
+    agent_board.publish(path, "cpu", 1, "CPU is busy.", updated=300.0)
+
+    assert agent_board.read(path, "cpu") == agent_board.BoardRecord(
+        check_id="cpu", exit_code=1, updated=300.0, text="CPU is busy."
+    )
+    assert agent_board.read(path, "disk").exit_code == 2
+    assert agent_board.read(path, "memory") is None
+
+    # long text is cut to fit without splitting a character
+    agent_board.publish(path, "long", 0, "é" * agent_board.TEXT_BYTES)
+    assert agent_board.read(path, "long").text == "é" * (agent_board.TEXT_BYTES // 2)
+
+
+def test_publish_full_and_invalid(tmp_path):
+    path = str(tmp_path / "board")
+    agent_board.publish(path, "first", 0, "", capacity=1)
+    with pytest.raises(ValueError, match="has no room for check 'second'"):
+        agent_board.publish(path, "second", 0, "")
+
+    with pytest.raises(ValueError, match="Check id must be 1 to 64 bytes"):
+        agent_board.publish(path, "x" * 65, 0, "")
+
+    (tmp_path / "other").write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError, match="Not a status board file"):
+        agent_board.read(str(tmp_path / "other"), "first")
+
+
+def test_read_torn_record(tmp_path, monkeypatch):
+    path = str(tmp_path / "board")
+    agent_board.publish(path, "cpu", 0, "CPU is fine.")
+
+    # an odd sequence number means a writer has not finished the record
+    with open(path, "r+b") as f:
+        with mmap.mmap(f.fileno(), 0) as view:
+            offset = agent_board._record_offset(0)
+            (sequence,) = agent_board._SEQUENCE.unpack_from(view, offset)
+            agent_board._SEQUENCE.pack_into(view, offset, sequence + 1)
+
+            monkeypatch.setattr(agent_board, "READ_ATTEMPTS", 3)
+            with pytest.raises(ValueError, match="Could not read"):
+                agent_board.read_view(view, "cpu")
+
+            agent_board._SEQUENCE.pack_into(view, offset, sequence + 2)
+            assert agent_board.read_view(view, "cpu").text == "CPU is fine."
+
+
+def test_default_check_id():
+    assert agent_board.default_check_id("disk data /var") == "disk-data-var"
+
+    # long names are cut short, and keep a hash so they are still different
+    first = agent_board.default_check_id("systemd-unit " + "a" * 80)
+    second = agent_board.default_check_id("systemd-unit " + "a" * 81)
+    assert len(first) == agent_board.CHECK_ID_BYTES
+    assert first.startswith("systemd-unit-aaa")
+    assert first != second
+    assert agent_board.validate_check_id(first) == first
+
+
+def test_main(tmp_path, capsys):
+    path = str(tmp_path / "board")
+    agent_board.publish(path, "disk", 2, "Disk is full.", updated=0.0)
+
+    assert agent_board.main([path, "disk"]) == 2
+    assert capsys.readouterr().out == "Disk is full.\n"
+
+    assert agent_board.main(["--max-age", "60", path, "disk"]) == 3
+    assert capsys.readouterr().out.endswith("s old.\n")
+
+    assert agent_board.main([path, "cpu"]) == 3
+    assert capsys.readouterr().out == "No result for check 'cpu'.\n"
+
+    assert agent_board.main([str(tmp_path / "missing"), "cpu"]) == 3
+    assert agent_board.main(["--max-age", "soon", path, "disk"]) == 2
+    assert agent_board.main([path]) == 2
+    assert agent_board.main(["--help"]) == 0
+
+
+def test_reader_imports():
+    code = (
+        "import sys; from server_monitor_agent.agent import board; "
+        "print(sorted({'click', 'requests', 'psutil'} & set(sys.modules)))"
+    )
+    src = pathlib.Path(agent_board.__file__).parents[2]
+    env = {**os.environ, "PYTHONPATH": str(src)}
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_status_board_cli(tmp_path):
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item().to_dict()))
+    path = tmp_path / "board"
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    for check_id in ["disk", None]:
+        args = ["file-input", "-p", str(source), "status-board", "-p", str(path)]
+        if check_id:
+            args.extend(["-i", check_id])
+        result = runner.invoke(agent_command.cli, args)
+        assert result.exit_code == 0, result.stderr
+
+    record = agent_board.read(str(path), "disk")
+    assert record.exit_code == 1
+    assert record.text == (
+        "High disk /data use\nHigh disk /data use of 85.0% (threshold 80.0%)."
+    )
+    assert agent_board.read(str(path), "disk-data").exit_code == 1
+
+    # a given check id that does not fit is an error before anything runs
+    args = ["file-input", "-p", str(source), "status-board", "-p", str(path)]
+    result = runner.invoke(agent_command.cli, [*args, "-i", "x" * 65])
+    assert result.exit_code == 2
+    assert "Invalid value for '--check-id'" in result.stderr
@@ -0,0 +1,125 @@
+import datetime
+import json
+import os
+import pathlib
+
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import (
+    cache as agent_cache,
+    convert as agent_convert,
+    model as agent_model,
+)
+from server_monitor_agent.service.disk import model as disk_model
+
+
+def _agent_item(status: str = "passing") -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="Consul checks",
+        description="All consul checks are passing.",
+        host_name="test-instance.example.com",
+        source_name="consul",
+        check_name="health-checks",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name=status,
+        service_name="consul",
+        extra_data={"checks": [{"Name": "serf", "Status": status}]},
+    )
+
+
+class _Collector:
+    def __init__(self):
+        self.statuses = ["passing", "warning", "critical"]
+        self.calls = 0
+
+    def __call__(self, collect_args):
+        status = self.statuses[self.calls]
+        self.calls += 1
+        return iter([_agent_item(status)])
+
+
+def _args(path: str = "/tmp/item.json"):
+    return disk_model.FileInputCollectArgs(path=pathlib.Path(path), format="json")
+
+
+def test_cache_key():
+    key = agent_cache.cache_key(_args())
+    assert key == agent_cache.cache_key(_args())
+    assert key != agent_cache.cache_key(_args("/tmp/other.json"))
+
+
+def test_cache_fresh_and_stale(tmp_path):
+    now = [1000.0]
+    cache = agent_cache.ResultCache(tmp_path, ttl=60.0, clock=lambda: now[0])
+    collect = _Collector()
+
+    def statuses():
+        return [i.status_name for i in cache.collect(_args(), collect)]
+
+    assert statuses() == ["passing"]
+    entry = tmp_path / f"{agent_cache.cache_key(_args())}.bin"
+    os.utime(entry, (now[0], now[0]))
+
+    # a fresh entry is used without running the check
+    now[0] += 30
+    assert statuses() == ["passing"]
+    assert collect.calls == 1
+
+    # a stale entry is used, then refreshed
+    now[0] += 60
+    assert statuses() == ["passing"]
+    assert collect.calls == 2
+    os.utime(entry, (now[0], now[0]))
+    assert statuses() == ["warning"]
+
+    # an entry that is too old is not used
+    now[0] += 60 * agent_cache.CACHE_STALE_FACTOR
+    assert statuses() == ["critical"]
+    assert collect.calls == 3
+
+
+def test_cache_single_refresh(tmp_path):
+    now = [1000.0]
+    cache = agent_cache.ResultCache(tmp_path, ttl=60.0, clock=lambda: now[0])
+    collect = _Collector()
+    list(cache.collect(_args(), collect))
+    now[0] = os.stat(tmp_path / f"{agent_cache.cache_key(_args())}.bin").st_mtime
+    now[0] += 90
+
+    # another process is refreshing the entry, so the stale items are used
+    key = agent_cache.cache_key(_args())
+    with cache._lock(key, blocking=True):
+        items = list(cache.collect(_args(), collect))
+    assert [i.status_name for i in items] == ["passing"]
+    assert collect.calls == 1
+
+    def fail(collect_args):
+        raise ValueError("Consul is not available.")
+
+    # a failed refresh keeps the stale entry
+    assert [i.status_name for i in cache.collect(_args(), fail)] == ["passing"]
+
+
+def test_cache_cli(tmp_path):
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item().to_dict()))
+    target = tmp_path / "items.ndjson"
+    args = [
+        *["--cache-ttl", "300", "--cache-dir", str(tmp_path / "cache")],
+        *["file-input", "-p", str(source)],
+        *["file-output", "-p", str(target), "-e", "ndjson"],
+    ]
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(agent_command.cli, args)
+    assert result.exit_code == 0, result.stderr
+
+    # the cached item is used, even though the source has changed
+    source.write_text(json.dumps(_agent_item("critical").to_dict()))
+    result = runner.invoke(agent_command.cli, args)
+    assert result.exit_code == 0, result.stderr
+
+    items = agent_convert.from_ndjson(target.read_text(), "agent-item")
+    assert [i.status_name for i in items] == ["passing", "passing"]
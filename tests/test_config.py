@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import (
+    command as agent_command,
+    config as agent_config,
+    operation as agent_op,
+)
+
+CONFIG = """
+memory:
+  threshold: 50
+  stream-output:
+    format: prom-alert-manager
+    serialise: yaml
+"""
+
+
+def test_normalise():
+    config = agent_config.normalise(
+        {"memory": {"threshold": "50", "stream-output": {"format": "agent-item"}}},
+        agent_command.cli,
+    )
+    assert config == {
+        "memory": {"threshold": "50", "stream-output": {"out_format": "agent-item"}}
+    }
+
+    assert agent_config.normalise(None, agent_command.cli) == {}
+
+    with pytest.raises(ValueError, match="Config for memory must be a mapping"):
+        agent_config.normalise({"memory": [50]}, agent_command.cli)
+    with pytest.raises(ValueError, match="Unrecognised name: 'debug'"):
+        agent_config.normalise({"debug": True}, agent_command.cli)
+    with pytest.raises(ValueError, match="has an invalid 'threshold'"):
+        agent_config.normalise({"memory": {"threshold": "high"}}, agent_command.cli)
+    with pytest.raises(ValueError, match="Config for memory stream-output has an"):
+        agent_config.normalise(
+            {"memory": {"stream-output": {"format": "xml"}}}, agent_command.cli
+        )
+
+
+def test_load_cache(tmp_path, monkeypatch):
+    path = tmp_path / "config.yml"
+    path.write_text(CONFIG)
+    cache = tmp_path / "cache"
+
+    expected = {
+        "memory": {
+            "threshold": 50,
+            "stream-output": {
+                "out_format": "prom-alert-manager",
+                "serialise_format": "yaml",
+            },
+        }
+    }
+    assert agent_config.load(path, agent_command.cli, cache) == expected
+    assert len(list(cache.iterdir())) == 1
+
+    def read_config(path):
+        raise AssertionError("Should use the cached config.")
+
+    # the cache is used while the file has not changed
+    with monkeypatch.context() as m:
+        m.setattr(agent_op, "read_config", read_config)
+        assert agent_config.load(path, agent_command.cli, cache) == expected
+
+    stat = path.stat()
+    path.write_text(CONFIG.replace("50", "60"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    result = agent_config.load(path, agent_command.cli, cache)
+    assert result["memory"]["threshold"] == 60
+
+    with pytest.raises(ValueError, match="Could not read config file"):
+        agent_config.load(tmp_path / "missing.yml", agent_command.cli, cache)
+
+
+def test_config_cli(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path = tmp_path / "config.yml"
+    path.write_text("memory:\n  threshold: high\n")
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli, ["--config", str(path), "memory", "stream-output"]
+    )
+    assert result.exit_code == 2
+    assert "has an invalid 'threshold'" in result.stderr
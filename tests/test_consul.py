@@ -0,0 +1,137 @@
+import datetime
+import json
+
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.service.consul import (
+    io as consul_io,
+    model as consul_model,
+    operation as consul_op,
+)
+from tests import helpers
+
+
+def _agent_item(status: str = "critical") -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime.now(datetime.timezone.utc),
+        status_name=status,
+        service_name="/data",
+        extra_data={},
+    )
+
+
+def _requests(httpd):
+    return [
+        (i["method"], i["path"], json.loads(i["body"]) if i["body"] else None)
+        for i in httpd.received
+    ]
+
+
+def test_ttl_check_item():
+    args = consul_model.ConsulTtlCheckSendArgs(ttl=60, service_id="web")
+    check = consul_model.ConsulTtlCheckItem.from_agent_item(_agent_item(), args)
+    assert check.check_id == "server-monitor-agent-disk-data"
+    assert check.to_register() == {
+        "ID": "server-monitor-agent-disk-data",
+        "Name": "disk /data",
+        "Notes": "Updated by server-monitor-agent.",
+        "TTL": "60s",
+        "Status": "critical",
+        "ServiceID": "web",
+    }
+    assert check.to_update()["Output"].startswith("High disk /data use\n")
+
+    item = _agent_item("unknown")
+    args = consul_model.ConsulTtlCheckSendArgs(check_id="disk")
+    check = consul_model.ConsulTtlCheckItem.from_agent_item(item, args)
+    assert (check.check_id, check.status) == ("disk", "critical")
+
+
+def test_ttl_check_push_on_change(allow_requests, monkeypatch, tmp_path):
+    with helpers.http_stand_in() as httpd:
+        args = consul_model.ConsulTtlCheckSendArgs(
+            http_addr=httpd.url, token="secret", state_file=tmp_path / "state.json"
+        )
+        consul_io.ttl_check_output(args, _agent_item("critical"))
+        consul_io.ttl_check_output(args, _agent_item("critical"))
+        consul_io.ttl_check_output(args, _agent_item("passing"))
+
+        # an unchanged status is pushed again before the TTL expires
+        monkeypatch.setattr(consul_op, "CONSUL_TTL_REFRESH", 0.0)
+        consul_io.ttl_check_output(args, _agent_item("passing"))
+
+    update_path = "/v1/agent/check/update/server-monitor-agent-disk-data"
+    sent = _requests(httpd)
+    assert [(i[0], i[1]) for i in sent] == [
+        ("PUT", "/v1/agent/check/register"),
+        ("PUT", update_path),
+        ("PUT", update_path),
+        ("PUT", update_path),
+    ]
+    assert [i[2]["Status"] for i in sent[1:]] == ["critical", "passing", "passing"]
+    assert all(i["headers"]["X-Consul-Token"] == "secret" for i in httpd.received)
+
+
+def test_ttl_check_register_unknown(allow_requests, tmp_path):
+    state_file = tmp_path / "state.json"
+    unknown = b"Unknown check ID 'server-monitor-agent-disk-data'"
+    with helpers.http_stand_in([(200, {}, b""), (500, {}, unknown)]) as httpd:
+        args = consul_model.ConsulTtlCheckSendArgs(
+            http_addr=httpd.url, state_file=state_file
+        )
+        consul_io.ttl_check_output(args, _agent_item("warning"))
+
+        # the consul agent lost the check, so it is registered again
+        httpd.responses = [(404, {}, b"")]
+        consul_io.ttl_check_output(args, _agent_item("critical"))
+
+    paths = [i[1].split("/")[-1] for i in _requests(httpd)]
+    assert paths == [
+        "register",
+        "server-monitor-agent-disk-data",
+        "register",
+        "server-monitor-agent-disk-data",
+        "server-monitor-agent-disk-data",
+        "register",
+        "server-monitor-agent-disk-data",
+    ]
+    state = json.loads(state_file.read_text())
+    assert [i["status"] for i in state.values()] == ["critical"]
+
+
+def test_consul_ttl_check_cli(allow_requests, tmp_path):
+    path = tmp_path / "item.json"
+    path.write_text(json.dumps(_agent_item().to_dict()))
+
+    from server_monitor_agent.agent import command as agent_command
+
+    with helpers.http_stand_in() as httpd:
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(
+            agent_command.cli,
+            [
+                "file-input",
+                "-p",
+                str(path),
+                "consul-ttl-check",
+                "-a",
+                httpd.url,
+                "-i",
+                "disk",
+                "-l",
+                "120",
+                "-s",
+                str(tmp_path / "state.json"),
+            ],
+        )
+
+    assert result.exit_code == 0, result.stderr
+    register, update = _requests(httpd)
+    assert register[2]["TTL"] == "120s"
+    assert update[1] == "/v1/agent/check/update/disk"
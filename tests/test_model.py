@@ -0,0 +1,75 @@
+import copy
+import dataclasses
+import datetime
+import json
+import pickle
+
+import pytest
+from beartype import roar
+
+from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.service.systemd import model as systemd_model
+
+
+def _agent_item(**kwargs) -> agent_model.AgentItem:
+    raw = {
+        "summary": "High disk /data use",
+        "description": "High disk /data use of 95.0% (threshold 80.0%).",
+        "host_name": "test-instance.example.com",
+        "source_name": "server",
+        "check_name": "disk",
+        "date": "2024-05-01T10:30:00+00:00",
+        "status_name": "critical",
+        "service_name": "/data",
+        **kwargs,
+    }
+    # parse the json, so each item has its own copy of the text
+    return agent_model.AgentItem.from_dict(json.loads(json.dumps(raw)))
+
+
+def test_slotted_models():
+    item = _agent_item()
+    result = systemd_model.JournalCtlResult(exit_code=0, name="docker.service")
+
+    for value in [item, result]:
+        assert not hasattr(value, "__dict__")
+        with pytest.raises(AttributeError):
+            value.not_a_field = 1
+
+    assert copy.deepcopy(item) == item
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert dataclasses.replace(item, status_name="passing").status_name == "passing"
+    assert agent_model.AgentItem.from_dict(item.to_dict()) == item
+
+    with pytest.raises(roar.BeartypeCallHintParamViolation):
+        systemd_model.JournalCtlResult(exit_code="0", name="docker.service")
+
+
+def test_interned_fields():
+    first = _agent_item()
+    second = _agent_item(description="Other text")
+
+    assert first.host_name is second.host_name
+    assert first.status_name is second.status_name
+    assert first.description is not second.description
+
+
+def test_json_encode_decode():
+    from server_monitor_agent.agent import convert as agent_convert
+
+    extra = {"checks": [{"node": "node1", "status": "passing"}]}
+    items = [_agent_item(extra_data=extra), _agent_item(status_name="passing")]
+    data_type = agent_model.AgentItem.data_type_name()
+
+    content = agent_convert.to_json_bytes(items[0])
+    assert json.loads(content) == items[0].to_dict()
+    assert items[0].to_dict(deep=False)["extra_data"] is items[0].extra_data
+    assert items[0].to_dict()["extra_data"] is not items[0].extra_data
+    assert agent_convert.from_json(content, data_type) == items[0]
+
+    lines = agent_convert.to_ndjson_bytes(items)
+    assert lines.count(b"\n") == 2
+    assert agent_convert.from_ndjson(lines, data_type) == items
+
+    with pytest.raises(ValueError, match="Expected a json object"):
+        agent_convert.from_json("[]", data_type)
@@ -0,0 +1,155 @@
+import json
+import socket
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.service.network import (
+    model as network_model,
+    operation as network_op,
+)
+from tests import helpers
+
+
+@pytest.fixture()
+def tcp_listener():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(128)
+
+    def accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            conn.close()
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    yield server.getsockname()[1]
+    server.shutdown(socket.SHUT_RDWR)
+    server.close()
+    thread.join(timeout=5)
+
+
+@pytest.fixture()
+def closed_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+        server.bind(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+    return port
+
+
+def test_probe_tcp(tcp_listener, closed_port):
+    targets = [
+        network_model.ProbeTargetEntry.from_tcp(f"127.0.0.1:{tcp_listener}"),
+        network_model.ProbeTargetEntry.from_tcp(f"127.0.0.1:{closed_port}"),
+    ]
+    open_result, closed_result = network_op.probe(targets, count=5, timeout=1.0)
+
+    assert open_result.exit_code == 0
+    assert open_result.sent == 5
+    assert open_result.received == 5
+    assert open_result.loss == 0
+    assert open_result.rtt_min <= open_result.rtt_avg <= open_result.rtt_max
+    assert open_result.error is None
+
+    assert closed_result.exit_code == 2
+    assert closed_result.received == 0
+    assert closed_result.loss == 1
+    assert closed_result.rtt_avg is None
+    assert closed_result.error
+
+
+def test_probe_tcp_many(tcp_listener):
+    targets = [
+        network_model.ProbeTargetEntry.from_tcp(f"127.0.0.1:{tcp_listener}")
+        for _ in range(100)
+    ]
+    results = network_op.probe(targets, count=2, timeout=2.0, concurrency=64)
+    assert len(results) == 100
+    assert all(i.received == 2 for i in results)
+
+
+def test_probe_icmp():
+    if not network_op.icmp_available():
+        pytest.skip("Unprivileged ICMP is not allowed on this system.")
+
+    target = network_model.ProbeTargetEntry.from_icmp("127.0.0.1")
+    (result,) = network_op.probe([target], count=2, timeout=1.0)
+    assert result.received == 2
+    assert result.rtt_avg is not None
+
+
+def test_tcp_target_parse():
+    assert network_model.ProbeTargetEntry.from_tcp("[::1]:5432").host == "::1"
+    with pytest.raises(ValueError, match="must be 'host:port'"):
+        network_model.ProbeTargetEntry.from_tcp("db.example.com")
+
+
+def test_reachability_cli(tcp_listener, closed_port, mocker):
+    mocker.patch(
+        "server_monitor_agent.agent.operation.execute_process",
+        side_effect=helpers.execute_process_side_effect,
+    )
+    mocker.patch("socket.getfqdn", return_value="test-instance.example.com")
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            "reachability",
+            "--tcp",
+            f"127.0.0.1:{tcp_listener}",
+            "--tcp",
+            f"127.0.0.1:{closed_port}",
+            "--timeout",
+            "1",
+            "stream-output",
+        ],
+    )
+
+    assert result.exit_code == 0, result.stderr
+    data = json.loads(result.stdout)
+    assert data["status_name"] == "critical"
+    assert data["summary"] == "Targets unreachable"
+    assert (
+        data["extra_data"]["targets"][f"tcp://127.0.0.1:{tcp_listener}"]["received"]
+        == 3
+    )
+
+    result = runner.invoke(
+        agent_command.cli,
+        ["reachability", "--tcp", f"127.0.0.1:{tcp_listener}", "--timeout", "0"],
+    )
+    assert result.exit_code == 2
+    assert "Invalid value for '-w' / '--timeout'" in result.stderr
+
+    # invalid or missing targets are usage errors
+    result = runner.invoke(
+        agent_command.cli, ["reachability", "--tcp", "db.example.com", "stream-output"]
+    )
+    assert result.exit_code == 2
+    assert "Invalid value for '-t' / '--tcp'" in result.stderr
+    assert "must be 'host:port'" in result.stderr
+
+    result = runner.invoke(agent_command.cli, ["reachability", "stream-output"])
+    assert result.exit_code == 2
+    assert "Must specify at least one --tcp or --icmp target." in result.stderr
+
+
+def test_statuscake_ping_host_default(mocker):
+    from server_monitor_agent.service.statuscake import (
+        model as sc_model,
+        operation as sc_op,
+    )
+
+    # no host is pinged unless one is given
+    probe = mocker.patch("server_monitor_agent.service.network.operation.probe")
+    assert sc_model.StatusCakeCollectArgs().ping_host is None
+    assert sc_op.ping(None) == ""
+    probe.assert_not_called()
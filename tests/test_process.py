@@ -0,0 +1,221 @@
+import contextlib
+import contextvars
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from server_monitor_agent.agent import operation as agent_op
+
+
+def _python(code: str):
+    return [sys.executable, "-c", code]
+
+
+def test_process_shared_in_run():
+    runner = agent_op.ProcessRunner(limit=2)
+    args = _python("import time; time.sleep(0.3); print('done')")
+
+    with runner.run():
+        # threads are in the run when they run in a copy of the context
+        threads = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(runner.execute, args, 10.0),
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        result = runner.execute(args, 10.0)
+
+    assert result.stdout == "done\n"
+    assert [i.shared for i in runner.records].count(False) == 1
+    assert len(runner.records) == 4
+    assert all(i.exit_code == 0 for i in runner.records)
+
+    # after the run, the process runs again
+    runner.execute(args, 10.0)
+    assert [i.shared for i in runner.records].count(False) == 2
+
+
+def test_process_overlapping_runs(tmp_path):
+    runner = agent_op.ProcessRunner()
+    counter = tmp_path / "counter"
+    args = _python(
+        f"import pathlib; p = pathlib.Path({str(counter)!r}); "
+        "p.open('a').write('x'); print(len(p.read_text()))"
+    )
+    first_started = threading.Event()
+    second_done = threading.Event()
+    outputs = {}
+
+    def first_run():
+        with runner.run():
+            outputs["first"] = runner.execute(args, 10.0).stdout
+            first_started.set()
+            second_done.wait(10.0)
+            # still in the first run, so the first result is shared
+            outputs["first again"] = runner.execute(args, 10.0).stdout
+            outputs["first records"] = len(runner.records)
+
+    def second_run():
+        first_started.wait(10.0)
+        with runner.run():
+            with runner.run():
+                outputs["second"] = runner.execute(args, 10.0).stdout
+            outputs["second again"] = runner.execute(args, 10.0).stdout
+        second_done.set()
+
+    threads = [threading.Thread(target=first_run), threading.Thread(target=second_run)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # a run that overlaps another run does not get the other run's result
+    assert outputs == {
+        "first": "1\n",
+        "second": "2\n",
+        "second again": "2\n",
+        "first again": "1\n",
+        "first records": 2,
+    }
+
+
+def test_execute_processes_in_run(monkeypatch):
+    calls = []
+
+    def execute(args, deadline, timeout):
+        calls.append(args)
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    runner = agent_op.ProcessRunner()
+    monkeypatch.setattr(agent_op, "_process_runner", runner)
+    monkeypatch.setattr(runner, "_execute", execute)
+
+    # the worker threads share the results of the run
+    with agent_op.process_run():
+        agent_op.execute_process(["a"])
+        agent_op.execute_processes([["a"], ["b"]])
+    assert calls == [["a"], ["b"]]
+
+
+def test_process_timeout():
+    runner = agent_op.ProcessRunner(limit=1)
+    args = _python("import time; time.sleep(5)")
+
+    with pytest.raises(ValueError, match="Timed out after 0.2s"):
+        runner.execute(args, 0.2)
+
+    record = runner.records[-1]
+    assert record.timed_out is True
+    assert record.exit_code is None
+
+
+def test_process_limit():
+    runner = agent_op.ProcessRunner(limit=1)
+    slow = threading.Thread(
+        target=runner.execute, args=(_python("import time; time.sleep(1)"), 10.0)
+    )
+    slow.start()
+    try:
+        # waiting for a free slot counts towards the timeout
+        with pytest.raises(ValueError, match="Timed out"):
+            runner.execute(_python("print('waiting')"), 0.2)
+    finally:
+        slow.join()
+
+    assert runner.execute(_python("print('next')"), 10.0).stdout == "next\n"
+
+
+def test_process_not_found():
+    runner = agent_op.ProcessRunner()
+    with pytest.raises(ValueError, match="Error running 'not-a-real-command-name'"):
+        runner.execute(["not-a-real-command-name"], 1.0)
+
+
+def test_stream_process_caps():
+    runner = agent_op.ProcessRunner()
+    code = (
+        "import sys\n"
+        "for i in range(100000): print(i)\n"
+        "print('x' * 100000, file=sys.stderr)"
+    )
+
+    with runner.stream(_python(code), 10.0, max_lines=5) as stream:
+        lines = list(stream)
+    assert lines == ["0\n", "1\n", "2\n", "3\n", "4\n"]
+    assert stream.truncated is True
+    assert stream.returncode != 0
+
+    with runner.stream(_python(code), 10.0, max_bytes=1000, chunks=True) as stream:
+        chunks = list(stream)
+    assert sum(len(i) for i in chunks) <= 1000
+    assert stream.truncated is True
+
+    with runner.stream(_python(code), 10.0) as stream:
+        assert sum(1 for _ in stream) == 100000
+    assert stream.truncated is False
+    assert stream.returncode == 0
+    assert len(stream.stderr) == agent_op.PROCESS_STDERR_BYTES
+
+
+def test_stream_process_timeout():
+    runner = agent_op.ProcessRunner()
+    with pytest.raises(ValueError, match="Timed out after 0.2s"):
+        with runner.stream(_python("import time; time.sleep(5)"), 0.2) as stream:
+            list(stream)
+    assert runner.records[-1].timed_out is True
+
+
+def test_systemctl_show_shared_and_truncated(monkeypatch):
+    from server_monitor_agent.service.systemd import operation as systemd_op
+
+    calls = []
+
+    @contextlib.contextmanager
+    def stream_process(args, max_bytes=None):
+        calls.append(args)
+        output = "Id=docker.service\nResult=success\n"
+        stream = agent_op.ProcessStream.from_result(
+            subprocess.CompletedProcess(args, -9, output, "")
+        )
+        stream.truncated = True
+        yield stream
+
+    monkeypatch.setattr(agent_op, "stream_process", stream_process)
+    monkeypatch.setattr(agent_op, "_process_runner", agent_op.ProcessRunner())
+
+    # the parsed result is shared in the run
+    with agent_op.process_run():
+        result = systemd_op.systemctl_show("docker")
+        assert systemd_op.systemctl_show("docker") is result
+    assert len(calls) == 1
+
+    # output that is over the limit is not a success
+    assert result.exit_code == -9
+    assert result.truncated is True
+    assert result.identifier == "docker.service"
+
+    systemd_op.systemctl_show("docker")
+    assert len(calls) == 2
+
+
+def test_journal_entries():
+    from server_monitor_agent.service.systemd import operation as systemd_op
+
+    lines = [
+        "{\n",
+        '\t"MESSAGE" : "Started Docker",\n',
+        '\t"__REALTIME_TIMESTAMP" : "1657541038550955"\n',
+        "}\n",
+        '{"MESSAGE": "Stopped Docker"}\n',
+    ]
+    assert [i["MESSAGE"] for i in systemd_op.journal_entries(lines)] == [
+        "Started Docker",
+        "Stopped Docker",
+    ]
@@ -0,0 +1,105 @@
+import datetime
+import json
+
+import requests
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    profile as agent_profile,
+    registry as agent_registry,
+)
+from tests import helpers
+
+
+def _names(span):
+    yield span["name"]
+    for child in span["children"]:
+        yield from _names(child)
+
+
+def test_span_disabled():
+    assert agent_profile.span("collect") is agent_profile.span("send")
+    assert agent_profile.disable() is None
+
+
+def test_span_tree():
+    original = requests.Session.send
+    profile = agent_profile.enable()
+    try:
+        with agent_profile.span("collect", "cpu_input"):
+            for _ in range(3):
+                with agent_profile.span("process", "systemctl"):
+                    pass
+        with agent_profile.span("send"):
+            pass
+    finally:
+        assert agent_profile.disable() is profile
+    assert requests.Session.send is original
+
+    collect = [i for i in profile.root.children if i.name == "collect"][0]
+    assert [i.name for i in collect.children] == ["process"] * 3
+    assert profile.root.duration >= collect.duration
+
+    text = agent_profile.report_text(profile.root)
+    assert "  collect cpu_input" in text
+    assert "    process systemctl x3" in text
+
+
+def test_http_span(allow_requests):
+    with helpers.http_stand_in() as httpd:
+        profile = agent_profile.enable()
+        try:
+            with agent_profile.span("send"):
+                agent_op.http_session().post(httpd.url, json={}, timeout=5)
+        finally:
+            agent_profile.disable()
+
+        # requests are only timed while profiling
+        agent_op.http_session().post(httpd.url, json={}, timeout=5)
+
+    send = [i for i in profile.root.children if i.name == "send"][0]
+    assert [(i.name, i.detail) for i in send.children] == [
+        ("http", f"POST {httpd.url[len('http://'):]}")
+    ]
+    assert send.children[0].duration <= send.duration
+
+
+def test_profile_cli(tmp_path):
+    path = tmp_path / "item.json"
+    item = agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name="critical",
+        service_name="/data",
+        extra_data={},
+    )
+    path.write_text(json.dumps(item.to_dict()))
+    report = tmp_path / "profile.json"
+
+    from server_monitor_agent.agent import command as agent_command
+
+    # the io modules are imported once per process
+    agent_registry.SourceTargetIORegistry.clear()
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            "--profile-file",
+            str(report),
+            "file-input",
+            "-p",
+            str(path),
+            "stream-output",
+        ],
+    )
+
+    assert result.exit_code == 0, result.stderr
+    assert "collect file_input" in result.stderr
+    names = set(_names(json.loads(report.read_text())))
+    assert {"total", "gather", "collect", "convert", "send", "flush"} <= names
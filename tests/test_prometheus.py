@@ -0,0 +1,156 @@
+import datetime
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import model as agent_model
+from server_monitor_agent.service.prometheus import operation as prom_op
+
+
+def _agent_item(
+    check: str = "memory", service: str = "memory", status: str = "warning", **extra
+) -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary=f"High {check} use",
+        description=f"High {check} use.",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name=check,
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name=status,
+        service_name=service,
+        extra_data=extra,
+    )
+
+
+def test_item_samples():
+    item = _agent_item(
+        percentage=81.5,
+        total="16000000",
+        free="1.2G",
+        active_state="failed",
+        targets={"tcp://db:5432": {"received": 3, "rtt_avg": None}},
+    )
+    lines = [prom_op.sample_line(i) for i in prom_op.item_samples(item)]
+    labels = (
+        'check="memory",host="test-instance.example.com",'
+        'service="memory",source="server"'
+    )
+    assert lines == [
+        f"server_monitor_agent_status{{{labels}}} 1",
+        f"server_monitor_agent_last_run_timestamp_seconds{{{labels}}} 1714559400",
+        f"server_monitor_agent_memory_percentage{{{labels}}} 81.5",
+        f"server_monitor_agent_memory_total{{{labels}}} 16000000",
+        f'server_monitor_agent_memory_active_state{{{labels},value="failed"}} 1',
+        "server_monitor_agent_memory_targets_received"
+        '{check="memory",host="test-instance.example.com",key="tcp://db:5432",'
+        'service="memory",source="server"} 3',
+    ]
+
+
+def test_textfile_keeps_other_checks(tmp_path):
+    path = tmp_path / "agent.prom"
+    prom_op.write_textfile(path, _agent_item(percentage=81.5))
+    prom_op.write_textfile(path, _agent_item("disk", "/data", usage=0.5))
+    prom_op.write_textfile(path, _agent_item(status="passing", percentage=20.0))
+
+    content = path.read_text()
+    assert content.count("# TYPE server_monitor_agent_status gauge") == 1
+    assert "server_monitor_agent_memory_percentage{" in content
+    assert " 81.5\n" not in content
+    assert 'server_monitor_agent_disk_usage{check="disk"' in content
+    assert sorted(i.name for i in tmp_path.iterdir()) == [
+        ".agent.prom.lock",
+        "agent.prom",
+    ]
+
+
+def test_serve_metrics():
+    registry = prom_op.MetricRegistry()
+    registry.update(_agent_item(percentage=81.5))
+    httpd = prom_op.start_metrics_server("127.0.0.1", 0, registry)
+    url = f"http://127.0.0.1:{httpd.server_port}"
+    try:
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            content = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain")
+        with pytest.raises(urllib.error.HTTPError, match="404"):
+            urllib.request.urlopen(f"{url}/")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert content == registry.render()
+    assert "server_monitor_agent_memory_percentage{" in content
+
+
+def test_serve_metrics_cli(tmp_path, monkeypatch):
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item(percentage=81.5).to_dict()))
+    monkeypatch.setattr(prom_op, "_metrics_registry", None)
+
+    servers = []
+    start_metrics_server = prom_op.start_metrics_server
+
+    def start(host, port):
+        servers.append(start_metrics_server("127.0.0.1", 0))
+        return servers[-1]
+
+    contents = []
+
+    def run_once(interval, func):
+        func()
+        url = f"http://127.0.0.1:{servers[0].server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            contents.append(response.read().decode())
+
+    monkeypatch.setattr(prom_op, "start_metrics_server", start)
+    monkeypatch.setattr(prom_op, "run_every", run_once)
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        ["file-input", "-p", str(source), "serve-metrics", "-p", "0"],
+    )
+    servers[0].server_close()
+
+    # each run of the check updates the metrics that are served
+    assert result.exit_code == 0, result.stderr
+    assert "server_monitor_agent_memory_percentage{" in contents[0]
+
+
+def test_run_every():
+    stop = threading.Event()
+    calls = []
+
+    def run():
+        calls.append(1)
+        if len(calls) == 3:
+            stop.set()
+        raise ValueError("collect failed")
+
+    prom_op.run_every(0.0, run, stop)
+    assert len(calls) == 3
+
+
+def test_textfile_cli(tmp_path):
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item(percentage=81.5).to_dict()))
+    target = tmp_path / "agent.prom"
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        ["file-input", "-p", str(source), "prometheus-textfile", "-p", str(target)],
+    )
+
+    assert result.exit_code == 0, result.stderr
+    assert "server_monitor_agent_status{" in target.read_text()
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from server_monitor_agent.agent import (
+    command as agent_command,
+    config as agent_config,
+    model as agent_model,
+    resources as agent_resources,
+)
+
+
+def test_read_settings():
+    settings = agent_resources.read_settings(
+        {
+            "nice": 10,
+            "io_class": "best-effort",
+            "io_level": 7,
+            "cgroup": "/server-monitor-agent/",
+            "cpu_max": 0.5,
+            "memory_max": "256M",
+            "rss_max": 209715200,
+        }
+    )
+    assert settings == agent_model.ResourceSettings(
+        nice=10,
+        io_class="best-effort",
+        io_level=7,
+        cgroup="server-monitor-agent",
+        cpu_max=0.5,
+        memory_max=256 * 1024**2,
+        rss_max=209715200,
+    )
+    assert agent_resources.parse_size("1GiB") == 1024**3
+
+    invalid = {
+        "nice": ({"nice": 40}, "'nice' must be from -20 to 19"),
+        "io_class": ({"io_class": "realtime"}, "invalid 'io_class'"),
+        "size": ({"memory_max": "lots"}, "Invalid size 'lots'"),
+        "unknown": ({"cpu": 1}, "Unrecognised name: 'cpu'"),
+    }
+    for raw, message in invalid.values():
+        with pytest.raises(ValueError, match=message):
+            agent_resources.read_settings(raw)
+
+
+def test_config_resources():
+    config = agent_config.normalise(
+        {"resources": {"nice": "5"}, "memory": {"threshold": 50}},
+        agent_command.cli,
+    )
+    assert config["resources"]["nice"] == 5
+    assert config["memory"] == {"threshold": 50}
+
+
+def test_join_cgroup(tmp_path):
+    assert not agent_resources.join_cgroup("agent", root=tmp_path)
+
+    (tmp_path / "cgroup.controllers").write_text("cpu io memory pids")
+    (tmp_path / "cgroup.subtree_control").write_text("")
+    assert agent_resources.join_cgroup(
+        "agent", cpu_max=0.25, memory_max=1024, root=tmp_path
+    )
+
+    # the controllers are enabled for the children of the parent group
+    assert (tmp_path / "cgroup.subtree_control").read_text() == "+cpu +memory"
+    assert (tmp_path / "agent" / "cpu.max").read_text() == "25000 100000"
+    assert (tmp_path / "agent" / "memory.max").read_text() == "1024"
+    assert (tmp_path / "agent" / "cgroup.procs").read_text() == str(os.getpid())
+
+
+def test_join_cgroup_without_controllers(tmp_path, capsys):
+    # the cpu controller is not available, and memory is already enabled
+    (tmp_path / "cgroup.controllers").write_text("memory pids")
+    (tmp_path / "cgroup.subtree_control").write_text("memory")
+    assert agent_resources.join_cgroup(
+        "agent", cpu_max=0.25, memory_max=1024, root=tmp_path
+    )
+
+    assert (tmp_path / "cgroup.subtree_control").read_text() == "memory"
+    assert not (tmp_path / "agent" / "cpu.max").exists()
+    assert (tmp_path / "agent" / "memory.max").read_text() == "1024"
+    assert "the 'cpu' controller is not enabled" in capsys.readouterr().err
+
+
+def test_set_nice():
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+    agent_resources.set_nice(current)
+    assert os.getpriority(os.PRIO_PROCESS, 0) == current
+
+
+def test_rss_watchdog():
+    now = [0.0]
+    actions = []
+
+    watchdog = agent_resources.RssWatchdog(1000, clock=lambda: now[0])
+    watchdog.rss = lambda: 2000
+    watchdog.interrupt = lambda: actions.append("interrupt")
+    watchdog.end = lambda: actions.append("end")
+
+    watchdog.check()
+    assert actions == ["interrupt"]
+
+    now[0] = agent_resources.RSS_GRACE
+    watchdog.check()
+    assert actions == ["interrupt", "end"]
+
+    # memory use back under the limit resets the watchdog
+    watchdog.rss = lambda: 500
+    watchdog.check()
+    assert watchdog.exceeded_at is None
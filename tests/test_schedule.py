@@ -0,0 +1,196 @@
+import datetime
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import (
+    convert as agent_convert,
+    model as agent_model,
+    schedule as agent_schedule,
+)
+
+
+def _check(name: str, interval: float, jitter: float = 0.0):
+    return agent_model.ScheduleCheck(
+        name=name, args=[name, "stream-output"], interval=interval, jitter=jitter
+    )
+
+
+def test_read_manifest(tmp_path):
+    path = tmp_path / "manifest.yml"
+    path.write_text(
+        "max_concurrent: 2\n"
+        "checks:\n"
+        "  - {name: cpu, interval: 60, args: [cpu, stream-output]}\n"
+        "  - {name: disk, interval: 300, jitter: 500, args: [disk, stream-output]}\n"
+    )
+    manifest = agent_schedule.read_manifest(path)
+    assert manifest.max_concurrent == 2
+    assert [(i.name, i.interval, i.jitter) for i in manifest.checks] == [
+        ("cpu", 60.0, 15.0),
+        ("disk", 300.0, 300.0),
+    ]
+
+    invalid = {
+        "checks: {}": "must have a list of 'checks'",
+        "checks: [{name: a, interval: 0, args: [cpu]}]": "must have an 'interval'",
+        "checks: [{name: a, interval: 5}]": "must have a list of 'args'",
+        "checks: [{name: a, interval: 5, args: [schedule]}]": "cannot run 'schedule'",
+        "checks: [{name: a, interval: 5, args: [--debug, cpu]}]": "collect command",
+        (
+            "checks: [{interval: 5, args: [cpu]}, "
+            "{name: check-0, interval: 5, args: [cpu]}]"
+        ): "used more than once",
+    }
+    for content, message in invalid.items():
+        path.write_text(content)
+        with pytest.raises(ValueError, match=message):
+            agent_schedule.read_manifest(path)
+
+
+def test_jitter_offset():
+    check = _check("cpu", 60.0, 15.0)
+    offset = agent_schedule.jitter_offset("host1", check)
+    assert 0 <= offset < 15.0
+    assert agent_schedule.jitter_offset("host1", check) == offset
+    assert agent_schedule.jitter_offset("host2", check) != offset
+    assert agent_schedule.jitter_offset("host1", _check("disk", 60.0, 15.0)) != offset
+    assert agent_schedule.jitter_offset("host1", _check("cpu", 60.0)) == 0
+
+
+def test_scheduler_due():
+    manifest = agent_model.ScheduleManifest(
+        checks=[_check("cpu", 10.0), _check("disk", 30.0)], max_concurrent=1
+    )
+    scheduler = agent_schedule.Scheduler(manifest, lambda check: None, host="host1")
+    scheduler.start(100.0)
+
+    assert [i.name for i in scheduler.due(100.0)] == ["cpu", "disk"]
+    assert scheduler.next_time() == 110.0
+
+    # cpu is still running, so it is skipped
+    assert [i.name for i in scheduler.due(110.0)] == []
+    assert scheduler.counts[agent_schedule.STATUS_SKIPPED] == 1
+
+    scheduler.execute(manifest.checks[0])
+    assert scheduler.counts[agent_schedule.STATUS_STARTED] == 1
+
+    # missed runs are not caught up
+    assert [i.name for i in scheduler.due(155.0)] == ["cpu"]
+    assert scheduler.next_time() == 160.0
+
+
+def test_scheduler_failure():
+    def run(check):
+        raise ValueError("Could not run.")
+
+    manifest = agent_model.ScheduleManifest(checks=[_check("cpu", 10.0)])
+    scheduler = agent_schedule.Scheduler(manifest, run, host="host1")
+    scheduler.start(0.0)
+    for check in scheduler.due(0.0):
+        scheduler.execute(check)
+    assert scheduler.counts[agent_schedule.STATUS_FAILED] == 1
+    assert [i.name for i in scheduler.due(10.0)] == ["cpu"]
+
+
+def _agent_item() -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name="critical",
+        service_name="/data",
+        extra_data={},
+    )
+
+
+def test_schedule_cli(tmp_path):
+    item = _agent_item()
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(item.to_dict()))
+    target = tmp_path / "items.ndjson"
+    manifest = tmp_path / "manifest.yml"
+    args = ["file-input", "-p", str(source), "file-output", "-p", str(target)]
+    manifest.write_text(
+        json.dumps(
+            {
+                "checks": [
+                    {
+                        "name": "file",
+                        "interval": 0.2,
+                        "jitter": 0,
+                        "args": [*args, "-e", "ndjson"],
+                    }
+                ]
+            }
+        )
+    )
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        ["schedule", "--manifest", str(manifest), "--duration", "0.5"],
+    )
+    assert result.exit_code == 0, result.stderr
+    items = agent_convert.from_ndjson(target.read_text(), "agent-item")
+    assert 1 <= len(items) <= 3
+    assert items[0] == item
+
+    manifest.write_text("checks: []\nmax_concurrent: 0\n")
+    result = runner.invoke(agent_command.cli, ["schedule", "-m", str(manifest)])
+    assert result.exit_code == 2
+    assert "'max_concurrent' must be at least 1" in result.stderr
+
+
+def test_schedule_cli_sets_up_once(tmp_path, monkeypatch):
+    from server_monitor_agent.agent import command as agent_command
+    from server_monitor_agent.agent import resources as agent_resources
+
+    applied = []
+    monkeypatch.setattr(agent_resources, "apply", applied.append)
+    config = tmp_path / "config.yml"
+    config.write_text("resources: {nice: 5}\n")
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item().to_dict()))
+    target = tmp_path / "items.ndjson"
+    args = ["file-input", "-p", str(source), "file-output", "-p", str(target)]
+    manifest = tmp_path / "manifest.yml"
+    manifest.write_text(
+        json.dumps(
+            {
+                "checks": [
+                    {
+                        "name": "file",
+                        "interval": 0.1,
+                        "jitter": 0,
+                        "args": [*args, "-e", "ndjson"],
+                    }
+                ]
+            }
+        )
+    )
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            "--config",
+            str(config),
+            "schedule",
+            "-m",
+            str(manifest),
+            "--duration",
+            "0.35",
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+
+    # the checks run in the scheduler, so the resources are applied once
+    assert len(agent_convert.from_ndjson(target.read_text(), "agent-item")) >= 2
+    assert len(applied) == 1
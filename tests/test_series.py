@@ -0,0 +1,100 @@
+import json
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import series as agent_series
+from server_monitor_agent.service.server import (
+    model as server_model,
+    operation as server_op,
+)
+
+
+def test_series_statistics(tmp_path):
+    path = tmp_path / "cpu.series"
+    with agent_series.open_series(path, capacity=8) as series:
+        for at, value in enumerate([0.9, 0.1, 0.2, 0.3, 0.4, 0.5]):
+            series.append(value, at=100.0 + at * 60)
+        now = 100.0 + 5 * 60
+
+        # the window has the samples from the last 3 minutes, inclusive
+        assert series.statistic("mean", 180.0, now=now) == pytest.approx(0.35)
+        assert series.statistic("max", 180.0, now=now) == 0.5
+        assert series.statistic("max", 600.0, now=now) == 0.9
+        assert series.statistic("p50", 600.0, now=now) == 0.3
+        assert series.statistic("p90", 600.0, now=now) == 0.9
+        assert series.statistic("mean", 60.0, now=now + 600) is None
+
+        with pytest.raises(ValueError, match="Unrecognised statistic: 'p42'"):
+            series.statistic("p42", 60.0, now=now)
+
+    # the samples are kept between runs, and the oldest are replaced
+    with agent_series.open_series(path, capacity=8) as series:
+        assert len(series) == 6
+        for at in range(6, 10):
+            series.append(0.0, at=100.0 + at * 60)
+        assert len(series) == 8
+        assert series.statistic("max", 3600.0, now=100.0 + 9 * 60) == 0.5
+
+
+def test_series_reset(tmp_path):
+    path = tmp_path / "cpu.series"
+    with agent_series.open_series(path, capacity=8) as series:
+        series.append(0.9, at=500.0)
+        series.append(0.8, at=560.0)
+
+        # a clock that has gone backwards clears the series
+        series.append(0.1, at=20.0)
+        assert len(series) == 1
+        assert series.statistic("max", 600.0, now=20.0) == 0.1
+
+    # a different capacity clears the series
+    with agent_series.open_series(path, capacity=4) as series:
+        assert len(series) == 0
+
+
+def test_windowed(tmp_path):
+    path = tmp_path / "memory.series"
+    assert agent_series.windowed("memory", 0.5, None, "max", path=path) == 0.5
+    assert not path.exists()
+
+    now = time.monotonic()
+    with agent_series.open_series(path) as series:
+        series.append(0.9, at=now - 120)
+    assert agent_series.windowed("memory", 0.5, 5.0, "max", path=path) == 0.9
+    assert agent_series.windowed("memory", 0.5, 1.0, "max", path=path) == 0.5
+
+    assert agent_series.describe(5.0, "p90") == "p90 over 5 minutes, "
+    assert agent_series.describe(None, "p90") == ""
+
+
+def test_windowed_cli(tmp_path, monkeypatch, methods_return_known):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    monkeypatch.setattr(
+        server_op,
+        "timezone",
+        lambda: server_model.TimeZoneResult(exit_code=0, raw="UTC"),
+    )
+    with agent_series.open_series(agent_series.series_path("memory")) as series:
+        series.append(0.95, at=time.monotonic() - 60)
+
+    from server_monitor_agent.agent import command as agent_command
+
+    target = tmp_path / "item.json"
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            *["memory", "-t", "50", "-w", "5", "-s", "max"],
+            *["file-output", "-p", str(target)],
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+
+    # the latest sample is under the threshold, but the window is not
+    item = json.loads(target.read_text())
+    assert item["status_name"] == "critical"
+    assert item["extra_data"]["percentage"] == 0.376
+    assert item["extra_data"]["value"] == 0.95
+    assert "(6.03GiB, max over 5 minutes, threshold 50.0%)" in item["description"]
@@ -0,0 +1,124 @@
+import datetime
+import json
+import pathlib
+import threading
+
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import (
+    model as agent_model,
+    operation as agent_op,
+    spool as agent_spool,
+)
+from server_monitor_agent.service.disk import model as disk_model
+
+
+def _agent_item(index: int = 1) -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary=f"High disk /data{index} use",
+        description=f"High disk /data{index} use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name="critical",
+        service_name=f"/data{index}",
+        extra_data={"usage": 0.95},
+    )
+
+
+def test_send_args_round_trip(tmp_path):
+    args = disk_model.FileOutputSendArgs(path=tmp_path / "out.json", format="agent")
+    target, values = agent_spool.encode_send_args(args)
+    assert target == "server_monitor_agent.service.disk.model:FileOutputSendArgs"
+    assert json.loads(json.dumps(values)) == values
+    assert agent_spool.decode_send_args(target, values) == args
+
+
+def test_spool_retry_then_compact(tmp_path):
+    spool = agent_spool.Spool(tmp_path / "spool", segment_bytes=1024)
+    args = disk_model.FileOutputSendArgs(path=tmp_path / "out.json", format="agent")
+    for index in range(5):
+        spool.append(args, _agent_item(index))
+    assert len(spool.segments()) > 1
+
+    def fail(send_args, item):
+        raise ValueError("target is down")
+
+    assert spool.drain(fail) == (0, 5)
+    pending = spool.pending()
+    assert len(pending) == 5
+    assert all(i.attempts == 1 and "target is down" in i.error for i in pending)
+
+    # not due yet, so nothing is tried
+    assert spool.drain(fail) == (0, 0)
+
+    sent = []
+    later = max(i.next_attempt for i in pending)
+    assert spool.drain(lambda a, i: sent.append(i.service_name), later) == (5, 0)
+
+    assert sent == [f"/data{index}" for index in range(5)]
+    assert spool.pending() == []
+    assert list((tmp_path / "spool").glob("0*")) == []
+
+
+def test_spool_batch_window_error(tmp_path):
+    spool = agent_spool.Spool(tmp_path / "spool")
+    args = disk_model.FileOutputSendArgs(path=tmp_path / "out.json", format="agent")
+    spool.append(args, _agent_item())
+
+    handled = threading.Event()
+
+    def handler(pending):
+        handled.set()
+        raise ValueError("target is down")
+
+    batch = agent_op.BatchWindow(handler, window=0.01)
+
+    def send(send_args, item):
+        batch.add(item)
+        # the window ends before the spool delivers the buffered items
+        assert handled.wait(5)
+
+    # the error from the end of the window is raised by the flush
+    assert spool.drain(send) == (0, 1)
+    assert "target is down" in spool.pending()[0].error
+    assert batch.flush() == 0
+
+
+def test_spool_ignores_partial_line(tmp_path):
+    spool = agent_spool.Spool(tmp_path)
+    args = disk_model.FileOutputSendArgs(path=tmp_path / "out.json", format="agent")
+    spool.append(args, _agent_item())
+    with spool.segments()[0].open("a") as f:
+        f.write('{"id": "partial"')
+
+    assert [i.target_args["format"] for i in spool.pending()] == ["agent"]
+
+
+def test_spool_cli(tmp_path):
+    source = tmp_path / "item.json"
+    source.write_text(json.dumps(_agent_item().to_dict()))
+    target = tmp_path / "output.json"
+    spool_dir = tmp_path / "spool"
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            "--spool-dir",
+            str(spool_dir),
+            "file-input",
+            "-p",
+            str(source),
+            "file-output",
+            "-p",
+            str(target),
+        ],
+    )
+
+    assert result.exit_code == 0, result.stderr
+    assert json.loads(target.read_text())["summary"] == "High disk /data1 use"
+    assert agent_spool.Spool(pathlib.Path(spool_dir)).pending() == []
@@ -0,0 +1,78 @@
+import dataclasses
+import types
+
+import pytest
+from beartype import roar
+
+from server_monitor_agent.agent import validate as agent_validate
+
+
+def test_get_policy(monkeypatch):
+    monkeypatch.setenv(agent_validate.ENV_NAME, " None ")
+    assert agent_validate.get_policy() == agent_validate.POLICY_NONE
+
+    # the default depends on the python development mode, which tox turns on
+    monkeypatch.delenv(agent_validate.ENV_NAME)
+    monkeypatch.setattr(
+        agent_validate.sys, "flags", types.SimpleNamespace(dev_mode=False)
+    )
+    assert agent_validate.get_policy() == agent_validate.POLICY_BOUNDARY
+    monkeypatch.setattr(
+        agent_validate.sys, "flags", types.SimpleNamespace(dev_mode=True)
+    )
+    assert agent_validate.get_policy() == agent_validate.POLICY_ALL
+
+    monkeypatch.setenv(agent_validate.ENV_NAME, "some")
+    with pytest.raises(ValueError, match="Invalid SERVER_MONITOR_AGENT_VALIDATE"):
+        agent_validate.get_policy()
+
+
+@pytest.mark.parametrize(
+    "policy,internal,boundary",
+    [
+        (agent_validate.POLICY_ALL, True, True),
+        (agent_validate.POLICY_BOUNDARY, False, True),
+        (agent_validate.POLICY_NONE, False, False),
+    ],
+)
+def test_checked(monkeypatch, policy, internal, boundary):
+    monkeypatch.setattr(agent_validate, "policy", policy)
+
+    @agent_validate.checked
+    @dataclasses.dataclass
+    class Result:
+        exit_code: int
+
+    @agent_validate.checked(boundary=True)
+    def collect(args: str) -> str:
+        return args
+
+    def is_checked(func, *args) -> bool:
+        try:
+            func(*args)
+        except roar.BeartypeCallHintViolation:
+            return True
+        return False
+
+    assert is_checked(Result, "0") is internal
+    assert is_checked(collect, 1) is boundary
+
+
+def test_checked_reads_environment(monkeypatch):
+    monkeypatch.setattr(agent_validate, "policy", None)
+
+    monkeypatch.setenv(agent_validate.ENV_NAME, agent_validate.POLICY_NONE)
+
+    def unchecked(args: str) -> str:
+        return args
+
+    assert agent_validate.checked(boundary=True)(unchecked) is unchecked
+
+    monkeypatch.setenv(agent_validate.ENV_NAME, agent_validate.POLICY_BOUNDARY)
+
+    @agent_validate.checked(boundary=True)
+    def collect(args: str) -> str:
+        return args
+
+    with pytest.raises(roar.BeartypeCallHintViolation):
+        collect(1)
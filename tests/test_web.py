@@ -0,0 +1,210 @@
+import datetime
+import email.utils
+import json
+import smtplib
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import model as agent_model, operation as agent_op
+from server_monitor_agent.service.web import (
+    io as web_io,
+    model as web_model,
+    operation as web_op,
+)
+from tests import helpers
+
+
+def _agent_item(index: int = 1, status: str = "critical") -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary=f"High disk /data{index} use",
+        description=f"High disk /data{index} use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        status_name=status,
+        service_name=f"/data{index}",
+        extra_data={"usage": 0.95, "threshold": 80},
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(agent_op, "backoff_delay", lambda *args, **kwargs: 0.0)
+    monkeypatch.setattr(web_op, "_slack_senders", {})
+    monkeypatch.setattr(web_op, "SLACK_RATE", 100.0)
+    monkeypatch.setattr(web_op, "_email_digests", {})
+    yield
+    agent_op._flush_callbacks.items.clear()
+
+
+def test_slack_coalesce(allow_requests):
+    with helpers.http_stand_in() as httpd:
+        args = web_model.SlackMessageSendArgs(webhook=httpd.url, window=60.0)
+        for index in range(3):
+            web_io.slack_message_output(args, _agent_item(index))
+
+        assert httpd.received == []
+        agent_op.run_flush()
+
+    assert len(httpd.received) == 1
+    payload = json.loads(httpd.received[0]["body"])
+    assert payload["blocks"][0]["text"]["text"] == "3 notifications"
+    assert len([i for i in payload["blocks"] if i["type"] == "divider"]) == 3
+    assert payload["text"].count("critical: High disk") == 3
+
+
+def test_slack_split_large_batch():
+    blocks = web_io.slack_blocks(_agent_item())
+    payloads = web_op.slack_payloads([blocks] * 20, ["text"] * 20)
+    assert len(payloads) > 1
+    assert all(len(i["blocks"]) <= web_op.SLACK_MAX_BLOCKS for i in payloads)
+    assert sum(i["text"].count("text") for i in payloads) == 20
+
+
+def test_slack_large_item(capsys):
+    section = {"type": "section", "text": {"type": "mrkdwn", "text": "detail"}}
+    big = [section] * 60
+
+    # an item that does not fit is cut short, instead of a message with no items
+    payloads = web_op.slack_payloads([big, [section]], ["big", "small"])
+    assert [i["text"] for i in payloads] == ["big", "small"]
+    assert [len(i["blocks"]) for i in payloads] == [web_op.SLACK_MAX_BLOCKS, 2]
+    assert payloads[0]["blocks"][0]["type"] == "header"
+    assert "Slack message has 61 blocks, only sending the first 49" in capsys.readouterr().err
+
+    single = web_op.slack_payloads([big], ["big"])
+    assert len(single[0]["blocks"]) == web_op.SLACK_MAX_BLOCKS
+
+
+def test_slack_rate_limited_then_sent(allow_requests):
+    responses = [
+        (429, {"Retry-After": "0"}, b"rate_limited"),
+        (503, {}, b"unavailable"),
+    ]
+    with helpers.http_stand_in(responses) as httpd:
+        sender = web_op.SlackSender(httpd.url, window=0.0)
+        sender.submit(web_io.slack_blocks(_agent_item()), "text")
+
+    assert len(httpd.received) == 3
+
+
+def test_retry_after_delay():
+    assert agent_op.retry_after_delay("3", 1.0) == 3.0
+    assert agent_op.retry_after_delay(None, 1.0) == 1.0
+    assert agent_op.retry_after_delay("soon", 1.0) == 1.0
+
+    # an http date in the past means retry now
+    assert agent_op.retry_after_delay("Wed, 21 Oct 2015 07:28:00 GMT", 1.0) == 0.0
+    later = email.utils.format_datetime(
+        datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(hours=1)
+    )
+    assert 3500 < agent_op.retry_after_delay(later, 1.0) <= 3600
+
+
+def test_slack_sender_per_window():
+    webhook = "https://hooks.slack.example.com/services/T000"
+    sender = web_op.slack_sender(webhook, window=2.0)
+    assert web_op.slack_sender(webhook, window=2.0) is sender
+    assert web_op.slack_sender(webhook, window=30.0).batch.window == 30.0
+
+
+def test_slack_client_error(allow_requests):
+    with helpers.http_stand_in([(400, {}, b"invalid_blocks")]) as httpd:
+        sender = web_op.SlackSender(httpd.url, window=60.0)
+        sender.submit(web_io.slack_blocks(_agent_item()), "text")
+        with pytest.raises(ValueError, match="400 invalid_blocks"):
+            sender.flush()
+
+    assert len(httpd.received) == 1
+
+
+def test_slack_cli(allow_requests, tmp_path):
+    path = tmp_path / "item.json"
+    path.write_text(json.dumps(_agent_item().to_dict()))
+
+    from server_monitor_agent.agent import command as agent_command
+
+    with helpers.http_stand_in() as httpd:
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(
+            agent_command.cli,
+            ["file-input", "-p", str(path), "slack-message", "-w", httpd.url],
+        )
+
+    assert result.exit_code == 0, result.stderr
+    assert len(httpd.received) == 1
+    payload = json.loads(httpd.received[0]["body"])
+    assert payload["blocks"][0]["type"] == "header"
+    assert "Critical: High disk /data1 use" in payload["blocks"][0]["text"]["text"]
+
+
+@pytest.fixture()
+def smtp_plain(monkeypatch):
+    """Use plain SMTP so the local stand-in does not need a certificate."""
+    monkeypatch.setattr("smtplib.SMTP_SSL", smtplib.SMTP)
+    pool = web_op.SmtpConnectionPool()
+    monkeypatch.setattr(web_op, "_smtp_pool", pool)
+    yield pool
+    pool.close()
+
+
+def _email_args(port: int, to_addresses=("ops@example.com",)):
+    return web_model.EmailMessageSendArgs(
+        host="127.0.0.1",
+        port=port,
+        username="agent",
+        password="secret",
+        from_address="agent@example.com",
+        to_addresses=list(to_addresses),
+        window=60.0,
+        timeout=5.0,
+    )
+
+
+def test_email_digest_per_recipients(smtp_plain):
+    with helpers.smtp_stand_in() as smtpd:
+        ops = _email_args(smtpd.port)
+        dev = _email_args(smtpd.port, ["dev@example.com", "ops@example.com"])
+        for index in range(3):
+            web_io.email_message_output(ops, _agent_item(index))
+        web_io.email_message_output(dev, _agent_item(9, status="passing"))
+
+        agent_op.run_flush()
+
+        assert smtpd.connections == 1
+        assert smtpd.logins == 1
+        assert len(smtpd.messages) == 2
+
+    digest = email.message_from_bytes(smtpd.messages[0]["data"])
+    assert digest["Subject"].startswith("3 notifications: Critical: High disk")
+    parts = {i.get_content_type(): i for i in digest.get_payload()}
+    assert parts["text/plain"].get_payload(decode=True).decode().count("Status:") == 3
+    assert parts["text/html"].get_payload(decode=True).decode().count("<hr>") == 2
+
+    single = email.message_from_bytes(smtpd.messages[1]["data"])
+    assert (
+        single["Subject"]
+        == "Passing: High disk /data9 use on test-instance.example.com"
+    )
+    assert len(smtpd.messages[1]["to"]) == 2
+
+
+def test_email_reconnect_after_idle(smtp_plain):
+    smtp_plain.idle_timeout = 0.0
+    with helpers.smtp_stand_in() as smtpd:
+        args = _email_args(smtpd.port)
+        args.window = 0.0
+        web_io.email_message_output(args, _agent_item(1))
+        web_io.email_message_output(args, _agent_item(2))
+
+        assert smtpd.connections == 2
+        assert len(smtpd.messages) == 2
+
+
+def test_email_error(smtp_plain):
+    args = _email_args(1)
+    args.window = 0.0
+    with pytest.raises(ValueError, match="Could not send email using 127.0.0.1:1"):
+        web_io.email_message_output(args, _agent_item(1))
@@ -0,0 +1,180 @@
+import datetime
+import io
+
+import pytest
+from click.testing import CliRunner
+
+from server_monitor_agent.agent import (
+    convert as agent_convert,
+    model as agent_model,
+    wire as agent_wire,
+)
+
+
+def _agent_item(date: datetime.datetime, **extra) -> agent_model.AgentItem:
+    return agent_model.AgentItem(
+        summary="High disk /data use",
+        description="High disk /data use of 95.0% (threshold 80.0%).",
+        host_name="test-instance.example.com",
+        source_name="server",
+        check_name="disk",
+        date=date,
+        status_name="critical",
+        service_name="/data",
+        extra_data=extra,
+    )
+
+
+def test_wire_round_trip():
+    brisbane = datetime.timezone(datetime.timedelta(hours=10))
+    items = [
+        _agent_item(
+            datetime.datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=brisbane),
+            usage=95.0,
+            checks=[{"node": "node1", "tags": ["application"]}],
+        ),
+        _agent_item(datetime.datetime(1969, 12, 31, 23, 59, 59)),
+    ]
+
+    content = agent_wire.encode(items)
+    assert content.startswith(agent_wire.MAGIC)
+    decoded = agent_wire.decode(content)
+    assert decoded == items
+    assert decoded[0].date.utcoffset() == datetime.timedelta(hours=10)
+    assert decoded[1].date.tzinfo is None
+
+    assert len(content) < len(agent_convert.to_ndjson_bytes(items))
+    assert agent_wire.decode(agent_wire.encode([])) == []
+
+
+def test_wire_invalid():
+    content = agent_wire.encode(
+        [_agent_item(datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc))]
+    )
+
+    with pytest.raises(ValueError, match="Not an agent item stream"):
+        agent_wire.decode(b"{}" + content)
+    with pytest.raises(ValueError, match="Unsupported agent item stream version 2"):
+        agent_wire.decode(agent_wire.MAGIC + b"\x00\x02" + content[6:])
+    with pytest.raises(ValueError, match="Incomplete agent item record"):
+        agent_wire.decode(content[:-3])
+    with pytest.raises(ValueError, match="Missing agent item stream header"):
+        list(agent_wire.read_items(io.BytesIO(b"SM")))
+
+
+def test_wire_cli(tmp_path):
+    item = _agent_item(
+        datetime.datetime(2024, 5, 1, 10, 30, tzinfo=datetime.timezone.utc),
+        usage=95.0,
+    )
+    source = tmp_path / "item.bin"
+    source.write_bytes(agent_wire.encode([item]))
+    target = tmp_path / "out" / "item.bin"
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            *["file-input", "-p", str(source), "-e", "binary"],
+            *["file-output", "-p", str(target), "-e", "binary"],
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+    assert agent_wire.decode(target.read_bytes()) == [item]
+
+    result = runner.invoke(
+        agent_command.cli,
+        ["file-input", "-p", str(source), "-e", "binary", "stream-output"],
+    )
+    assert result.exit_code == 0, result.stderr
+    assert agent_convert.from_json(result.stdout, "agent-item") == item
+
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            *["file-input", "-p", str(source), "-e", "binary"],
+            *["stream-output", "-f", "prom-alert-manager", "-e", "binary"],
+        ],
+    )
+    assert isinstance(result.exception, ValueError)
+    assert "only supports the 'agent-item' format" in str(result.exception)
+
+
+def test_wire_appended_streams():
+    items = [
+        _agent_item(datetime.datetime(2024, 5, 1, 10, i, tzinfo=datetime.timezone.utc))
+        for i in range(3)
+    ]
+    content = agent_wire.encode(items[:1]) + agent_wire.encode(items[1:])
+    assert agent_wire.decode(content) == items
+
+    with pytest.raises(ValueError, match="over the limit of 10 bytes"):
+        list(agent_wire.read_items(io.BytesIO(content), max_bytes=10))
+
+
+def test_ndjson_stream_cli(tmp_path):
+    items = [
+        _agent_item(
+            datetime.datetime(2024, 5, 1, 10, i, tzinfo=datetime.timezone.utc),
+            usage=90.0 + i,
+        )
+        for i in range(3)
+    ]
+    content = agent_convert.to_ndjson_bytes(items)
+    target = tmp_path / "items.ndjson"
+
+    from server_monitor_agent.agent import command as agent_command
+
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        agent_command.cli,
+        [*["stream-input", "-e", "ndjson"], *["stream-output", "-e", "ndjson"]],
+        input=content + b"\n",
+    )
+    assert result.exit_code == 0, result.stderr
+    assert agent_convert.from_ndjson(result.stdout, "agent-item") == items
+
+    for _ in range(2):
+        result = runner.invoke(
+            agent_command.cli,
+            [
+                *["stream-input", "-e", "ndjson"],
+                *["file-output", "-p", str(target), "-e", "binary"],
+            ],
+            input=content,
+        )
+        assert result.exit_code == 0, result.stderr
+    assert agent_wire.decode(target.read_bytes()) == items * 2
+
+    result = runner.invoke(
+        agent_command.cli,
+        [
+            *["file-input", "-p", str(target), "-e", "binary"],
+            *["stream-output", "-e", "ndjson"],
+        ],
+    )
+    assert result.exit_code == 0, result.stderr
+    assert len(result.stdout.splitlines()) == 6
+
+    result = runner.invoke(
+        agent_command.cli,
+        ["stream-input", "-e", "json", "stream-output"],
+        input=content,
+    )
+    assert isinstance(result.exception, ValueError)
+
+
+def test_ndjson_item_limit():
+    content = agent_convert.to_ndjson_bytes(
+        [_agent_item(datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc))]
+    )
+    stream = io.BytesIO(content)
+    with pytest.raises(ValueError, match="over the limit of 100 bytes"):
+        list(agent_convert.iter_serialised(stream, "ndjson", "agent-item", 100))
+
+    items = agent_convert.iter_serialised(
+        io.BytesIO(content), "ndjson", "agent-item", len(content)
+    )
+    assert len(list(items)) == 1